@@ -1,5 +1,9 @@
 import io
 import json
+import os
+import time
+import uuid
+from functools import cache
 from PIL import Image
 from dotenv import load_dotenv
 from typing_extensions import Literal
@@ -8,33 +12,99 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import AIMessage, HumanMessage
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.documents import Document
-from langgraph.types import Command
+from langgraph.types import Command, interrupt
 from langgraph.graph import START, END, StateGraph, MessagesState
 from langgraph.prebuilt import create_react_agent
 
 from models import LogAttribute, LogState
 from tools import (get_filtered_logs, fetch_code_from_gitlab, get_code_from_gitlab, make_datadog_url,
                    push_issue_in_gitlab)
-from prompts import summarize_prompt, keyword_prompt, log_analyze_prompt, code_retriever_prompt
+from llm_cache import cache_scope, llm_cache
+from prefetch import code_prefetcher
+from src.shared.analysis_index import analysis_index, error_fingerprint, format_reused_analysis
+from src.shared.deadline import cut_stages, timeout
+from summarize import compact_log, chunk_lines
+from streaming import stream_graph
+from checkpoint import checkpointer
+from deadline import run_until_deadline
+from routing import policy
+from tracing import traced_node
+from prompts import (summarize_prompt, summarize_chunk_prompt, summarize_reduce_prompt, keyword_prompt,
+                     log_analyze_prompt, code_retriever_prompt)
+from src.shared.keywords import parse_keywords
+from src.shared.routing import choose_route, record_call, print_route_stats
+from src.shared.singleflight import print_flight_stats, start_flights
 
 
 # --- Environment setup and LLM initialization ---
 load_dotenv(dotenv_path=".env", override=True)
 
 
+# --- Shared models and agents (built once per process, on first use) ---
+@cache
+def get_flash_llm() -> ChatGoogleGenerativeAI:
+    return ChatGoogleGenerativeAI(model='gemini-2.0-flash', temperature=0)
+
+@cache
+def get_keyword_chain():
+    return keyword_prompt | get_flash_llm()
+
+@cache
+def get_summarize_chain():
+    return summarize_prompt | get_flash_llm() | StrOutputParser()
+
+@cache
+def get_summarize_chunk_chain():
+    # partial summaries run in parallel and are not shown, only the reduced summary is streamed
+    return (summarize_chunk_prompt | get_flash_llm() | StrOutputParser()).with_config(tags=['nostream'])
+
+@cache
+def get_summarize_reduce_chain():
+    return summarize_reduce_prompt | get_flash_llm() | StrOutputParser()
+
+@cache
+def get_code_retriever_agent(model: str = 'openai:gpt-4.1'):
+    # the inner transcript is never resumed, so it is not checkpointed with the outer graph
+    return create_react_agent(model=model, tools=[fetch_code_from_gitlab], prompt=code_retriever_prompt,
+                              checkpointer=False)
+
+@cache
+def get_log_analyzer_agent(model: str = 'gemini-2.0-flash'):
+    # repeated analyses of the same error group and code are answered from the persistent cache
+    llm = ChatGoogleGenerativeAI(model=model, cache=llm_cache)
+    return create_react_agent(model=llm, tools=[get_code_from_gitlab], prompt=log_analyze_prompt, checkpointer=False)
+
+
 # --- State definition ---
+# Nodes return only their new messages (the add_messages reducer appends them), and sub-agents
+# contribute only their final answer, so the state grows by a message or two per step.
 class AgentState(MessagesState):
     log_state: LogState
     log_attributes: list[LogAttribute]
     selected_log: LogAttribute
     code_urls: list[str]
     codes: list[Document]
+    # stages stopped early by the investigation's deadline, see deadline.py
+    cut_short: list[str]
 
 
+@traced_node
 def extract_keywords_node(state: AgentState) -> Command[Literal['log_retriever', 'keyword_review']]:
-    llm = ChatGoogleGenerativeAI(model='gemini-2.0-flash', temperature=0)
-    chain = keyword_prompt | llm
-    message: AIMessage = chain.invoke({"messages": state['messages']})
+    # rule-based fast path: only ask the LLM when a field is missing or ambiguous
+    fields = {}
+    for message in state['messages']:
+        if isinstance(message, HumanMessage) and isinstance(message.content, str):
+            fields.update(parse_keywords(message.content))
+    if len(fields) == 4:
+        log_state = LogState(
+            project_name=fields['project_name'], log_level=fields['level'],
+            time_period_hours=fields['time_period_hours'], environment=fields['environment'],
+        )
+        return Command(
+            goto='log_retriever', update={'messages': [AIMessage(log_state.model_dump_json())], 'log_state': log_state}
+        )
+
+    message: AIMessage = get_keyword_chain().invoke({"messages": state['messages']})
     output_parser = PydanticOutputParser(pydantic_object=LogState)
     try:
         log_state = output_parser.parse(message.content)
@@ -43,67 +113,115 @@ def extract_keywords_node(state: AgentState) -> Command[Literal['log_retriever',
         # If parsing fails, return to the same node to retry
         return Command(goto='keyword_review', update={'messages': [message]})
 
+@traced_node
 def keyword_review(state: AgentState) -> Command:
     """
     keyword_review node requests human review.
+    The run is paused at the interrupt (and checkpointed) until it is resumed with the user's answer.
     """
-    user_input = input("User: ")
+    user_input = interrupt("User: ")
     # Append input to messages and resume to extract_keywords
-    return Command(
-        goto='extract_keywords',
-        update={'messages': state['messages'] + [HumanMessage(content=user_input)]}
-    )
+    return Command(goto='extract_keywords', update={'messages': [HumanMessage(content=user_input)]})
 
+def summarize_logs(logs: list[LogAttribute]) -> str:
+    """
+    Summarize the log groups from one canonical line per group.
+    Lines that do not fit one token-budgeted chunk are summarized chunk-wise in parallel, then reduced.
+    """
+    chunks = chunk_lines([compact_log(index, log) for index, log in enumerate(logs, 1)])
+    if len(chunks) == 1:
+        return get_summarize_chain().invoke({'log_attributes': "\n".join(chunks[0])})
+    summaries = get_summarize_chunk_chain().batch([{'log_attributes': "\n".join(chunk)} for chunk in chunks])
+    return get_summarize_reduce_chain().invoke({'summaries': "\n\n".join(summaries)})
+
+@traced_node
 def log_retriever_node(state: AgentState) -> Command[Literal[END, 'api_retriever', 'log_review']]:
-    llm = ChatGoogleGenerativeAI(model='gemini-2.0-flash', temperature=0)
-    chain = summarize_prompt | llm | StrOutputParser()
     logs = get_filtered_logs(**state['log_state'].model_dump())
-    response = chain.invoke({'log_attributes': logs})
     if len(logs) == 0:
-        return Command(goto=END, update={"messages": [HumanMessage("No logs found for the given criteria.")]})
+        return Command(goto=END, update={"messages": [HumanMessage("No logs found for the given criteria.")],
+                                         "cut_short": cut_stages()})
     elif len(logs) == 1:
         # If only one log is found, go directly to log_analyzer
         return Command(goto='api_retriever', update={"selected_log": logs[0]})
     else:
+        # resolve and fetch code for every listed group while the user is choosing one
+        code_prefetcher.start(logs)
+        response = summarize_logs(logs)
         return Command(
             goto='log_review',
-            update={"messages": state['messages'] + [AIMessage(content=response)], "log_attributes": logs}
+            update={"messages": [AIMessage(content=response)], "log_attributes": logs}
         )
 
+@traced_node
 def log_review(state: AgentState) -> Command:
-    user_input = input("User: ")
+    user_input = interrupt("User: ")
     try:
         selected_log = state['log_attributes'][int(user_input)-1]
         return Command(
             goto='api_retriever',
-            update={'messages': state['messages'] + [HumanMessage(content=user_input)], 'selected_log': selected_log}
+            update={'messages': [HumanMessage(content=user_input)], 'selected_log': selected_log}
         )
     except (IndexError, ValueError):
         print("Invalid selection. Please try again.")
-        return Command(goto='log_review', update={'messages': state['messages']})
+        return Command(goto='log_review')
 
+@traced_node
 def api_retriever_node(state: AgentState) -> AgentState:
     log = state['selected_log']
-    response = create_react_agent(
-        model='openai:gpt-4.1', tools=[fetch_code_from_gitlab], prompt=code_retriever_prompt
-    ).invoke({"messages": [HumanMessage(log.model_dump_json())]})
-    messages = response['messages']
-    ai_message: AIMessage = messages[-1]  # from react agent, list of messages returned
+    code_urls = code_prefetcher.take(log, timeout=timeout(30))
+    if code_urls:
+        return {"messages": [AIMessage(json.dumps({"code_urls": code_urls}))], "code_urls": code_urls}
+    prompt = log.model_dump_json()
+    route, model = choose_route(policy, 'api_retriever', prompt) or ('default', 'openai:gpt-4.1')
+    started = time.perf_counter()
+    response = run_until_deadline(
+        'api_retriever', get_code_retriever_agent(model).invoke, {"messages": [HumanMessage(prompt)]}
+    )
+    if response is None:
+        # out of time: the analysis runs on the log alone
+        return {"messages": [AIMessage(json.dumps({"code_urls": []}))], "code_urls": []}
+    ai_message: AIMessage = response['messages'][-1]  # from react agent, list of messages returned
     try:
         code_urls = json.loads(ai_message.content)
     except json.JSONDecodeError:
         print(f"Error decoding JSON: {ai_message.content}")
-        code_urls = []
-    return {"messages": messages, "code_urls": code_urls.get('code_urls', [])}
+        code_urls = {}
+    record_call('api_retriever', route, model, started, prompt, ai_message.content,
+                success=bool(code_urls.get('code_urls')))
+    # only the final answer is kept, not the ReAct agent's tool calls and intermediate messages
+    return {"messages": [ai_message], "code_urls": code_urls.get('code_urls', [])}
 
+@traced_node
 def analyze_logs_node(state: AgentState) -> AgentState:
     log = state.get('selected_log')
     code_urls = state.get('code_urls', [])
-    response = create_react_agent(
-        model='google_genai:gemini-2.0-flash', tools=[get_code_from_gitlab], prompt=log_analyze_prompt
-    ).invoke({"messages": [HumanMessage([{"selected_log": log, "code_urls": code_urls}])]})
-    return {"messages": response['messages']}
+    # a near-duplicate error group analyzed before is answered from the analysis index
+    fingerprint = error_fingerprint(log.model_dump_json())
+    match = analysis_index.find_similar('analyze_logs', fingerprint) if fingerprint else None
+    if match:
+        return {"messages": [AIMessage(content=format_reused_analysis(match))]}
+    prompt = json.dumps({"selected_log": log.model_dump(), "code_urls": code_urls})
+    route, model = choose_route(policy, 'analyze_logs', prompt) or ('default', 'gemini-2.0-flash')
+    started = time.perf_counter()
+    with cache_scope('analyze_logs', fingerprint, code_urls):
+        response = run_until_deadline(
+            'analyze_logs', get_log_analyzer_agent(model).invoke,
+            {"messages": [HumanMessage([{"selected_log": log, "code_urls": code_urls}])]}
+        )
+    if response is None:
+        # a cut analysis is neither recorded nor indexed, the next run of this group analyzes it again
+        return {"messages": [AIMessage(content="The analysis was stopped: the investigation ran out of time.")],
+                "cut_short": cut_stages()}
+    record_call('analyze_logs', route, model, started, prompt, response['messages'][-1].content,
+                success=bool(response['messages'][-1].content))
+    if fingerprint:
+        analysis_index.add(
+            'analyze_logs', fingerprint, response['messages'][-1].content,
+            link=make_datadog_url(**state['log_state'].model_dump()) if state.get('log_state') else ""
+        )
+    return {"messages": [response['messages'][-1]], "cut_short": cut_stages()}
 
+@traced_node
 def create_issue_node(state: AgentState) -> AgentState:
     """
     This node is a placeholder for creating an issue in gitlab issues.
@@ -116,10 +234,10 @@ def create_issue_node(state: AgentState) -> AgentState:
     except IndexError:
         title = "[🤖 Auto-generated Issue] "
 
-    print(f"Do you want to create an issue in GitLab based on the analyzed logs? (Title: {title}) (y)")
-
-    user_input = input("User: ")
-    if user_input.lower() == 'y':
+    user_input = interrupt(
+        f"Do you want to create an issue in GitLab based on the analyzed logs? (Title: {title}) (y)\nUser: "
+    )
+    if str(user_input).lower() == 'y':
         datadog_log_url = make_datadog_url(**state['log_state'].model_dump())
         gitlab_code_api = state.get('code_urls', [])
         if gitlab_code_api:
@@ -129,7 +247,7 @@ def create_issue_node(state: AgentState) -> AgentState:
                 print("Issue created successfully in GitLab.")
             else:
                 print("Failed to create issue in GitLab.")
-    return state
+    return {}
 
 
 # --- Graph construction ---
@@ -149,7 +267,25 @@ graph.add_edge("api_retriever", "analyze_logs")
 graph.add_edge("analyze_logs", "create_issue")
 graph.set_finish_point("create_issue")
 
-sequence_graph = graph.compile()
+# runs paused for human review are checkpointed and resumed by thread_id, in this or another process
+sequence_graph = graph.compile(checkpointer=checkpointer)
+
+
+def run_interactive(graph, graph_input: dict, thread_id: str):
+    """
+    Stream the graph and answer its review interrupts from the terminal until the run finishes.
+    A thread that is already paused at a review is resumed instead of started with graph_input.
+    """
+    config = {'configurable': {'thread_id': thread_id}}
+    if graph.get_state(config).interrupts:
+        print(f"Resuming thread {thread_id}")
+        graph_input = Command(resume=input(graph.get_state(config).interrupts[0].value))
+    while True:
+        stream_graph(graph, graph_input, config)
+        interrupts = graph.get_state(config).interrupts
+        if not interrupts:
+            return
+        graph_input = Command(resume=input(interrupts[0].value))
 
 
 # --- Execution example ---
@@ -160,5 +296,11 @@ if __name__ == '__main__':
 
     query = "please get *document* project log for the last days in prod env for error level"
 
-    for chunk in sequence_graph.stream({'messages': [HumanMessage("")]}, stream_mode='values'):
-        chunk['messages'][-1].pretty_print()
+    start_flights()
+    started_at = time.time()
+    # set THREAD_ID to resume a run that was paused at a review in an earlier process
+    thread_id = os.environ.get('THREAD_ID') or str(uuid.uuid4())
+    print(f"Thread: {thread_id}")
+    run_interactive(sequence_graph, {'messages': [HumanMessage("")]}, thread_id)
+    print_flight_stats()
+    print_route_stats(since=started_at)
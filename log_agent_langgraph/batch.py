@@ -0,0 +1,113 @@
+"""
+Batch triage
+
+Non-interactive counterpart of sequence_graph: instead of asking the user to pick one error,
+code resolution, code fetching and analysis run for every top-N group with bounded concurrency and
+per-provider rate limits. Each group's analysis is printed as soon as it finishes, followed by a
+combined report.
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from langchain_core.messages import AIMessage
+
+from agent import api_retriever_node, analyze_logs_node
+from models import LogAttribute, LogState
+from prefetch import resolve_code_urls
+from tools import get_filtered_logs
+from tracing import setup_tracing
+from src.shared.deadline import cut_stages, partial_result_note, start
+from src.shared.rate_limit import background, provider_limits
+from src.shared.routing import print_route_stats
+from src.shared.singleflight import print_flight_stats, start_flights
+from src.shared.tracing import current_trace_id, in_current_context, print_trace_breakdown, span, write_metrics
+
+
+def triage_group(index: int, log: LogAttribute, log_state: LogState) -> dict:
+    """
+    Resolve, fetch and analyze one error group.
+    Code URLs are resolved from the stack trace first; the ReAct retriever is only used if that finds nothing.
+    Each group has its own investigation budget; the stages it cut short are noted under its report.
+    """
+    start()
+    try:
+        code_urls = resolve_code_urls(log)
+        if not code_urls:
+            provider_limits["openai"].acquire()
+            code_urls = api_retriever_node({'selected_log': log}).get('code_urls', [])
+        provider_limits["gemini"].acquire()
+        messages = analyze_logs_node({'selected_log': log, 'code_urls': code_urls, 'log_state': log_state})['messages']
+        report = messages[-1].content if messages and isinstance(messages[-1], AIMessage) else "(no analysis)"
+    except Exception as e:
+        report = f"Analysis failed: {e}"
+    note = partial_result_note()
+    if note:
+        report = f"{report}\n\n{note}"
+    return {"index": index, "log": log, "report": report, "cut_short": cut_stages()}
+
+
+def triage_all(log_state: LogState, max_concurrency: int = 4) -> list[dict]:
+    """
+    Analyze every error group returned for log_state and return the results in ranking order.
+    Runs as background work, so interactive runs keep their share of the provider rate limits.
+    """
+    start_flights()
+    setup_tracing()
+    started_at = time.time()
+    with span("batch_triage", kind="batch"), background():
+        trace_id = current_trace_id()
+        logs = get_filtered_logs(**log_state.model_dump())
+        print(f"Triaging {len(logs)} error groups of {log_state.project_name} "
+              f"({log_state.environment}, last {log_state.time_period_hours}h)")
+
+        results = []
+        with ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="triage") as executor:
+            futures = [executor.submit(in_current_context(triage_group), index, log, log_state)
+                       for index, log in enumerate(logs, 1)]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                print(f"\n=== [{result['index']}/{len(logs)}] {result['log'].message} "
+                      f"({result['log'].occurrance}x) ===\n{result['report']}")
+
+    results.sort(key=lambda result: result["index"])
+    print_flight_stats()
+    print_route_stats(since=started_at)
+    print_trace_breakdown(trace_id)
+    write_metrics()
+    return results
+
+
+def format_report(results: list[dict]) -> str:
+    lines = ["# Error triage report", ""]
+    for result in results:
+        log = result["log"]
+        lines += [
+            f"## {result['index']}. {log.message}",
+            f"- Occurrences: {log.occurrance}",
+            f"- Logger: {log.filename}",
+            "",
+            result["report"],
+            "",
+        ]
+    return "\n".join(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Analyze all top-N error groups without interaction.")
+    parser.add_argument("project_name")
+    parser.add_argument("--level", default="error")
+    parser.add_argument("--hours", type=int, default=24)
+    parser.add_argument("--env", default="prod")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--output", help="Write the combined report to this file")
+    args = parser.parse_args()
+
+    state = LogState(project_name=args.project_name, log_level=args.level,
+                     time_period_hours=args.hours, environment=args.env)
+    report = format_report(triage_all(state, args.concurrency))
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report)
+    print("\n" + report)
@@ -0,0 +1,62 @@
+"""
+Agent construction benchmark
+
+Times what the graph's nodes spend building their models and ReAct agents: once per node call
+(the getters' caches are cleared before every call, as the nodes built them before) and once per
+process (the cached getters of agent.py). No model is called, so dummy API keys are enough.
+
+    python bench_agents.py --calls 20
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+import agent
+
+# what each node builds
+NODE_BUILDERS = {
+    'extract_keywords': agent.get_keyword_chain,
+    'log_retriever': agent.get_summarize_chain,
+    'api_retriever': agent.get_code_retriever_agent,
+    'analyze_logs': agent.get_log_analyzer_agent,
+}
+
+
+def clear_caches():
+    agent.get_flash_llm.cache_clear()
+    for builder in NODE_BUILDERS.values():
+        builder.cache_clear()
+
+
+def time_node(builder, calls: int, cached: bool) -> float:
+    """:return: seconds spent building for `calls` calls of a node"""
+    clear_caches()
+    started = time.perf_counter()
+    for _ in range(calls):
+        if not cached:
+            clear_caches()
+        builder()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-call and per-process agent construction.")
+    parser.add_argument("--calls", type=int, default=20, help="Node calls to simulate")
+    args = parser.parse_args()
+
+    print(f"{'node':<18}{'per call':>12}{'per process':>14}  ({args.calls} calls, ms)")
+    totals = [0.0, 0.0]
+    for node, builder in NODE_BUILDERS.items():
+        uncached = time_node(builder, args.calls, cached=False)
+        cached = time_node(builder, args.calls, cached=True)
+        totals[0] += uncached
+        totals[1] += cached
+        print(f"{node:<18}{uncached * 1000:>12.1f}{cached * 1000:>14.1f}")
+    print(f"{'total':<18}{totals[0] * 1000:>12.1f}{totals[1] * 1000:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+"""
+Investigation deadline for graph nodes
+
+LangGraph side of src.shared.deadline: every graph run (and every batch-triaged group) starts its
+own budget, the fetches size their timeouts from it, and a node's agent call is given up once the
+budget is spent. The node then continues with a fallback and the stage is reported as cut short.
+"""
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from src.shared.deadline import cut_short, remaining
+from src.shared.tracing import in_current_context
+
+# agent calls given up at the deadline finish in the background, they do not hold up the graph
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="deadline")
+
+
+def run_until_deadline(stage: str, fn, *args, **kwargs):
+    """
+    Call fn, but stop waiting for it when the investigation's budget is spent.
+    :return: fn's result, or None if the stage was skipped or cut short
+    """
+    left = remaining()
+    if left is None:
+        return fn(*args, **kwargs)
+    if left <= 0:
+        cut_short(stage, "skipped, no time left")
+        return None
+    future = _executor.submit(in_current_context(fn), *args, **kwargs)
+    try:
+        return future.result(timeout=left)
+    except FutureTimeout:
+        cut_short(stage, "no answer before the deadline")
+        return None
+
@@ -0,0 +1,71 @@
+import contextvars
+import json
+import os
+from contextlib import contextmanager
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+
+from src.shared.llm_cache import ResponseCache, analysis_key, code_revision, normalize, response_cache
+from src.shared.tracing import span
+
+# (step, group fingerprint, code revision) of the analysis running in this context
+_scope: contextvars.ContextVar[tuple[str, str, list[str]]|None] = contextvars.ContextVar("llm_cache_scope",
+                                                                                         default=None)
+
+
+@contextmanager
+def cache_scope(step: str, group: str, code_urls: list[str]):
+    """Cache the model calls made in this context under the error group and code revision they analyse."""
+    token = _scope.set((step, group, code_revision(json.dumps(code_urls))) if group else None)
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def _tool_results(prompt: str) -> list[str]:
+    # the prompt is the serialized message list; tool messages carry the code read so far
+    try:
+        messages = json.loads(prompt)
+    except ValueError:
+        return [normalize(prompt)]
+    return [normalize(str(message.get("kwargs", {}).get("content"))) for message in messages
+            if isinstance(message, dict) and message.get("id", [""])[-1] == "ToolMessage"]
+
+
+class SQLiteLLMCache(BaseCache):
+    """
+    LangChain cache backed by ResponseCache. Only calls made inside cache_scope() are cached; their keys
+    are built from the model parameters (llm_string) and the scope's error group and code revision,
+    so a repeated analysis of the same error group skips the model call.
+    """
+    def __init__(self, cache: ResponseCache):
+        self.cache = cache
+
+    def _key(self, prompt: str, llm_string: str) -> str|None:
+        scope = _scope.get()
+        if scope is None:
+            return None
+        step, group, code = scope
+        return analysis_key(step, llm_string, group, code, _tool_results(prompt))
+
+    def lookup(self, prompt: str, llm_string: str):
+        key = self._key(prompt, llm_string)
+        if os.environ.get("LLM_CACHE_DISABLED") or key is None:
+            return None
+        with span("llm_cache.lookup", kind="cache") as current:
+            cached = self.cache.get(key)
+            current.set_attribute("cache.hit", cached is not None)
+        return loads(cached) if cached is not None else None
+
+    def update(self, prompt: str, llm_string: str, return_val):
+        key = self._key(prompt, llm_string)
+        if key is not None:
+            self.cache.put(key, dumps(list(return_val)))
+
+    def clear(self, **kwargs):
+        self.cache.clear()
+
+
+llm_cache = SQLiteLLMCache(response_cache)
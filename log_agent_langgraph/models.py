@@ -1,12 +1,20 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
+
+from src.shared.log_queries import split_values
 
 
 class LogState(BaseModel):
+    # one or several services / environments, comma separated
     project_name: str
     log_level: str
     time_period_hours: int
     environment: str
 
+    @field_validator("project_name", "environment", mode="before")
+    @classmethod
+    def join_values(cls, value):
+        return ",".join(split_values(value))
+
 class LogAttribute(BaseModel):
     document_id: str|None = None
     message: str|None = Field(default=None, description="Log message content")
@@ -0,0 +1,75 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from models import LogAttribute
+from tools import fetch_code_from_gitlab, read_code
+from src.shared.deadline import cut_short, expired
+from src.shared.singleflight import flight
+from src.shared.stack_frames import innermost_files, project_path
+from src.shared.tracing import in_current_context
+
+def resolve_code_urls(log: LogAttribute) -> list[str]:
+    """
+    Resolve the GitLab URLs of the innermost frames without the LLM and read their code,
+    so both land in the run's request memo. Stops at the fetch deadline with the frames resolved so far.
+    """
+    if not log.appname:
+        return []
+    project, branch = project_path(log.appname), log.branch or 'master'
+    code_urls = []
+    files = innermost_files(log.stack_trace, log.exc_info)
+    for resolved, file_path in enumerate(files):
+        if expired(fetch=True):
+            cut_short("api_retriever", f"resolved {resolved} of {len(files)} stack frames")
+            break
+        url = fetch_code_from_gitlab.func(project, file_path, branch)
+        if url:
+            read_code(url)
+            code_urls.append(url)
+    return code_urls
+
+
+def log_key(log: LogAttribute) -> tuple:
+    return log.message, log.filename
+
+
+class CodePrefetcher:
+    """
+    Speculatively resolves and fetches code for every listed log group while the user is choosing one.
+    """
+    def __init__(self, max_workers: int = 4):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="code-prefetch")
+        self._futures: dict[tuple, Future] = {}
+
+    def start(self, logs: list[LogAttribute]):
+        self.discard()
+        for log in logs:
+            self._futures[log_key(log)] = self._executor.submit(in_current_context(resolve_code_urls), log)
+
+    def take(self, log: LogAttribute, timeout: float = 30) -> list[str]:
+        """
+        Return the prefetched code URLs of the selected log (waiting for it if still running)
+        and drop everything prefetched for the other logs.
+        """
+        future = self._futures.pop(log_key(log), None)
+        for other in self._futures.values():
+            other.cancel()
+        code_urls = []
+        if future is not None:
+            try:
+                code_urls = future.result(timeout=timeout)
+            except Exception as e:
+                print(f"Prefetch failed for {log.message}: {e}")
+        # the other groups often share files with the selected one, its code stays in the memo
+        self.discard(keep=code_urls)
+        return code_urls
+
+    def discard(self, keep: list[str] = ()):
+        """Cancel pending prefetches and evict the code of finished ones, except the URLs in keep."""
+        for future in self._futures.values():
+            if not future.cancel() and future.done() and not future.exception():
+                for url in set(future.result()) - set(keep):
+                    flight("gitlab").forget(("code", url))
+        self._futures.clear()
+
+
+code_prefetcher = CodePrefetcher()
@@ -14,6 +14,7 @@ keyword_prompt = PromptTemplate(
     - 'stag', 'stage', 'staging' → 'staging'
     - 'dev', 'development' → 'dev'
     If any are missing, ask for only the missing values.
+    Several services or environments (e.g. a release across services) are given comma separated, e.g. "document,billing".
     Respond with a JSON object in the following Pydantic schema format:
     {{
       "project_name": str,
@@ -35,10 +36,11 @@ summarize_prompt = PromptTemplate(
     Your task is to summarize the logs provided.
     
     ## INPUT
-    - You will receive logs {log_attributes}.
+    - You will receive one line per error group: '#<number> [<count>x] (<service>) <message template> @ <innermost frame>'.
+    - Logs: {log_attributes}
     
     ## ACTION
-    - Show the error messages and their frequencies.
+    - Show the error messages, their services and frequencies, keeping the numbers of the groups.
     - Highlight any recurring issues or patterns.
     
     ## OUTPUT
@@ -50,6 +52,40 @@ summarize_prompt = PromptTemplate(
     """,
 )
 
+summarize_chunk_prompt = PromptTemplate(
+    input_variables=["log_attributes"],
+    template="""
+    Your task is to condense part of a list of error groups.
+    
+    ## INPUT
+    - You will receive one line per error group: '#<number> [<count>x] (<service>) <message template> @ <innermost frame>'.
+    - Logs: {log_attributes}
+    
+    ## OUTPUT
+    - One short line per group: its number, count, service and a plain description of the error.
+    - Keep the numbers and counts exactly as given. Do not merge or drop groups.
+    - No introduction and no questions.
+    """,
+)
+
+summarize_reduce_prompt = PromptTemplate(
+    input_variables=["summaries"],
+    template="""
+    Your task is to combine partial summaries of error groups into one summary.
+    
+    ## INPUT
+    - Partial summaries, each listing error groups with their number and count: {summaries}
+    
+    ## ACTION
+    - Highlight any recurring issues or patterns across the groups.
+    
+    ## OUTPUT
+    - Respond with a concise, human-readable summary (not JSON).
+    - List every error group with its original number and count so that the user can choose which ones to analyze further.
+    - Ask to the user to specify the number of the error entry from the list.
+    """,
+)
+
 code_retriever_prompt = ChatPromptTemplate.from_messages([
     ("system", """
         You are a URL retriever agent. Given a log JSON, do the following:
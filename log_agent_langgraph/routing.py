@@ -0,0 +1,15 @@
+"""
+Routing policy of the graph nodes
+
+Fast and strong model of every routed node; see src.shared.routing for how a route is chosen.
+The fast route is the node's own model. api_retriever already runs on its strongest model and is not
+routed unless the policy file gives it a cheaper fast route.
+"""
+from src.shared.routing import load_policy
+
+DEFAULT_POLICY = {
+    "analyze_logs": {"fast": "gemini-2.0-flash", "strong": "gemini-2.5-flash",
+                     "max_fast_tokens": 8000, "max_fast_frames": 10},
+}
+
+policy = load_policy(DEFAULT_POLICY)
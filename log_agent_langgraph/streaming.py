@@ -0,0 +1,86 @@
+"""
+Token streaming for the terminal
+
+The graph is streamed in 'messages' mode next to 'values' mode, so the tokens of the user-facing
+nodes are shown as they are generated instead of after the node finishes. Tokens are written by
+a background thread and never block the graph.
+
+The size of the state after every step is measured as well, so growth of the state over a long
+review loop shows up in the run's output and on its span.
+
+Every run gets its own investigation budget (src.shared.deadline); the stages it cut short are
+printed after the run's output.
+"""
+import json
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langgraph.types import Command
+
+from src.shared.deadline import partial_result_note, start
+from src.shared.rendering import StreamRenderer
+from src.shared.tracing import annotate, current_trace_id, print_trace_breakdown, span, write_metrics
+from tracing import SpanCallbackHandler, setup_tracing
+
+# nodes whose model output is streamed token by token
+STREAMED_NODES = {'log_retriever', 'analyze_logs'}
+
+
+renderer = StreamRenderer(header=f"\n{'=' * 32} {{author}} {'=' * 32}\n")
+
+
+def _node_of(namespace: tuple[str, ...], metadata: dict) -> str:
+    # tokens of a ReAct agent invoked inside a node belong to that (top-level) node
+    return namespace[0].split(':')[0] if namespace else metadata.get('langgraph_node', '')
+
+
+def state_size(values: dict) -> int:
+    """Approximate serialized size of a state snapshot in bytes."""
+    return len(json.dumps(values, default=lambda value: getattr(value, 'content', None) or str(value)))
+
+
+def print_state_sizes(sizes: list[tuple[int, int]]):
+    if sizes:
+        steps = ", ".join(f"{messages}m/{size / 1024:.1f}KB" for messages, size in sizes)
+        print(f"[state] size per step (messages/size): {steps}")
+
+
+def stream_graph(graph, graph_input: dict|Command, config: dict|None = None):
+    """
+    Run the graph, streaming the tokens of STREAMED_NODES and printing the other new messages once complete.
+    The run is traced; where its time went is printed at the end, after the stages the deadline cut short.
+    """
+    setup_tracing()
+    start()
+    config = {**(config or {}), 'callbacks': [*(config or {}).get('callbacks', []), SpanCallbackHandler()]}
+    with span("graph_run", kind="graph"):
+        trace_id = current_trace_id()
+        sizes = _stream(graph, graph_input, config)
+        if sizes:
+            annotate(state_messages=sizes[-1][0], state_bytes=sizes[-1][1], state_bytes_max=max(s for _, s in sizes))
+    note = partial_result_note()
+    if note:
+        print(note)
+    print_state_sizes(sizes)
+    print_trace_breakdown(trace_id)
+    write_metrics()
+
+
+def _stream(graph, graph_input: dict|Command, config: dict) -> list[tuple[int, int]]:
+    """:return: (number of messages, state bytes) after every step of the outer graph"""
+    sizes = []
+    for namespace, mode, chunk in graph.stream(graph_input, config, stream_mode=['messages', 'values'], subgraphs=True):
+        if mode == 'messages':
+            message, metadata = chunk
+            if (isinstance(message, AIMessageChunk) and isinstance(message.content, str) and message.content
+                    and _node_of(namespace, metadata) in STREAMED_NODES):
+                renderer.write(_node_of(namespace, metadata), message.content)
+        elif not namespace:
+            if '__interrupt__' not in chunk:
+                sizes.append((len(chunk.get('messages', [])), state_size(chunk)))
+            # a step of the outer graph finished: close the streamed output before anything else is printed
+            streamed = renderer.finish()
+            renderer.flush()
+            last_message = chunk['messages'][-1] if chunk.get('messages') else None
+            if last_message is not None and not (streamed and isinstance(last_message, AIMessage)):
+                last_message.pretty_print()
+    return sizes
@@ -0,0 +1,48 @@
+"""
+Log group compaction for summarization
+
+Every group is reduced to one canonical line (number, count, message template, innermost frame),
+so the summarizer never sees whole exc_info blobs. Lines are split into token-budgeted chunks
+that are summarized in parallel and then reduced into the final list.
+"""
+import os
+
+from models import LogAttribute
+from src.shared.analysis_index import message_template, stack_fingerprint
+from src.shared.tokens import estimate_tokens
+
+SUMMARY_CHUNK_TOKENS = int(os.environ.get("SUMMARY_CHUNK_TOKENS", "2000"))
+MAX_TEMPLATE_CHARS = 300
+
+
+def top_frame(log: LogAttribute) -> str|None:
+    """The innermost frame: the first one of a Java trace, the last one of a Python trace."""
+    frames = stack_fingerprint(log.stack_trace or log.exc_info or '')
+    if not frames:
+        return None
+    return frames[0] if frames[0].endswith('.java') else frames[-1]
+
+
+def compact_log(index: int, log: LogAttribute) -> str:
+    """
+    One canonical line per group, e.g. `#3 [42x] (document) Timeout after <*> ms @ de.carsync.Foo.bar Foo.java`.
+    """
+    template = message_template(log.message or '(no message)')[:MAX_TEMPLATE_CHARS]
+    frame = top_frame(log)
+    service = f" ({log.service})" if log.service else ""
+    return f"#{index} [{log.occurrance}x]{service} {template}" + (f" @ {frame}" if frame else "")
+
+
+def chunk_lines(lines: list[str], budget: int = SUMMARY_CHUNK_TOKENS) -> list[list[str]]:
+    """Split lines into consecutive chunks of at most `budget` estimated tokens (at least one line each)."""
+    chunks, current, current_tokens = [], [], 0
+    for line in lines:
+        tokens = estimate_tokens(line)
+        if current and current_tokens + tokens > budget:
+            chunks.append(current)
+            current, current_tokens = [], 0
+        current.append(line)
+        current_tokens += tokens
+    if current:
+        chunks.append(current)
+    return chunks
@@ -3,64 +3,20 @@ import requests
 import pytz
 import collections
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta, datetime, timezone
 from urllib.parse import quote
-from datadog_api_client import ApiClient, Configuration
-from datadog_api_client.v2.api.logs_api import LogsApi
-from datadog_api_client.v2.model.logs_list_request import LogsListRequest
-from datadog_api_client.v2.model.logs_query_filter import LogsQueryFilter
-from datadog_api_client.v2.model.logs_query_options import LogsQueryOptions
-from datadog_api_client.v2.model.logs_list_request_page import LogsListRequestPage
-from datadog_api_client.v2.model.logs_sort import LogsSort
 from datadog_api_client.v2.model.log import Log
 from langchain_core.tools import tool
 
 from models import LogAttribute
-
-
-def fetch_all_logs(query, start_time, end_time):
-    """
-    Fetch all logs from Datadog based on the provided query and time range.
-    This function handles pagination and returns all logs that match the query.
-    :param query:
-    :param start_time:
-    :param end_time:
-    :return:
-    """
-    body = LogsListRequest(
-        filter=LogsQueryFilter(
-            query=query,
-            _from=start_time,
-            to=end_time
-        ),
-        options=LogsQueryOptions(
-            timezone="Europe/Paris"
-        ),
-        sort=LogsSort.TIMESTAMP_ASCENDING,
-        page=LogsListRequestPage(limit=1000)
-    )
-
-    configuration = Configuration()
-    all_logs = []
-    next_cursor = None
-
-    with ApiClient(configuration) as api_client:
-        api_instance = LogsApi(api_client)
-
-        # Fetch logs in a loop to handle pagination
-        while True:
-            if next_cursor:
-                body.page = {"cursor": next_cursor}
-            response = api_instance.list_logs(body=body)
-            all_logs.extend(response.data)
-
-            # Check if there is a next page (cursor)
-            next_cursor = response.get('meta', {}).get('page', {}).get('after')
-            if not next_cursor:
-                break
-
-    return all_logs
-
+from src.shared.code_sources import get_mirror, make_file_url, parse_file_url
+from src.shared.datadog_logs import fetch_all_logs
+from src.shared.deadline import DeadlineExceeded, timeout
+from src.shared.log_queries import build_query, fan_out_queries, split_values
+from src.shared.singleflight import flight
+from src.shared.rate_limit import call_with_retries, provider_limits
+from src.shared.tracing import annotate, in_current_context, span
 
 def get_top_unique_logs(logs: list[Log], top_n: int = 5) -> list[LogAttribute]:
     """
@@ -79,7 +35,8 @@ def get_top_unique_logs(logs: list[Log], top_n: int = 5) -> list[LogAttribute]:
 
         # if the log has stack_trace or exc_info, we consider it for counting
         if p_log.stack_trace or p_log.exc_info:
-            key = (p_log.message, p_log.filename)
+            # the same error in two services is two groups, labeled with their service
+            key = (p_log.service, p_log.message, p_log.filename)
             log_counter[key] += 1
             log_key_to_log[key] = p_log
 
@@ -96,22 +53,33 @@ def get_top_unique_logs(logs: list[Log], top_n: int = 5) -> list[LogAttribute]:
 def get_filtered_logs(project_name: str, log_level: str, time_period_hours: int, environment: str):
     """
     Retrieve logs from Datadog filtered by project_name, log_level, time_period_hours, and environment.
+    project_name and environment can name several services / environments, separated by commas;
+    their logs are grouped and ranked together.
     Returns list of LogAttribute for downstream agents.
     """
     tz = pytz.timezone("Europe/Paris")
     now = datetime.now(tz)
     start_time = now - timedelta(hours=time_period_hours)
 
-    query = f"service:{project_name} AND status:{log_level} AND env:{environment}"
-
-    response = fetch_all_logs(query, start_time.isoformat(), now.isoformat())
+    queries = fan_out_queries(project_name, log_level, environment)
+
+    # the review loop asks for the same query again; answer it once per run
+    def fetch(query: str) -> list[Log]:
+        return flight("datadog").do(
+            (query, time_period_hours), fetch_all_logs, query, start_time.isoformat(), now.isoformat(), 'log_retriever'
+        )
+    if len(queries) == 1:
+        response = fetch(queries[0])
+    else:
+        with ThreadPoolExecutor(max_workers=len(queries), thread_name_prefix="datadog") as executor:
+            response = [log for logs in executor.map(in_current_context(fetch), queries) for log in logs]
     response_dict: list[LogAttribute] = get_top_unique_logs(response, top_n=15)
 
     return response_dict # Return as a dict for consistency
 
 
 def make_datadog_url(project_name, log_level, time_period_hours, environment):
-    query = f'service:{project_name} status:{log_level} env:{environment}'
+    query = build_query(split_values(project_name), log_level, split_values(environment), separator=" ")
     query_encoded = quote(query)
 
     # Datadog requires timestamps in milliseconds
@@ -132,16 +100,13 @@ def try_gitlab_api(project: str, file_path: str, branch: str):
     Construct and validate a GitLab API URL for the given project, file path, and branch.
     Returns a dict with 'url' and 'code' if successful, otherwise None.
     """
-    # Construct the GitLab API URL for raw file content
-    base_url = "https://git.cardev.de/api/v4/projects"
-    # Encode project path for API (replace / with %2F)
-    project_encoded = quote(project, safe='')
-    file_path_encoded = quote(file_path, safe='')
-    url = f"{base_url}/{project_encoded}/repository/files/{file_path_encoded}/raw?ref={branch}"
+    url = make_file_url(project, file_path, branch)
     private_token = os.environ.get("GITLAB_TOKEN")
     headers = {"PRIVATE-TOKEN": private_token} if private_token else {}
     try:
-        response = requests.get(url, headers=headers, timeout=3)
+        with span("gitlab.probe", kind="gitlab", project=project):
+            response = call_with_retries("gitlab", requests.get, url, headers=headers, timeout=timeout(3))
+            annotate(bytes=len(response.content), http_status=response.status_code)
         if response.status_code == 200:
             return url
         else:
@@ -162,7 +127,10 @@ def push_issue_in_gitlab(title: str, content: str, project_path: str, log_url: s
         "labels": "bug,automated",
         "issue_type": "incident"
     }
+    # creating an issue is not idempotent: it is rate limited but not retried
+    provider_limits["gitlab"].acquire()
     response = requests.post(API_URL, headers=headers, data=issue_data)
+    provider_limits["gitlab"].update_from_headers(response.headers)
     return response
 
 
@@ -181,7 +149,7 @@ def fetch_code_from_gitlab(appname: str, file_path: str, branch: str) -> dict:
         tokens = file_path.split('/')
         file_path = f"{tokens[3]}/src/main/java/" + file_path if len(tokens) >= 4 else ''
 
-    url = try_gitlab_api(appname, file_path, branch)
+    url = flight("gitlab").do(("probe", appname, file_path, branch), try_gitlab_api, appname, file_path, branch)
     return url
 
 
@@ -193,14 +161,36 @@ def get_code_from_gitlab(code_url: str) -> str|None:
     Returns:
         str: code content if successful, None otherwise.
     """
+    return read_code(code_url)
+
+
+def read_code(code_url: str) -> str|None:
+    """
+    Read code from a GitLab raw file URL, sharing the result with every other read of it in this run.
+    """
+    return flight("gitlab").do(("code", code_url), _read_code, code_url)
+
+
+def _read_code(code_url: str) -> str|None:
+    parsed = parse_file_url(code_url)
+    mirror = get_mirror(parsed[1]) if parsed else None
+    if mirror:
+        _, project, file_path, ref = parsed
+        with span("mirror.read", kind="mirror", project=project):
+            code = mirror.read(ref, file_path)
+            annotate(bytes=len(code or ""))
+        if code is not None:
+            return code
     private_token = os.environ.get("GITLAB_TOKEN")
     if not private_token:
         print("GITLAB_TOKEN is not set in the environment.")
         return None
     headers = {"PRIVATE-TOKEN": private_token}
     try:
-        response = requests.get(code_url, headers=headers, timeout=3)
+        with span("gitlab.raw_file", kind="gitlab"):
+            response = call_with_retries("gitlab", requests.get, code_url, headers=headers, timeout=timeout(3))
+            annotate(bytes=len(response.content), http_status=response.status_code)
         return response.content.decode('utf-8') if response.status_code == 200 else None
-    except requests.RequestException as e:
+    except (requests.RequestException, DeadlineExceeded) as e:
         print(f"Attempting: {code_url} -> Status: FAILED ({e})")
         return None
@@ -0,0 +1,95 @@
+"""
+Graph tracing
+
+Graph nodes are traced with the traced_node decorator, model and tool calls with SpanCallbackHandler
+(passed as a callback to the graph run). Span processing, export and metrics are shared with the ADK
+agent in src.shared.tracing.
+"""
+import functools
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langgraph.errors import GraphInterrupt
+from opentelemetry import trace
+from opentelemetry.trace import Status, StatusCode
+
+from src.shared import tracing as shared_tracing
+from src.shared.tracing import tracer
+
+SERVICE_NAME = "log_agent_langgraph"
+
+
+def setup_tracing():
+    """Install the shared tracer provider (once), reporting spans as the LangGraph service."""
+    shared_tracing.setup_tracing(SERVICE_NAME)
+
+
+def traced_node(node):
+    """
+    Run a graph node in a 'node' span named after it.
+    A node that pauses at interrupt() ends its span marked as paused, not as failed.
+    """
+    @functools.wraps(node)
+    def run(*args, **kwargs):
+        with tracer.start_as_current_span(node.__name__.removesuffix("_node"), attributes={"log_agent.kind": "node"},
+                                          record_exception=False, set_status_on_exception=False) as current:
+            try:
+                return node(*args, **kwargs)
+            except GraphInterrupt:
+                current.set_attribute("node.paused", True)
+                raise
+            except Exception as e:
+                current.record_exception(e)
+                current.set_status(Status(StatusCode.ERROR, f"{type(e).__name__}: {e}"))
+                raise
+    return run
+
+
+class SpanCallbackHandler(BaseCallbackHandler):
+    """
+    Records model and tool calls as spans (children of the span current when they start),
+    with token usage reported by the model.
+    """
+    def __init__(self):
+        self._spans: dict[UUID, trace.Span] = {}
+
+    def _start(self, run_id: UUID, name: str, kind: str, **attributes):
+        self._spans[run_id] = tracer.start_span(name, attributes={"log_agent.kind": kind, **attributes})
+
+    def _end(self, run_id: UUID, error: BaseException|None = None, **attributes):
+        current = self._spans.pop(run_id, None)
+        if current is None:
+            return
+        for key, value in attributes.items():
+            current.set_attribute(key.replace("_", "."), value)
+        if error is not None:
+            current.record_exception(error)
+        current.end()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start(run_id, "llm", "llm", model=str((kwargs.get("invocation_params") or {}).get("model", "")))
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id, "llm", "llm", model=str((kwargs.get("invocation_params") or {}).get("model", "")))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        usage = {}
+        for generations in response.generations:
+            for generation in generations:
+                metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                usage["tokens_prompt"] = usage.get("tokens_prompt", 0) + metadata.get("input_tokens", 0)
+                usage["tokens_output"] = usage.get("tokens_output", 0) + metadata.get("output_tokens", 0)
+        self._end(run_id, **usage)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=error)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._start(run_id, (serialized or {}).get("name") or kwargs.get("name") or "tool", "tool")
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id, bytes=len(str(output)))
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=error)
+
@@ -1,15 +1,35 @@
+import time
+
 from .subagents.code_analyzer.agent import code_analyzer_agent
 from .subagents.log_analyzer.agent import log_analyzer_agent
 from .subagents.code_extractor.agent import code_extractor_agent
 from .subagents.log_filter.agent import log_filter_agent
+from src.log_agent.callbacks import chain_callbacks
+from src.log_agent.deadline import report_budget_callback, start_budget_callback
+from src.log_agent.history import history_store
+from src.shared.routing import print_route_stats
+from src.shared.singleflight import print_flight_stats, start_flights
+from src.shared.tracing import current_trace_id, print_trace_breakdown, write_metrics
 from google.adk.agents import SequentialAgent, ParallelAgent
 
 
 def before_root_agent_callback(callback_context):
-    state = callback_context._invocation_context.session.state
-    state['interaction_history'] = []
+    context = callback_context._invocation_context
+    state = context.session.state
+    # prompts only see a bounded window of the history, however long the session is
+    state['interaction_history'] = history_store.window(context.app_name, context.user_id, context.session.id)
+    # the code_extractor trace lives in run_trace now; drop the list older sessions kept in state
     state.pop('trace', None)
     state.pop('code_urls', None)
+    state['run_started'] = time.time()
+    start_flights()
+
+
+def after_root_agent_callback(callback_context):
+    print_flight_stats()
+    print_route_stats(since=callback_context.state.get('run_started', 0.0))
+    print_trace_breakdown(current_trace_id())
+    write_metrics()
 
 # Run log_analyzer_agent and code_analyzer_agent in parallel after log_filter_agent
 root_agent = SequentialAgent(
@@ -23,7 +43,9 @@ root_agent = SequentialAgent(
         ),
         code_analyzer_agent
     ],
-    before_agent_callback=before_root_agent_callback,
+    # one time budget per investigation; stages cut short by it are reported at the end
+    before_agent_callback=chain_callbacks(start_budget_callback, before_root_agent_callback),
+    after_agent_callback=chain_callbacks(after_root_agent_callback, report_budget_callback),
     description="Extracts key fields from error logs and provides both log and code analysis in parallel.",
 )
 
@@ -0,0 +1,79 @@
+import os
+
+from google.adk.models import LlmResponse
+from google.genai import types
+
+from src.shared.analysis_index import analysis_index, error_fingerprint, format_reused_analysis
+from src.shared.tracing import span
+
+
+def _content_text(content) -> str:
+    texts = []
+    for part in content.parts or []:
+        if part.text:
+            texts.append(part.text)
+        elif part.function_response:
+            texts.append(str(part.function_response.response))
+    return "\n".join(texts)
+
+
+def group_fingerprint(callback_context) -> str:
+    """
+    Fingerprint of the error group the current invocation analyses: the latest user message or tool
+    result of this invocation that contains log entries. Earlier turns and other groups of the
+    session never enter it, and neither do the agents' own answers.
+    """
+    context = callback_context._invocation_context
+    for event in reversed(context.session.events):
+        if event.invocation_id != context.invocation_id:
+            break
+        if event.content and event.content.role == "user":
+            fingerprint = error_fingerprint(_content_text(event.content))
+            if fingerprint:
+                return fingerprint
+    return ""
+
+
+def _has_function_response(llm_request) -> bool:
+    last = llm_request.contents[-1] if llm_request.contents else None
+    return bool(last and any(part.function_response for part in last.parts or []))
+
+
+# fingerprints of requests waiting for their final analysis
+_pending_fingerprints: dict[tuple[str, str], str] = {}
+
+
+def before_model_similarity_callback(callback_context, llm_request):
+    """
+    Answer with an earlier analysis of a near-duplicate error group instead of calling the model.
+    Only the first model call of an agent turn is checked; tool round trips continue normally.
+    """
+    if os.environ.get("ANALYSIS_INDEX_DISABLED") or _has_function_response(llm_request):
+        return None
+    fingerprint = group_fingerprint(callback_context)
+    if not fingerprint:
+        return None
+    with span("analysis_index.lookup", kind="cache", agent=callback_context.agent_name) as current:
+        match = analysis_index.find_similar(callback_context.agent_name, fingerprint)
+        current.set_attribute("cache.hit", match is not None)
+    if match:
+        print(f"[analysis index] reusing analysis {match['id']} for {callback_context.agent_name}")
+        return LlmResponse(content=types.Content(role="model", parts=[types.Part(text=format_reused_analysis(match))]))
+    _pending_fingerprints[(callback_context.invocation_id, callback_context.agent_name)] = fingerprint
+    return None
+
+
+def after_model_similarity_callback(callback_context, llm_response):
+    """
+    Index the agent's final text answer under the fingerprint of the group it answered, the key it was looked up by.
+    """
+    if llm_response.partial or not llm_response.content or not llm_response.content.parts:
+        return None
+    parts = llm_response.content.parts
+    if any(part.function_call for part in parts):
+        return None
+    fingerprint = _pending_fingerprints.pop((callback_context.invocation_id, callback_context.agent_name), None)
+    text = "".join(part.text or "" for part in parts).strip()
+    if fingerprint and text:
+        analysis_index.add(callback_context.agent_name, fingerprint, text)
+    return None
@@ -0,0 +1,206 @@
+"""
+Batch triage
+
+Non-interactive mode that analyzes every top-N error group of a filter at once: code resolution,
+code fetching and analysis run for each group in its own session, with bounded concurrency and
+per-provider rate limits. Each group's result is printed as soon as it finishes, followed by a
+combined report.
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import time
+
+from dotenv import load_dotenv
+from google.adk.agents import ParallelAgent, SequentialAgent
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from src.log_agent.deadline import report_budget_callback, start_budget_callback
+from src.log_agent.packing import analyze_packed
+from src.log_agent.rate_limit import RetryingGemini
+from src.shared.rate_limit import background
+from src.shared.routing import print_route_stats
+from src.shared.singleflight import print_flight_stats, start_flights
+from src.shared.tokens import estimate_tokens
+from src.shared.tracing import current_trace_id, print_trace_breakdown, setup_tracing, span, write_metrics
+from src.log_agent.subagents.code_analyzer.agent import code_analyzer_agent
+from src.log_agent.subagents.code_extractor.agent import code_extractor_agent
+from src.log_agent.subagents.log_analyzer.agent import log_analyzer_agent
+from src.log_agent.subagents.log_filter.tools import query_log_groups
+
+APP_NAME = "log_triage"
+USER_ID = "batch"
+
+
+# estimated model usage of the triage_all call running in this context, to compare per-group and packed mode
+_usage: contextvars.ContextVar[dict|None] = contextvars.ContextVar("batch_usage", default=None)
+
+
+class RateLimitedGemini(RetryingGemini):
+    """Rate limited, retrying Gemini model that also records the estimated usage of every call of a batch."""
+    async def generate_content_async(self, llm_request, stream: bool = False):
+        usage = _usage.get()
+        if usage is not None:
+            config = llm_request.config
+            request_text = str(config.system_instruction or "") if config else ""
+            request_text += json.dumps([c.model_dump(mode="json", exclude_none=True) for c in llm_request.contents])
+            usage["llm_calls"] += 1
+            usage["prompt_tokens"] += estimate_tokens(request_text)
+        async for response in super().generate_content_async(llm_request, stream):
+            if usage is not None and response.content and not response.partial:
+                usage["output_tokens"] += estimate_tokens(
+                    "".join(part.text or "" for part in response.content.parts or [])
+                )
+            yield response
+
+
+def _copy_agent(agent):
+    # an agent can only have one parent, so the triage pipeline gets its own copies
+    model = RateLimitedGemini(model=agent.canonical_model.model)
+    return agent.model_copy(update={"parent_agent": None, "model": model})
+
+
+def build_triage_agent() -> SequentialAgent:
+    """The analysis part of root_agent, for a single error group given as the user message."""
+    return SequentialAgent(
+        name="log_triage",
+        sub_agents=[
+            ParallelAgent(
+                name="triage_parallel",
+                sub_agents=[_copy_agent(log_analyzer_agent), _copy_agent(code_extractor_agent)],
+                description="Analyzes one log group and resolves its code in parallel.",
+            ),
+            _copy_agent(code_analyzer_agent),
+        ],
+        before_agent_callback=start_budget_callback,
+        after_agent_callback=report_budget_callback,
+        description="Analyzes a single error group end to end.",
+    )
+
+
+async def _triage_group(runner: Runner, index: int, group: dict, semaphore: asyncio.Semaphore) -> dict:
+    async with semaphore:
+        session = runner.session_service.create_session(app_name=APP_NAME, user_id=USER_ID, state={})
+        content = types.Content(role="user", parts=[types.Part(text=json.dumps(group, default=str))])
+        failed = False
+        try:
+            async for _ in runner.run_async(user_id=USER_ID, session_id=session.id, new_message=content):
+                pass
+            state = runner.session_service.get_session(
+                app_name=APP_NAME, user_id=USER_ID, session_id=session.id
+            ).state
+            report = state.get("code_analysis_report") or state.get("log_analysis_report") or "(no analysis)"
+            if state.get("cut_short"):
+                report += "\n\nPartial result, cut short by the time budget:\n" + "\n".join(
+                    f"- {note}" for note in state["cut_short"])
+        except Exception as e:
+            report, failed = f"Analysis failed: {e}", True
+        finally:
+            # the report is all that is kept of the run; a long-running caller like the daemon would
+            # otherwise accumulate every group's session in memory
+            runner.session_service.delete_session(app_name=APP_NAME, user_id=USER_ID, session_id=session.id)
+        return {"index": index, "group": group, "report": report, "failed": failed}
+
+
+async def triage_all(project_name: str, error_level: str, time_period_hours: int, environment: str,
+                     top_n: int = 15, max_concurrency: int = 4, packed: bool = False) -> tuple[list[dict], dict]:
+    """
+    Analyze every top_n error group of the filter.
+    With packed=True the groups are analyzed together in as few model calls as possible.
+    Runs as background work, so interactive investigations keep their share of the provider rate limits.
+    :return: the results in ranking order, and the estimated model usage of this call
+        (llm_calls, prompt_tokens, output_tokens)
+    """
+    usage = {"llm_calls": 0, "prompt_tokens": 0, "output_tokens": 0}
+    token = _usage.set(usage)
+    try:
+        with background():
+            results = await _triage_all(project_name, error_level, time_period_hours, environment, top_n,
+                                        max_concurrency, packed, usage)
+    finally:
+        _usage.reset(token)
+    return results, usage
+
+
+async def _triage_all(project_name: str, error_level: str, time_period_hours: int, environment: str,
+                      top_n: int, max_concurrency: int, packed: bool, usage: dict) -> list[dict]:
+    start_flights()
+    groups = query_log_groups(project_name, error_level, time_period_hours, environment, top_n=top_n)
+    print(f"Triaging {len(groups)} error groups of {project_name} ({environment}, last {time_period_hours}h)")
+
+    started, started_at = time.perf_counter(), time.time()
+    with span("batch_triage", kind="batch", groups=len(groups), packed=packed):
+        if packed:
+            results = await analyze_packed(groups, usage=usage)
+        else:
+            results = await _triage_groups(groups, max_concurrency)
+        trace_id = current_trace_id()
+    print(f"\n[{'packed' if packed else 'per-group'}] {len(groups)} groups in {time.perf_counter() - started:.1f}s, "
+          f"{usage['llm_calls']} model calls, ~{usage['prompt_tokens']} prompt / ~{usage['output_tokens']} output tokens")
+    print_flight_stats()
+    print_route_stats(since=started_at)
+    print_trace_breakdown(trace_id)
+    write_metrics()
+    return results
+
+
+async def _triage_groups(groups: list[dict], max_concurrency: int) -> list[dict]:
+    runner = Runner(agent=build_triage_agent(), app_name=APP_NAME, session_service=InMemorySessionService())
+    semaphore = asyncio.Semaphore(max_concurrency)
+    tasks = [_triage_group(runner, index, group, semaphore) for index, group in enumerate(groups, 1)]
+
+    results = []
+    for finished in asyncio.as_completed(tasks):
+        result = await finished
+        results.append(result)
+        print(f"\n=== [{result['index']}/{len(groups)}] {result['group'].get('message')} "
+              f"({result['group'].get('occurrance')}x) ===\n{result['report']}")
+
+    results.sort(key=lambda result: result["index"])
+    return results
+
+
+def format_report(results: list[dict]) -> str:
+    lines = ["# Error triage report", ""]
+    for result in results:
+        group = result["group"]
+        lines += [
+            f"## {result['index']}. {group.get('message')}",
+            f"- Occurrences: {group.get('occurrance')}",
+            f"- Logger: {group.get('filename')}",
+            "",
+            result["report"],
+            "",
+        ]
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze all top-N error groups without interaction.")
+    parser.add_argument("project_name")
+    parser.add_argument("--level", default="error")
+    parser.add_argument("--hours", type=int, default=24)
+    parser.add_argument("--env", default="prod")
+    parser.add_argument("--top-n", type=int, default=15)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--packed", action="store_true", help="Analyze several groups per model call")
+    parser.add_argument("--output", help="Write the combined report to this file")
+    args = parser.parse_args()
+
+    load_dotenv()
+    setup_tracing()
+    results, _ = asyncio.run(triage_all(
+        args.project_name, args.level, args.hours, args.env, args.top_n, args.concurrency, args.packed
+    ))
+    report = format_report(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report)
+    print("\n" + report)
+
+
+if __name__ == "__main__":
+    main()
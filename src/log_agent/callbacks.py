@@ -0,0 +1,30 @@
+import asyncio
+import functools
+
+
+def chain_callbacks(*callbacks):
+    """
+    Combine several ADK callbacks into one. They run in order and the first
+    non-None result short-circuits the rest, like a single callback returning it.
+    """
+    def chained(**kwargs):
+        for callback in callbacks:
+            result = callback(**kwargs)
+            if result is not None:
+                return result
+        return None
+    return chained
+
+
+def threaded_tool(func):
+    """
+    Async version of a blocking tool function that runs it in a worker thread.
+    ADK calls sync tools directly on the event loop, where their HTTP calls, rate limiter waits and
+    retry backoffs would stall every other run. The wrapper keeps the function's name, docstring
+    and signature, so the model sees the same declaration; the context (time budget, flights, trace)
+    is copied into the thread.
+    """
+    @functools.wraps(func)
+    async def run(*args, **kwargs):
+        return await asyncio.to_thread(func, *args, **kwargs)
+    return run
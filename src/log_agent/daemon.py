@@ -0,0 +1,249 @@
+"""
+Triage daemon
+
+Polls a list of (service, env, level) targets on fixed intervals and triages new errors without
+anyone typing a query. Every poll only fetches the logs between the target's watermark and now, so
+a poll costs one small Datadog query however long the daemon runs. The logs are grouped like the
+interactive filter does and added to persistent per-group counters; only groups that are new or
+spiking (rate in the window well above their moving average rate) are analyzed. Rates are counts per
+minute, so the longer first window and jittered intervals compare with the rest; groups missing from
+a window decay towards zero. The first poll of a target only records the baseline: what is already
+failing when the daemon starts is not reported as new. A failed analysis does not start the group's
+cooldown, the group is analyzed again the next time it shows up in a window.
+
+Polls start at a random offset and every interval is jittered, so targets with the same interval
+do not hit Datadog at the same moment. A global limit bounds the concurrent Datadog polls and
+another the concurrent analyses, on top of the per-provider rate limits, in which the daemon runs as
+background work.
+
+Targets come from a JSON file, e.g.
+[{"service": "document", "env": "prod", "level": "error", "interval": 300}]
+
+    python -m src.log_agent.daemon targets.json
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from dotenv import load_dotenv
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+
+from src.log_agent.batch import APP_NAME, build_triage_agent, _triage_group
+from src.shared.datadog_logs import fetch_all_logs
+from src.shared.log_queries import build_query, split_values
+from src.shared.rate_limit import background
+from src.shared.singleflight import print_flight_stats, start_flights
+from src.log_agent.subagents.log_filter.tools import get_top_unique_logs
+from src.shared.tracing import setup_tracing, span, write_metrics
+
+DEFAULT_INTERVAL = 300
+# first poll of a target without watermark looks back this far
+INITIAL_LOOKBACK = timedelta(hours=1)
+# logs reach Datadog with a delay; the window ends this long before now so late logs are not skipped
+INGESTION_DELAY = timedelta(seconds=60)
+JITTER = 0.1
+MAX_CONCURRENT_POLLS = int(os.environ.get("TRIAGE_MAX_POLLS", "2"))
+MAX_CONCURRENT_ANALYSES = int(os.environ.get("TRIAGE_MAX_ANALYSES", "2"))
+
+# a group spikes when its window rate (per minute) is SPIKE_FACTOR times its moving average rate and its
+# window count is at least MIN_SPIKE_COUNT
+SPIKE_FACTOR = 3.0
+MIN_SPIKE_COUNT = 10
+EWMA_ALPHA = 0.2
+# a group is not analyzed again within this many seconds
+ANALYSIS_COOLDOWN = 6 * 3600
+
+
+def target_key(target: dict) -> str:
+    return f"{target['service']}/{target['env']}/{target['level']}"
+
+
+def group_key(group: dict) -> str:
+    # get_top_unique_logs groups by service, message and logger; a target has one service, so
+    # message and logger identify a group within it
+    return hashlib.sha256(f"{group.get('message')}\0{group.get('filename')}".encode()).hexdigest()[:16]
+
+
+class TriageStore:
+    """Watermarks and group counters per target in SQLite."""
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS watermarks (target TEXT PRIMARY KEY, until TEXT NOT NULL)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS groups ("
+            "target TEXT NOT NULL, key TEXT NOT NULL, message TEXT, filename TEXT, total INTEGER NOT NULL, "
+            # moving average of the occurrences per minute
+            "average REAL NOT NULL, first_seen REAL NOT NULL, last_seen REAL NOT NULL, last_analyzed REAL, "
+            "report TEXT, failed INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (target, key))"
+        )
+        self._db.commit()
+
+    def watermark(self, target: str) -> datetime|None:
+        with self._lock:
+            row = self._db.execute("SELECT until FROM watermarks WHERE target = ?", (target,)).fetchone()
+        return datetime.fromisoformat(row[0]) if row else None
+
+    def set_watermark(self, target: str, until: datetime):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO watermarks VALUES (?, ?)", (target, until.isoformat()))
+            self._db.commit()
+
+    def record_window(self, target: str, groups: list[dict], now: float, minutes: float,
+                      baseline: bool = False) -> list[tuple[dict, str]]:
+        """
+        Add the group counts of a window of the given length to the counters; the averages of the
+        target's groups that are not in the window decay as if they were counted with 0.
+        :param baseline: only record the counts, e.g. on the target's first poll
+        :return: (group, reason) for every group that is new, spiking and not in its cooldown, or whose last
+            analysis failed
+        """
+        due = []
+        with self._lock:
+            for group in groups:
+                key, count = group_key(group), group.get("occurrance", 0)
+                rate = count / minutes
+                row = self._db.execute(
+                    "SELECT average, last_analyzed, failed FROM groups WHERE target = ? AND key = ?",
+                    (target, key)
+                ).fetchone()
+                if row is None:
+                    self._db.execute(
+                        "INSERT INTO groups (target, key, message, filename, total, average, first_seen, last_seen) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (target, key, group.get("message"), group.get("filename"), count, rate, now, now),
+                    )
+                    if not baseline:
+                        due.append((group, "new"))
+                    continue
+                average, last_analyzed, failed = row
+                if failed and not baseline:
+                    due.append((group, "retry after a failed analysis"))
+                elif (not baseline and count >= MIN_SPIKE_COUNT and rate > SPIKE_FACTOR * average
+                        and now - (last_analyzed or 0) > ANALYSIS_COOLDOWN):
+                    due.append((group, f"spike ({rate:.1f} vs ~{average:.1f} per minute)"))
+                self._db.execute(
+                    "UPDATE groups SET total = total + ?, average = ?, last_seen = ? WHERE target = ? AND key = ?",
+                    (count, EWMA_ALPHA * rate + (1 - EWMA_ALPHA) * average, now, target, key),
+                )
+            self._db.execute("UPDATE groups SET average = average * ? WHERE target = ? AND last_seen < ?",
+                             (1 - EWMA_ALPHA, target, now))
+            self._db.commit()
+        return due
+
+    def record_analysis(self, target: str, group: dict, report: str):
+        with self._lock:
+            self._db.execute(
+                "UPDATE groups SET last_analyzed = ?, report = ?, failed = 0 WHERE target = ? AND key = ?",
+                (time.time(), report, target, group_key(group)),
+            )
+            self._db.commit()
+
+    def record_failure(self, target: str, group: dict):
+        """Mark the group's analysis as failed, so it is due again in the next window it shows up in."""
+        with self._lock:
+            self._db.execute("UPDATE groups SET failed = 1 WHERE target = ? AND key = ?", (target, group_key(group)))
+            self._db.commit()
+
+
+class TriageDaemon:
+    def __init__(self, targets: list[dict], store: TriageStore, max_polls: int = MAX_CONCURRENT_POLLS,
+                 max_analyses: int = MAX_CONCURRENT_ANALYSES):
+        self.targets = targets
+        self.store = store
+        self._polls = asyncio.Semaphore(max_polls)
+        self._analyses = asyncio.Semaphore(max_analyses)
+        self._runner = Runner(agent=build_triage_agent(), app_name=APP_NAME, session_service=InMemorySessionService())
+        self._analysis_count = 0
+
+    async def run(self, once: bool = False):
+        # the daemon's calls leave a share of every provider's rate limit to interactive investigations
+        with background():
+            await asyncio.gather(*(self._watch(target, once) for target in self.targets))
+
+    async def _watch(self, target: dict, once: bool):
+        interval = target.get("interval", DEFAULT_INTERVAL)
+        if not once:
+            await asyncio.sleep(random.uniform(0, interval))
+        while True:
+            started = time.monotonic()
+            try:
+                await self.poll(target)
+            except Exception as e:
+                print(f"[{target_key(target)}] poll failed: {e}")
+            if once:
+                return
+            delay = interval * random.uniform(1 - JITTER, 1 + JITTER) - (time.monotonic() - started)
+            await asyncio.sleep(max(0.0, delay))
+
+    async def poll(self, target: dict):
+        """Fetch the target's logs since its watermark, update the counters and analyze what is due."""
+        key = target_key(target)
+        # every poll is a run of its own: its analyses share fetches, other targets' polls do not
+        start_flights()
+        until = datetime.now(timezone.utc) - INGESTION_DELAY
+        watermark = self.store.watermark(key)
+        since = watermark or until - INITIAL_LOOKBACK
+        if since >= until:
+            return
+        query = build_query(split_values(target["service"]), target["level"], split_values(target["env"]))
+        async with self._polls:
+            with span("triage.poll", kind="triage", target=key):
+                logs = await asyncio.to_thread(fetch_all_logs, query, since.isoformat(), until.isoformat())
+        groups = get_top_unique_logs(logs, top_n=len(logs))
+        due = self.store.record_window(key, groups, time.time(), (until - since).total_seconds() / 60,
+                                       baseline=watermark is None)
+        # the watermark only moves once the window is counted, so a failed poll is fetched again
+        self.store.set_watermark(key, until)
+        print(f"[{key}] {len(logs)} logs in {len(groups)} groups since {since:%H:%M:%S}, "
+              f"{'baseline recorded' if watermark is None else f'{len(due)} to analyze'}")
+        await asyncio.gather(*(self._analyze(key, group, reason) for group, reason in due))
+        print_flight_stats()
+        write_metrics()
+
+    async def _analyze(self, key: str, group: dict, reason: str):
+        self._analysis_count += 1
+        result = await _triage_group(self._runner, self._analysis_count, group, self._analyses)
+        if result["failed"]:
+            self.store.record_failure(key, group)
+        else:
+            self.store.record_analysis(key, group, result["report"])
+        print(f"\n=== [{key}] {reason}: {group.get('message')} ({group.get('occurrance')}x) ===\n{result['report']}")
+
+
+def load_targets(path: str) -> list[dict]:
+    with open(path) as f:
+        targets = json.load(f)
+    for target in targets:
+        missing = {"service", "env", "level"} - target.keys()
+        if missing:
+            raise ValueError(f"Target {target} is missing {', '.join(sorted(missing))}")
+    return targets
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Continuously triage new and spiking errors of several services.")
+    parser.add_argument("targets", help="JSON file with a list of {service, env, level, interval} targets")
+    parser.add_argument("--db", default=os.environ.get("TRIAGE_DB_PATH", ".cache/triage.sqlite"))
+    parser.add_argument("--once", action="store_true", help="Poll every target once and exit")
+    args = parser.parse_args()
+
+    load_dotenv()
+    setup_tracing()
+    daemon = TriageDaemon(load_targets(args.targets), TriageStore(args.db))
+    asyncio.run(daemon.run(once=args.once))
+
+
+if __name__ == "__main__":
+    main()
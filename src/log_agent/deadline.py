@@ -0,0 +1,32 @@
+"""
+Investigation deadline callbacks
+
+ADK side of src.shared.deadline: the root agent starts the investigation's budget, stages are
+skipped once it is spent, and the stages that were cut short are reported with the result.
+"""
+from google.genai import types
+
+from src.shared.deadline import DEFAULT_BUDGET, cut_short, cut_stages, expired, partial_result_note, start
+
+
+def start_budget_callback(callback_context):
+    """before_agent_callback of a root agent: starts the investigation's budget."""
+    start(float(callback_context.state.get("time_budget") or DEFAULT_BUDGET))
+    return None
+
+
+def skip_when_expired_callback(callback_context):
+    """before_agent_callback of a stage: skips the stage once the budget is spent."""
+    if expired():
+        cut_short(callback_context.agent_name, "skipped, no time left")
+        return types.Content(role="model", parts=[types.Part(
+            text=f"{callback_context.agent_name} was skipped: the investigation ran out of time."
+        )])
+    return None
+
+
+def report_budget_callback(callback_context):
+    """after_agent_callback of a root agent: stores the cut stages and tells the user about them."""
+    callback_context.state["cut_short"] = cut_stages()
+    note = partial_result_note()
+    return types.Content(role="model", parts=[types.Part(text=note)]) if note else None
@@ -0,0 +1,130 @@
+"""
+Interaction history store
+
+Append-only log of user queries and agent responses per session, kept outside the session state.
+Appending is a single INSERT, prompts read a fixed-size window of the latest entries, and every
+COMPACT_EVERY appends the entries older than the window are folded into one summary entry, so the
+cost of a turn stays flat however long the session runs.
+"""
+import json
+import os
+import sqlite3
+import threading
+from collections import Counter
+from datetime import datetime
+
+HISTORY_WINDOW = int(os.environ.get("HISTORY_WINDOW", "20"))
+COMPACT_EVERY = int(os.environ.get("HISTORY_COMPACT_EVERY", "50"))
+MAX_SUMMARY_CHARS = 2000
+
+
+def summarize_entries(entries: list[dict]) -> str:
+    """Rule-based summary of compacted entries: how many of each action and the last few queries."""
+    actions = Counter(entry.get("action", "interaction") for entry in entries)
+    queries = [entry["query"] for entry in entries if entry.get("action") == "user_query" and entry.get("query")]
+    agents = Counter(entry.get("agent") for entry in entries if entry.get("action") == "agent_response")
+    parts = [", ".join(f"{count} {action}" for action, count in actions.items())]
+    if agents:
+        parts.append("responses by " + ", ".join(f"{agent} ({count})" for agent, count in agents.items()))
+    if queries:
+        parts.append("last queries: " + "; ".join(query[:80] for query in queries[-3:]))
+    return " | ".join(parts)
+
+
+class HistoryStore:
+    """
+    SQLite-backed append-only history. Summaries of compacted entries are stored as entries with
+    action 'summary' and are returned before the window on reads.
+    """
+    def __init__(self, path: str, window: int = HISTORY_WINDOW, compact_every: int = COMPACT_EVERY,
+                 summarize=summarize_entries):
+        self.window_size = window
+        self.compact_every = compact_every
+        self.summarize = summarize
+        self._lock = threading.Lock()
+        self._appends: Counter = Counter()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS history ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, app TEXT NOT NULL, user TEXT NOT NULL, "
+            "session TEXT NOT NULL, action TEXT NOT NULL, entry TEXT NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS history_session ON history (app, user, session, seq)")
+        self._db.commit()
+
+    def append(self, app: str, user: str, session: str, entry: dict):
+        """Add one entry; compacts the session's older entries every `compact_every` appends."""
+        entry = {"timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), **entry}
+        key = (app, user, session)
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO history (app, user, session, action, entry) VALUES (?, ?, ?, ?, ?)",
+                (app, user, session, entry.get("action", "interaction"), json.dumps(entry, default=str)),
+            )
+            self._db.commit()
+            self._appends[key] += 1
+            due = self._appends[key] % self.compact_every == 0
+        if due:
+            self.compact(app, user, session)
+
+    def window(self, app: str, user: str, session: str, limit: int|None = None) -> list[dict]:
+        """The latest summary (if any) followed by the last `limit` entries, oldest first."""
+        limit = self.window_size if limit is None else limit
+        with self._lock:
+            summary = self._db.execute(
+                "SELECT entry FROM history WHERE app = ? AND user = ? AND session = ? AND action = 'summary' "
+                "ORDER BY seq DESC LIMIT 1",
+                (app, user, session),
+            ).fetchone()
+            rows = self._db.execute(
+                "SELECT entry FROM history WHERE app = ? AND user = ? AND session = ? AND action != 'summary' "
+                "ORDER BY seq DESC LIMIT ?",
+                (app, user, session, limit),
+            ).fetchall()
+        entries = [json.loads(row[0]) for row in reversed(rows)]
+        return ([json.loads(summary[0])] if summary else []) + entries
+
+    def compact(self, app: str, user: str, session: str):
+        """Fold everything older than the window (including the previous summary) into one summary entry."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT seq, entry FROM history WHERE app = ? AND user = ? AND session = ? "
+                "AND seq < (SELECT MIN(seq) FROM (SELECT seq FROM history WHERE app = ? AND user = ? "
+                "AND session = ? AND action != 'summary' ORDER BY seq DESC LIMIT ?)) ORDER BY seq",
+                (app, user, session, app, user, session, self.window_size),
+            ).fetchall()
+        if not rows:
+            return
+        old_entries = [json.loads(entry) for _, entry in rows]
+        previous = [entry["summary"] for entry in old_entries if entry.get("action") == "summary"]
+        summary = self.summarize([entry for entry in old_entries if entry.get("action") != "summary"])
+        entry = {
+            "action": "summary",
+            "timestamp": old_entries[-1].get("timestamp"),
+            "entries": sum(old.get("entries", 1) for old in old_entries),
+            # the newest part of the summary chain is kept, so the summary stays bounded too
+            "summary": " || ".join(previous[-1:] + [summary])[-MAX_SUMMARY_CHARS:],
+        }
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM history WHERE app = ? AND user = ? AND session = ? AND seq <= ?",
+                (app, user, session, rows[-1][0]),
+            )
+            # keep the summary before the remaining entries
+            self._db.execute(
+                "INSERT INTO history (seq, app, user, session, action, entry) VALUES (?, ?, ?, ?, 'summary', ?)",
+                (rows[-1][0], app, user, session, json.dumps(entry, default=str)),
+            )
+            self._db.commit()
+
+    def clear(self, app: str, user: str, session: str):
+        with self._lock:
+            self._db.execute("DELETE FROM history WHERE app = ? AND user = ? AND session = ?", (app, user, session))
+            self._db.commit()
+            self._appends.pop((app, user, session), None)
+
+
+history_store = HistoryStore(os.environ.get("HISTORY_DB_PATH", ".cache/history.sqlite"))
@@ -0,0 +1,65 @@
+import os
+
+from google.adk.models import LlmResponse
+
+from src.log_agent.analysis_index import group_fingerprint
+from src.log_agent.routing import routed_model
+from src.shared.llm_cache import analysis_key, code_revision, normalize, response_cache
+from src.shared.tracing import span
+
+# agents whose answer depends on the code: their keys include the revision of state["code_urls"]
+CODE_AGENTS = {"code_analyzer"}
+
+# cache keys of requests sent to the model, waiting for their response
+_pending_keys: dict[tuple[str, str], str] = {}
+
+
+def _request_key(callback_context, llm_request) -> str|None:
+    """
+    Key of the request from the analysed group, not from the session: None (not cached) if the
+    invocation has no error group, e.g. a follow-up question.
+    """
+    group = group_fingerprint(callback_context)
+    if not group:
+        return None
+    context = callback_context._invocation_context
+    tool_results = []
+    for event in context.session.events:
+        if event.invocation_id == context.invocation_id and event.author == callback_context.agent_name:
+            tool_results += [normalize(str(response.response)) for response in event.get_function_responses()]
+    code = code_revision(str(callback_context.state.get("code_urls") or "")) \
+        if callback_context.agent_name in CODE_AGENTS else []
+    return analysis_key(callback_context.agent_name, routed_model(callback_context.agent_name, llm_request) or "",
+                        group, code, tool_results)
+
+
+def before_model_cache_callback(callback_context, llm_request):
+    """
+    Answer the model call from the response cache if the same step was run for the same error group,
+    code revision and model before.
+    """
+    if os.environ.get("LLM_CACHE_DISABLED"):
+        return None
+    key = _request_key(callback_context, llm_request)
+    if key is None:
+        return None
+    with span("llm_cache.lookup", kind="cache", agent=callback_context.agent_name) as current:
+        cached = response_cache.get(key)
+        current.set_attribute("cache.hit", cached is not None)
+    if cached is not None:
+        print(f"[llm cache] hit for {callback_context.agent_name}")
+        return LlmResponse.model_validate_json(cached)
+    _pending_keys[(callback_context.invocation_id, callback_context.agent_name)] = key
+    return None
+
+
+def after_model_cache_callback(callback_context, llm_response):
+    """
+    Store the complete, successful model response under the key computed before the call.
+    """
+    if llm_response.partial:
+        return None
+    key = _pending_keys.pop((callback_context.invocation_id, callback_context.agent_name), None)
+    if key and not llm_response.error_code and llm_response.content:
+        response_cache.put(key, llm_response.model_dump_json(exclude_none=True))
+    return None
@@ -0,0 +1,144 @@
+"""
+Packed analysis
+
+Analyzes several error groups in one model call instead of one log_analyzer call per group.
+Code snippets shared between groups are sent once, the model answers with one entry per group,
+and groups are split over several calls when a pack would exceed the token budget.
+"""
+import asyncio
+import hashlib
+import json
+import os
+
+from google import genai
+from google.genai import types
+from pydantic import BaseModel, Field
+
+from src.shared.rate_limit import call_with_retries_async
+from src.shared.tokens import estimate_tokens
+from src.log_agent.sources.backends import fetch_file_urls
+from src.log_agent.subagents.code_extractor.tools import resolve_code_urls
+
+PACK_TOKEN_BUDGET = int(os.environ.get("PACK_TOKEN_BUDGET", "100000"))
+
+PACKED_INSTRUCTION = """
+You are a Log Analyzer Agent. You receive several error groups and the source files they reference.
+
+## ACTION
+- Analyze each group independently, using the snippets listed in its 'snippet_ids'.
+- Summarize the error, its likely cause and how to fix it.
+- Show the code change as before and after, with file path and line number. Only quote code from the snippets.
+
+## OUTPUT
+- Return exactly one entry per group, with its 'group_id'.
+- Keep each analysis brief and actionable for developers.
+"""
+
+
+class GroupAnalysis(BaseModel):
+    group_id: int = Field(description="The group_id of the analyzed error group")
+    title: str = Field(description="One line title of the issue")
+    analysis: str = Field(description="Cause of the error and recommendation, with before/after code")
+
+
+class PackedAnalysis(BaseModel):
+    analyses: list[GroupAnalysis]
+
+
+def _snippet_id(content: str) -> str:
+    return hashlib.sha256(content.encode()).hexdigest()[:12]
+
+
+def prepare_groups(groups: list[dict]) -> tuple[list[dict], dict[str, dict]]:
+    """
+    Resolve and fetch the code of every group, deduplicating identical snippets across groups.
+    :return: (groups with a 'snippet_ids' list, snippets by id)
+    """
+    code_urls = {index: resolve_code_urls(group) for index, group in enumerate(groups, 1)}
+    contents = fetch_file_urls([url for urls in code_urls.values() for url in urls])
+    snippets, prepared = {}, []
+    for index, group in enumerate(groups, 1):
+        snippet_ids = []
+        for url in code_urls[index]:
+            if url in contents:
+                snippet_id = _snippet_id(contents[url])
+                snippets.setdefault(snippet_id, {"url": url, "code": contents[url]})
+                snippet_ids.append(snippet_id)
+        prepared.append({"group_id": index, **group, "snippet_ids": snippet_ids})
+    return prepared, snippets
+
+
+def _group_tokens(group: dict, snippet_ids: list[str], snippets: dict[str, dict]) -> int:
+    tokens = estimate_tokens(json.dumps(group, default=str))
+    return tokens + sum(estimate_tokens(snippets[sid]["code"]) for sid in dict.fromkeys(snippet_ids))
+
+
+def build_packs(groups: list[dict], snippets: dict[str, dict], budget: int = PACK_TOKEN_BUDGET) -> list[list[dict]]:
+    """
+    Split groups into packs whose groups plus referenced snippets stay within the token budget.
+    A group that alone exceeds the budget gets a pack of its own.
+    """
+    base_tokens = estimate_tokens(PACKED_INSTRUCTION)
+    packs, current, current_snippets, current_tokens = [], [], set(), base_tokens
+    for group in groups:
+        tokens = _group_tokens(group, [sid for sid in group["snippet_ids"] if sid not in current_snippets], snippets)
+        if current and current_tokens + tokens > budget:
+            packs.append(current)
+            current, current_snippets, current_tokens = [], set(), base_tokens
+            tokens = _group_tokens(group, group["snippet_ids"], snippets)
+        current.append(group)
+        current_snippets.update(group["snippet_ids"])
+        current_tokens += tokens
+    if current:
+        packs.append(current)
+    return packs
+
+
+def _pack_prompt(pack: list[dict], snippets: dict[str, dict]) -> str:
+    snippet_ids = dict.fromkeys(sid for group in pack for sid in group["snippet_ids"])
+    sections = ["## ERROR GROUPS", json.dumps(pack, default=str, indent=1), "## SNIPPETS"]
+    for sid in snippet_ids:
+        sections.append(f"### snippet {sid} ({snippets[sid]['url']})\n{snippets[sid]['code']}")
+    return "\n\n".join(sections)
+
+
+async def analyze_pack(client: genai.Client, model: str, pack: list[dict], snippets: dict[str, dict],
+                       usage: dict) -> list[GroupAnalysis]:
+    prompt = _pack_prompt(pack, snippets)
+    response = await call_with_retries_async(
+        "gemini", client.aio.models.generate_content,
+        model=model,
+        contents=prompt,
+        config=types.GenerateContentConfig(
+            system_instruction=PACKED_INSTRUCTION,
+            response_mime_type="application/json",
+            response_schema=PackedAnalysis,
+        ),
+    )
+    usage["llm_calls"] += 1
+    usage["prompt_tokens"] += estimate_tokens(PACKED_INSTRUCTION + prompt)
+    usage["output_tokens"] += estimate_tokens(response.text or "")
+    parsed = response.parsed if isinstance(response.parsed, PackedAnalysis) else PackedAnalysis.model_validate_json(response.text)
+    return parsed.analyses
+
+
+async def analyze_packed(groups: list[dict], model: str = "gemini-2.0-flash",
+                         budget: int = PACK_TOKEN_BUDGET, usage: dict|None = None) -> list[dict]:
+    """
+    Analyze all groups with as few model calls as the budget allows.
+    :return: One result per group with 'index', 'group' and 'report', in group order
+    """
+    usage = usage if usage is not None else {"llm_calls": 0, "prompt_tokens": 0, "output_tokens": 0}
+    prepared, snippets = await asyncio.to_thread(prepare_groups, groups)
+    packs = build_packs(prepared, snippets, budget)
+    print(f"Packed {len(groups)} groups and {len(snippets)} unique snippets into {len(packs)} request(s)")
+
+    client = genai.Client()
+    pack_results = await asyncio.gather(*(analyze_pack(client, model, pack, snippets, usage) for pack in packs))
+    analyses = {analysis.group_id: analysis for result in pack_results for analysis in result}
+    results = []
+    for index, group in enumerate(groups, 1):
+        analysis = analyses.get(index)
+        report = f"Title: {analysis.title}\n{analysis.analysis}" if analysis else "(no analysis returned)"
+        results.append({"index": index, "group": group, "report": report})
+    return results
@@ -0,0 +1,52 @@
+"""
+Rate-limited Gemini model
+
+ADK model wrapper over the shared provider limits of src.shared.rate_limit.
+"""
+import asyncio
+import time
+
+from google.adk.models import Gemini, LlmResponse
+from google.genai import types
+
+from src.shared.deadline import cut_short
+from src.shared.rate_limit import (MAX_ATTEMPTS, call_deadline, provider_limits, retry_delay,
+                                   status_and_headers)
+
+
+class RetryingGemini(Gemini):
+    """
+    Gemini model whose calls go through the shared gemini rate limiter and are retried when
+    throttled or unavailable, as long as nothing of the response has been streamed yet.
+    A call is stopped at the investigation's deadline; what was streamed so far is kept.
+    """
+    async def generate_content_async(self, llm_request, stream: bool = False):
+        deadline = call_deadline(None, fetch=False)
+        for attempt in range(MAX_ATTEMPTS):
+            await provider_limits["gemini"].acquire_async()
+            responses = super().generate_content_async(llm_request, stream)
+            started = False
+            try:
+                while True:
+                    # bounded per step, never across a yield: the consumer may resume this generator in another task
+                    async with asyncio.timeout(deadline - time.monotonic()):
+                        response = await anext(responses)
+                    started = True
+                    yield response
+            except StopAsyncIteration:
+                return
+            except TimeoutError:
+                cut_short(f"{self.model} call",
+                          "response cut off at the deadline" if started else "no response before the deadline")
+                yield LlmResponse(content=types.Content(role="model", parts=[types.Part(
+                    text="(The investigation ran out of time; this answer is incomplete.)"
+                )]))
+                return
+            except Exception as e:
+                provider_limits["gemini"].update_from_headers(status_and_headers(e)[1])
+                delay = None if started else retry_delay("gemini", e, attempt, deadline)
+                if delay is None:
+                    raise
+            finally:
+                await responses.aclose()
+            await asyncio.sleep(delay)
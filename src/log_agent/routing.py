@@ -0,0 +1,125 @@
+"""
+Model routing of the agents
+
+Every model call of an agent is sent either to the agent's fast or strong model, chosen by
+src.shared.routing from the policy table below. The fast route is the agent's own model; agents that
+already run on their strongest model (log_filter, code_extractor) are not routed unless the policy
+file gives them a cheaper fast route.
+
+The outcome of a call is what the agent is for: log_filter's get_filtered_logs arguments parse into
+LogFilterInputSchema, code_extractor answers with a list of URLs, the analyzers answer with a report.
+Intermediate calls (other tool calls) are recorded without an outcome.
+
+The defaults can be overridden per step with a JSON file at ROUTING_POLICY_PATH, e.g.
+{"code_analyzer": {"max_fast_tokens": 12000}}. ROUTING_DISABLED keeps each agent's own model.
+"""
+import json
+import time
+
+from pydantic import ValidationError
+
+from src.log_agent.subagents.log_filter.models import LogFilterInputSchema
+from src.shared.routing import choose_route, load_policy, route_metrics
+from src.shared.tokens import estimate_tokens
+from src.shared.tracing import annotate
+
+DEFAULT_POLICY = {
+    "log_analyzer": {"fast": "gemini-2.0-flash", "strong": "gemini-2.5-flash",
+                     "max_fast_tokens": 6000, "max_fast_frames": 10},
+    "code_analyzer": {"fast": "gemini-2.0-flash", "strong": "gemini-2.5-flash",
+                      "max_fast_tokens": 8000, "max_fast_frames": 10},
+}
+policy = load_policy(DEFAULT_POLICY)
+
+# route ("default" if not routed), model, start time and prompt tokens of requests waiting for their response
+_pending_routes: dict[tuple[str, str], tuple[str|None, str, float, int]] = {}
+
+
+def _request_text(llm_request) -> str:
+    config = llm_request.config
+    text = str(config.system_instruction) if config and config.system_instruction else ""
+    return text + json.dumps([content.model_dump(mode="json", exclude_none=True) for content in llm_request.contents])
+
+
+def routed_model(agent_name: str, llm_request) -> str:
+    """The model before_model_route_callback will send the request to, without recording anything."""
+    chosen = choose_route(policy, agent_name, _request_text(llm_request))
+    return chosen[1] if chosen else llm_request.model
+
+
+def _filter_call_parsed(parts) -> bool|None:
+    calls = [part.function_call for part in parts
+             if part.function_call and part.function_call.name == "get_filtered_logs"]
+    if not calls:
+        return None
+    try:
+        for call in calls:
+            LogFilterInputSchema.model_validate(call.args or {})
+    except ValidationError:
+        return False
+    return True
+
+
+def _code_urls_parsed(parts) -> bool|None:
+    if any(part.function_call for part in parts):
+        return None
+    text = "".join(part.text or "" for part in parts).strip().removeprefix("```json").removesuffix("```")
+    try:
+        urls = json.loads(text).get("code_urls")
+    except (ValueError, AttributeError):
+        return False
+    return isinstance(urls, list) and all(isinstance(url, str) and url.startswith("http") for url in urls)
+
+
+def _report_written(parts) -> bool|None:
+    if any(part.function_call for part in parts):
+        return None
+    return bool("".join(part.text or "" for part in parts).strip())
+
+
+# outcome of one model call of an agent: True / False, or None if the call has none (e.g. an intermediate tool call)
+OUTCOME_CHECKS = {"log_filter": _filter_call_parsed, "code_extractor": _code_urls_parsed}
+
+
+def outcome(agent_name: str, llm_response) -> bool|None:
+    if llm_response.error_code:
+        return False
+    parts = llm_response.content.parts if llm_response.content and llm_response.content.parts else []
+    return OUTCOME_CHECKS.get(agent_name, _report_written)(parts)
+
+
+def before_model_route_callback(callback_context, llm_request):
+    """
+    Send the request to the model chosen by the policy. Never answers the request itself.
+    """
+    text = _request_text(llm_request)
+    chosen = choose_route(policy, callback_context.agent_name, text)
+    route, model = chosen or ("default", llm_request.model)
+    llm_request.model = model
+    _pending_routes[(callback_context.invocation_id, callback_context.agent_name)] = (
+        route, model, time.perf_counter(), estimate_tokens(text)
+    )
+    return None
+
+
+def after_model_route_callback(callback_context, llm_response):
+    """
+    Record latency, estimated tokens and outcome of the call, and the tokens on the call_llm span.
+    """
+    if llm_response.partial:
+        return None
+    pending = _pending_routes.pop((callback_context.invocation_id, callback_context.agent_name), None)
+    if pending is None:
+        return None
+    route, model, started, prompt_tokens = pending
+    parts = llm_response.content.parts if llm_response.content and llm_response.content.parts else []
+    output = "".join(part.text or "" for part in parts) + "".join(
+        json.dumps(part.function_call.args or {}) for part in parts if part.function_call
+    )
+    annotate(model=model, tokens_prompt=prompt_tokens, tokens_output=estimate_tokens(output))
+    route_metrics.record(
+        callback_context.agent_name, route, model, time.perf_counter() - started,
+        prompt_tokens, estimate_tokens(output), success=outcome(callback_context.agent_name, llm_response),
+    )
+    return None
+
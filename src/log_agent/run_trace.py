@@ -0,0 +1,72 @@
+"""
+Run trace
+
+Fixed-size buffer of the agent and tool events of recent runs, kept outside the session state so it
+is never serialized with the session. Each run (invocation) keeps at most `max_events` events and
+only the last `max_runs` runs are kept. Open tool calls are indexed by their function call id, so
+completing one is a dict lookup instead of a scan of the trace.
+"""
+import threading
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any
+
+MAX_EVENTS = 256
+MAX_RUNS = 16
+
+
+@dataclass(slots=True)
+class AgentEvent:
+    agent: str
+    input: str
+
+
+@dataclass(slots=True)
+class ToolEvent:
+    name: str
+    args: dict[str, Any] = field(default_factory=dict)
+    output: Any = None
+    done: bool = False
+
+
+class RunTrace:
+    """Ring buffers of typed events per invocation."""
+    def __init__(self, max_events: int = MAX_EVENTS, max_runs: int = MAX_RUNS):
+        self.max_events = max_events
+        self.max_runs = max_runs
+        self._lock = threading.Lock()
+        self._runs: OrderedDict[str, deque] = OrderedDict()
+        self._open: dict[tuple[str, str], ToolEvent] = {}
+
+    def _run(self, invocation_id: str) -> deque:
+        # must be called with self._lock held
+        events = self._runs.get(invocation_id)
+        if events is None:
+            events = self._runs[invocation_id] = deque(maxlen=self.max_events)
+            while len(self._runs) > self.max_runs:
+                evicted, _ = self._runs.popitem(last=False)
+                self._open = {key: event for key, event in self._open.items() if key[0] != evicted}
+        return events
+
+    def agent_started(self, invocation_id: str, agent: str, input_text: str):
+        with self._lock:
+            self._run(invocation_id).append(AgentEvent(agent=agent, input=input_text))
+
+    def tool_started(self, invocation_id: str, call_id: str, name: str, args: dict):
+        event = ToolEvent(name=name, args=dict(args))
+        with self._lock:
+            self._run(invocation_id).append(event)
+            self._open[(invocation_id, call_id)] = event
+
+    def tool_finished(self, invocation_id: str, call_id: str, output: Any):
+        with self._lock:
+            event = self._open.pop((invocation_id, call_id), None)
+        if event is not None:
+            event.output, event.done = output, True
+
+    def events(self, invocation_id: str) -> list[AgentEvent | ToolEvent]:
+        with self._lock:
+            return list(self._runs.get(invocation_id, ()))
+
+
+run_trace = RunTrace()
@@ -0,0 +1,210 @@
+"""
+Investigation service
+
+Async HTTP front end of root_agent, so the on-call team can run investigations concurrently from
+one process. All runs share one Runner and one persistent session service and run on the same
+event loop; the agents' blocking tools run in worker threads, so a run waiting on Datadog, GitLab or
+a rate limit backoff does not hold up the others. At most MAX_CONCURRENT_RUNS investigations run at a time, up to MAX_QUEUED_RUNS more
+wait for a slot, and anything beyond that is rejected with 429 and a Retry-After header instead
+of piling up. Events of a run are streamed as server-sent events; the run advances only as fast
+as the client reads them, and stops when the client disconnects. Every run has the time budget of
+src.log_agent.deadline (a session can set its own with a `time_budget` state value); the done event
+lists the stages that were cut short by it.
+
+    python -m src.log_agent.server --port 8000
+    curl -X POST localhost:8000/sessions -H 'content-type: application/json' -d '{"user_id": "alice"}'
+    curl -N -X POST localhost:8000/sessions/<id>/runs -H 'content-type: application/json' \
+        -d '{"user_id": "alice", "query": "errors of document in prod, last 24 hours"}'
+"""
+import argparse
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from google.adk.agents.run_config import RunConfig, StreamingMode
+from google.adk.runners import Runner
+from google.genai import types
+from pydantic import BaseModel, Field
+
+from src.log_agent.agent import root_agent
+from src.shared.deadline import cut_stages
+from src.log_agent.history import history_store
+from src.log_agent.sessions import SqliteSessionService
+from src.shared.tracing import setup_tracing
+from src.utils import add_agent_response_to_history, add_user_query_to_history
+
+APP_NAME = "Customer Support"
+MAX_CONCURRENT_RUNS = int(os.environ.get("MAX_CONCURRENT_RUNS", "8"))
+MAX_QUEUED_RUNS = int(os.environ.get("MAX_QUEUED_RUNS", "32"))
+RETRY_AFTER_SECONDS = 30
+
+
+class CreateSessionRequest(BaseModel):
+    user_id: str = Field(description="On-call engineer the session belongs to")
+    state: dict = Field(default_factory=dict, description="Initial session state")
+
+
+class RunRequest(BaseModel):
+    user_id: str = Field(description="On-call engineer the session belongs to")
+    query: str = Field(description="Investigation request, e.g. project, level, period and environment")
+
+
+class RunScheduler:
+    """
+    Admission control for runs: a bounded number run, a bounded number wait, the rest are rejected.
+    A session runs one investigation at a time.
+    """
+    def __init__(self, max_running: int = MAX_CONCURRENT_RUNS, max_queued: int = MAX_QUEUED_RUNS):
+        self.max_running = max_running
+        self.max_queued = max_queued
+        self.running = 0
+        self.queued = 0
+        self._slots = asyncio.Semaphore(max_running)
+        self._busy_sessions: set[str] = set()
+
+    def admit(self, session_id: str) -> dict:
+        """
+        Reserve a place in the queue for a run of the session, or raise 409 / 429.
+        :return: Ticket to pass to run() and release()
+        """
+        if session_id in self._busy_sessions:
+            raise HTTPException(409, "An investigation is already running in this session")
+        if self.running + self.queued >= self.max_running + self.max_queued:
+            raise HTTPException(429, "Too many investigations in progress",
+                                headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+        self._busy_sessions.add(session_id)
+        self.queued += 1
+        return {"session_id": session_id, "status": "queued"}
+
+    @asynccontextmanager
+    async def run(self, ticket: dict):
+        """Wait for a free slot and hold it while the run executes."""
+        async with self._slots:
+            self.queued -= 1
+            self.running += 1
+            ticket["status"] = "running"
+            try:
+                yield
+            finally:
+                self.running -= 1
+                self.release(ticket)
+
+    def release(self, ticket: dict):
+        """Give up the ticket; safe to call more than once, e.g. when the client left while queued."""
+        if ticket["status"] == "queued":
+            self.queued -= 1
+        if ticket["status"] != "released":
+            ticket["status"] = "released"
+            self._busy_sessions.discard(ticket["session_id"])
+
+    def status(self) -> dict:
+        return {"running": self.running, "queued": self.queued,
+                "max_running": self.max_running, "max_queued": self.max_queued}
+
+
+session_service = SqliteSessionService(os.environ.get("SESSION_DB_PATH", ".cache/sessions.sqlite"))
+runner = Runner(agent=root_agent, app_name=APP_NAME, session_service=session_service)
+scheduler = RunScheduler()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    setup_tracing()
+    yield
+
+
+app = FastAPI(title="Log agent investigations", lifespan=lifespan)
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _event_payload(event) -> dict:
+    parts = event.content.parts if event.content and event.content.parts else []
+    return {
+        "id": event.id,
+        "author": event.author,
+        "partial": bool(event.partial),
+        "final": event.is_final_response(),
+        "text": "".join(part.text or "" for part in parts),
+        "function_calls": [part.function_call.name for part in parts if part.function_call],
+    }
+
+
+async def _stream_run(session_id: str, request: RunRequest, ticket: dict):
+    content = types.Content(role="user", parts=[types.Part(text=request.query)])
+    try:
+        if scheduler.running >= scheduler.max_running:
+            yield _sse("queued", {"queued": scheduler.queued})
+        async with scheduler.run(ticket):
+            yield _sse("started", {"session_id": session_id})
+            await asyncio.to_thread(add_user_query_to_history, session_service, APP_NAME, request.user_id,
+                                    session_id, request.query)
+            final_text, author = None, None
+            async for event in runner.run_async(user_id=request.user_id, session_id=session_id, new_message=content,
+                                                run_config=RunConfig(streaming_mode=StreamingMode.SSE)):
+                payload = _event_payload(event)
+                if payload["final"] and payload["text"] and not payload["partial"]:
+                    final_text, author = payload["text"], event.author
+                yield _sse("event", payload)
+            if final_text:
+                await asyncio.to_thread(add_agent_response_to_history, session_service, APP_NAME, request.user_id,
+                                        session_id, author, final_text)
+            yield _sse("done", {"session_id": session_id, "final": final_text, "cut_short": cut_stages()})
+    except Exception as e:
+        yield _sse("error", {"message": str(e)})
+    finally:
+        scheduler.release(ticket)
+
+
+@app.get("/health")
+async def health() -> dict:
+    return scheduler.status()
+
+
+@app.post("/sessions")
+async def create_session(request: CreateSessionRequest) -> dict:
+    session = await asyncio.to_thread(
+        session_service.create_session, app_name=APP_NAME, user_id=request.user_id, state=request.state
+    )
+    return {"session_id": session.id}
+
+
+@app.post("/sessions/{session_id}/runs")
+async def run_investigation(session_id: str, request: RunRequest) -> StreamingResponse:
+    session = await asyncio.to_thread(
+        session_service.get_session, app_name=APP_NAME, user_id=request.user_id, session_id=session_id
+    )
+    if session is None:
+        raise HTTPException(404, "Session not found")
+    ticket = scheduler.admit(session_id)
+    # the background task frees the ticket even if the client disconnects before the stream starts
+    return StreamingResponse(_stream_run(session_id, request, ticket), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+                             background=BackgroundTask(scheduler.release, ticket))
+
+
+@app.get("/sessions/{session_id}")
+async def get_session(session_id: str, user_id: str) -> dict:
+    session = await asyncio.to_thread(
+        session_service.get_session, app_name=APP_NAME, user_id=user_id, session_id=session_id
+    )
+    if session is None:
+        raise HTTPException(404, "Session not found")
+    return {"session_id": session.id, "state": session.state, "events": len(session.events),
+            "history": await asyncio.to_thread(history_store.window, APP_NAME, user_id, session_id)}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve log investigations over HTTP.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+    uvicorn.run(app, host=args.host, port=args.port)
@@ -0,0 +1,238 @@
+"""
+SQLite session service
+
+Persistent drop-in for InMemorySessionService. Sessions are stored as a state snapshot plus the
+appended events, whose state deltas are replayed on load; after SNAPSHOT_EVERY deltas the snapshot
+is rolled forward so a resume never replays more than that. The database runs in WAL mode and all
+writes go through a single writer thread that commits in batches, so append_event returns without
+waiting for the disk and never blocks the event loop. Reads wait only for the pending writes of the
+session they read (or of the user's sessions, for a listing), so they see the session as the runner
+left it without waiting for the writes of every other run.
+
+An event counts as stored once it is queued: the queue is flushed on a normal exit, but events that
+are acknowledged and still queued when the process crashes are lost.
+"""
+import atexit
+import copy
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Optional
+
+from google.adk.events import Event
+from google.adk.sessions import Session
+from google.adk.sessions.base_session_service import (BaseSessionService, GetSessionConfig, ListEventsResponse,
+                                                      ListSessionsResponse)
+from google.adk.sessions.state import State
+
+SNAPSHOT_EVERY = int(os.environ.get("SESSION_SNAPSHOT_EVERY", "50"))
+
+# the statements are constant and parameterized, so sqlite3's statement cache prepares each one once
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS sessions (app TEXT NOT NULL, user TEXT NOT NULL, session TEXT NOT NULL, "
+    "state TEXT NOT NULL, snapshot_seq INTEGER NOT NULL DEFAULT 0, deltas INTEGER NOT NULL DEFAULT 0, "
+    "last_update REAL NOT NULL, PRIMARY KEY (app, user, session))",
+    # finds the sessions due for a snapshot after every write batch without scanning them all
+    "CREATE INDEX IF NOT EXISTS sessions_deltas ON sessions (deltas)",
+    "CREATE TABLE IF NOT EXISTS events (seq INTEGER PRIMARY KEY AUTOINCREMENT, app TEXT NOT NULL, "
+    "user TEXT NOT NULL, session TEXT NOT NULL, timestamp REAL NOT NULL, state_delta TEXT, event TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS events_session ON events (app, user, session, seq)",
+    "CREATE TABLE IF NOT EXISTS app_state (app TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+    "PRIMARY KEY (app, key))",
+    "CREATE TABLE IF NOT EXISTS user_state (app TEXT NOT NULL, user TEXT NOT NULL, key TEXT NOT NULL, "
+    "value TEXT NOT NULL, PRIMARY KEY (app, user, key))",
+]
+INSERT_SESSION = ("INSERT OR REPLACE INTO sessions (app, user, session, state, snapshot_seq, deltas, last_update) "
+                  "VALUES (?, ?, ?, ?, 0, 0, ?)")
+SELECT_SESSION = "SELECT state, snapshot_seq, last_update FROM sessions WHERE app = ? AND user = ? AND session = ?"
+INSERT_EVENT = ("INSERT INTO events (app, user, session, timestamp, state_delta, event) VALUES (?, ?, ?, ?, ?, ?)")
+UPDATE_SESSION = ("UPDATE sessions SET deltas = deltas + ?, last_update = ? "
+                  "WHERE app = ? AND user = ? AND session = ?")
+SELECT_DELTAS = ("SELECT seq, state_delta FROM events WHERE app = ? AND user = ? AND session = ? AND seq > ? "
+                 "AND state_delta IS NOT NULL ORDER BY seq")
+SELECT_EVENTS = "SELECT event FROM events WHERE app = ? AND user = ? AND session = ? ORDER BY seq"
+SELECT_RECENT_EVENTS = ("SELECT event FROM (SELECT seq, event FROM events WHERE app = ? AND user = ? AND session = ? "
+                        "ORDER BY seq DESC LIMIT ?) ORDER BY seq")
+SELECT_EVENTS_AFTER = ("SELECT event FROM events WHERE app = ? AND user = ? AND session = ? AND timestamp >= ? "
+                       "ORDER BY seq")
+SELECT_DUE_SNAPSHOTS = "SELECT app, user, session FROM sessions WHERE deltas >= ?"
+UPDATE_SNAPSHOT = ("UPDATE sessions SET state = ?, snapshot_seq = ?, deltas = 0 "
+                   "WHERE app = ? AND user = ? AND session = ?")
+UPSERT_APP_STATE = "INSERT OR REPLACE INTO app_state (app, key, value) VALUES (?, ?, ?)"
+UPSERT_USER_STATE = "INSERT OR REPLACE INTO user_state (app, user, key, value) VALUES (?, ?, ?, ?)"
+SELECT_APP_STATE = "SELECT key, value FROM app_state WHERE app = ?"
+SELECT_USER_STATE = "SELECT key, value FROM user_state WHERE app = ? AND user = ?"
+SELECT_SESSIONS = "SELECT session, last_update FROM sessions WHERE app = ? AND user = ?"
+DELETE_SESSION = "DELETE FROM sessions WHERE app = ? AND user = ? AND session = ?"
+DELETE_EVENTS = "DELETE FROM events WHERE app = ? AND user = ? AND session = ?"
+
+
+class SqliteSessionService(BaseSessionService):
+    """
+    Session service backed by SQLite (WAL), storing state deltas with a periodically rolled snapshot.
+    """
+    def __init__(self, path: str, snapshot_every: int = SNAPSHOT_EVERY):
+        self.snapshot_every = snapshot_every
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, cached_statements=64)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        for statement in SCHEMA:
+            self._db.execute(statement)
+        self._db.commit()
+        self._lock = threading.Lock()
+        self._writes = queue.Queue()
+        # queued, uncommitted writes per (app, user, session)
+        self._pending: dict[tuple[str, str, str], int] = {}
+        self._committed = threading.Condition()
+        threading.Thread(target=self._write_loop, name="session-writer", daemon=True).start()
+        atexit.register(self.flush)
+
+    # --- writer ---
+    def _write_loop(self):
+        while True:
+            batch = [self._writes.get()]
+            while True:
+                try:
+                    batch.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with self._lock:
+                    for _, statement, params in batch:
+                        self._db.execute(statement, params)
+                    self._db.commit()
+                    self._roll_snapshots()
+            except sqlite3.Error as e:
+                print(f"Session write failed: {e}")
+            finally:
+                with self._committed:
+                    for key, _, _ in batch:
+                        self._pending[key] -= 1
+                        if not self._pending[key]:
+                            del self._pending[key]
+                    self._committed.notify_all()
+                for _ in batch:
+                    self._writes.task_done()
+
+    def _write(self, key: tuple[str, str, str], statement: str, params: tuple):
+        with self._committed:
+            self._pending[key] = self._pending.get(key, 0) + 1
+        self._writes.put((key, statement, params))
+
+    def _wait_for(self, app: str, user: str, session: Optional[str] = None):
+        """Wait until the queued writes of the session, or of all the user's sessions, are committed."""
+        with self._committed:
+            self._committed.wait_for(lambda: not any(
+                key[:2] == (app, user) and session in (None, key[2]) for key in self._pending
+            ))
+
+    def flush(self):
+        """Wait until every queued write is committed."""
+        self._writes.join()
+
+    def _roll_snapshots(self):
+        for app, user, session in self._db.execute(SELECT_DUE_SNAPSHOTS, (self.snapshot_every,)).fetchall():
+            state, snapshot_seq = self._load_state(app, user, session)
+            self._db.execute(UPDATE_SNAPSHOT, (json.dumps(state, default=str), snapshot_seq, app, user, session))
+        self._db.commit()
+
+    # --- reads ---
+    def _load_state(self, app: str, user: str, session: str) -> tuple[dict, int]:
+        row = self._db.execute(SELECT_SESSION, (app, user, session)).fetchone()
+        state, seq = json.loads(row[0]), row[1]
+        for seq, delta in self._db.execute(SELECT_DELTAS, (app, user, session, row[1])):
+            for key, value in json.loads(delta).items():
+                if not key.startswith((State.APP_PREFIX, State.USER_PREFIX, State.TEMP_PREFIX)):
+                    state[key] = value
+        return state, seq
+
+    def _merge_state(self, app: str, user: str, session: Session) -> Session:
+        for key, value in self._db.execute(SELECT_APP_STATE, (app,)):
+            session.state[State.APP_PREFIX + key] = json.loads(value)
+        for key, value in self._db.execute(SELECT_USER_STATE, (app, user)):
+            session.state[State.USER_PREFIX + key] = json.loads(value)
+        return session
+
+    def create_session(self, *, app_name: str, user_id: str, state: Optional[dict[str, Any]] = None,
+                       session_id: Optional[str] = None) -> Session:
+        session_id = session_id.strip() if session_id and session_id.strip() else str(uuid.uuid4())
+        session = Session(app_name=app_name, user_id=user_id, id=session_id, state=copy.deepcopy(state or {}),
+                          last_update_time=time.time())
+        key = (app_name, user_id, session_id)
+        self._write(key, INSERT_SESSION, key + (json.dumps(session.state, default=str), session.last_update_time))
+        self._write(key, DELETE_EVENTS, key)
+        self._wait_for(*key)
+        with self._lock:
+            return self._merge_state(app_name, user_id, session)
+
+    def get_session(self, *, app_name: str, user_id: str, session_id: str,
+                    config: Optional[GetSessionConfig] = None) -> Optional[Session]:
+        key = (app_name, user_id, session_id)
+        self._wait_for(*key)
+        with self._lock:
+            row = self._db.execute(SELECT_SESSION, key).fetchone()
+            if row is None:
+                return None
+            state, _ = self._load_state(*key)
+            if config and config.num_recent_events:
+                rows = self._db.execute(SELECT_RECENT_EVENTS, key + (config.num_recent_events,)).fetchall()
+            elif config and config.after_timestamp:
+                rows = self._db.execute(SELECT_EVENTS_AFTER, key + (config.after_timestamp,)).fetchall()
+            else:
+                rows = self._db.execute(SELECT_EVENTS, key).fetchall()
+            session = Session(app_name=app_name, user_id=user_id, id=session_id, state=state,
+                              events=[Event.model_validate_json(event) for event, in rows], last_update_time=row[2])
+            return self._merge_state(app_name, user_id, session)
+
+    def list_sessions(self, *, app_name: str, user_id: str) -> ListSessionsResponse:
+        self._wait_for(app_name, user_id)
+        with self._lock:
+            rows = self._db.execute(SELECT_SESSIONS, (app_name, user_id)).fetchall()
+        return ListSessionsResponse(sessions=[
+            Session(app_name=app_name, user_id=user_id, id=session_id, last_update_time=last_update)
+            for session_id, last_update in rows
+        ])
+
+    def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        key = (app_name, user_id, session_id)
+        self._write(key, DELETE_EVENTS, key)
+        self._write(key, DELETE_SESSION, key)
+        self._wait_for(*key)
+
+    def list_events(self, *, app_name: str, user_id: str, session_id: str) -> ListEventsResponse:
+        self._wait_for(app_name, user_id, session_id)
+        with self._lock:
+            rows = self._db.execute(SELECT_EVENTS, (app_name, user_id, session_id)).fetchall()
+        return ListEventsResponse(events=[Event.model_validate_json(event) for event, in rows])
+
+    # --- writes ---
+    def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+        super().append_event(session=session, event=event)
+        session.last_update_time = event.timestamp
+
+        session_key = (session.app_name, session.user_id, session.id)
+        delta = event.actions.state_delta if event.actions and event.actions.state_delta else {}
+        for key, value in delta.items():
+            if key.startswith(State.APP_PREFIX):
+                self._write(session_key, UPSERT_APP_STATE, (session.app_name, key.removeprefix(State.APP_PREFIX),
+                                                            json.dumps(value, default=str)))
+            elif key.startswith(State.USER_PREFIX):
+                self._write(session_key, UPSERT_USER_STATE, (session.app_name, session.user_id,
+                                                             key.removeprefix(State.USER_PREFIX),
+                                                             json.dumps(value, default=str)))
+        session_delta = {key: value for key, value in delta.items() if not key.startswith(State.TEMP_PREFIX)}
+        self._write(session_key, INSERT_EVENT, session_key + (
+            event.timestamp,
+            json.dumps(session_delta, default=str) if session_delta else None,
+            event.model_dump_json(exclude_none=True),
+        ))
+        self._write(session_key, UPDATE_SESSION, (1 if session_delta else 0, event.timestamp) + session_key)
+        return event
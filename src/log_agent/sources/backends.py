@@ -0,0 +1,78 @@
+from typing import Protocol
+
+from src.shared.deadline import expired
+from src.shared.code_sources import GITLAB_URL, get_mirror, parse_file_url
+from src.shared.git_mirror import GitMirror
+from src.log_agent.sources.gitlab import fetch_blobs
+from src.shared.tracing import annotate, span
+
+
+class CodeSource(Protocol):
+    def read_many(self, project: str, ref: str, paths: list[str]) -> dict[str, str]:
+        """Return the contents of the given paths; paths that cannot be read are omitted."""
+        ...
+
+
+class GitLabSource:
+    """
+    Reads files over the GitLab API (GraphQL batch with REST fallback).
+    """
+    def __init__(self, base_url: str = GITLAB_URL):
+        self.base_url = base_url
+
+    def read_many(self, project: str, ref: str, paths: list[str]) -> dict[str, str]:
+        return fetch_blobs(project, ref, paths, base_url=self.base_url)
+
+
+class MirrorSource:
+    """
+    Reads files from a local bare mirror of the project.
+    """
+    def __init__(self, mirror: GitMirror):
+        self.mirror = mirror
+
+    def read_many(self, project: str, ref: str, paths: list[str]) -> dict[str, str]:
+        contents = {}
+        with span("mirror.read", kind="mirror", project=project, files=len(paths)):
+            for path in dict.fromkeys(paths):
+                content = self.mirror.read(ref, path)
+                if content is not None:
+                    contents[path] = content
+            annotate(bytes=sum(len(content) for content in contents.values()))
+        return contents
+
+
+def get_code_source(project: str, base_url: str = GITLAB_URL) -> CodeSource:
+    """
+    Select the code source for a project: its registered mirror if there is one, GitLab otherwise.
+    """
+    mirror = get_mirror(project)
+    return MirrorSource(mirror) if mirror else GitLabSource(base_url)
+
+
+def fetch_file_urls(code_urls: list[str]) -> dict[str, str]:
+    """
+    Fetch raw GitLab file URLs through the code source of each project,
+    batching URLs that point to the same project and ref.
+    Projects not read yet when the investigation's fetch deadline passes are left out.
+    :return: Dictionary with URL as key and file content as value (failed URLs are omitted)
+    """
+    groups: dict[tuple[str, str, str], list[tuple[str, str]]] = {}
+    for url in code_urls:
+        parsed = parse_file_url(url)
+        if not parsed:
+            print(f"Not a GitLab file URL: {url}")
+            continue
+        base_url, project, file_path, ref = parsed
+        groups.setdefault((base_url, project, ref), []).append((url, file_path))
+
+    code_snippets = {}
+    for (base_url, project, ref), entries in groups.items():
+        if expired(fetch=True):
+            break
+        contents = get_code_source(project, base_url).read_many(project, ref, [path for _, path in entries])
+        for url, file_path in entries:
+            if file_path in contents:
+                code_snippets[url] = contents[file_path]
+    return code_snippets
+
@@ -0,0 +1,135 @@
+import os
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+
+from src.shared.code_sources import GITLAB_URL, make_file_url
+from src.shared.deadline import DeadlineExceeded, timeout
+from src.shared.rate_limit import call_with_retries
+from src.shared.singleflight import flight
+from src.shared.tracing import annotate, in_current_context, span
+
+
+BLOBS_QUERY = """
+query($fullPath: ID!, $ref: String!, $paths: [String!]!) {
+  project(fullPath: $fullPath) {
+    repository {
+      blobs(ref: $ref, paths: $paths) {
+        nodes { path rawTextBlob }
+      }
+    }
+  }
+}
+"""
+
+
+class SourceCache:
+    """
+    Thread-safe in-process cache of file contents keyed by (project, ref, file_path).
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._files: dict[tuple[str, str, str], str] = {}
+
+    def get(self, project: str, ref: str, file_path: str) -> str|None:
+        with self._lock:
+            return self._files.get((project, ref, file_path))
+
+    def put(self, project: str, ref: str, file_path: str, content: str):
+        with self._lock:
+            self._files[(project, ref, file_path)] = content
+
+    def clear(self):
+        with self._lock:
+            self._files.clear()
+
+
+source_cache = SourceCache()
+
+
+def gitlab_headers() -> dict:
+    private_token = os.environ.get("GITLAB_TOKEN")
+    return {"PRIVATE-TOKEN": private_token} if private_token else {}
+
+
+def _fetch_blobs_graphql(base_url: str, project: str, ref: str, paths: list[str]) -> dict[str, str]:
+    """
+    Fetch many blobs of one project/ref in a single GraphQL request.
+    Returns only the paths GitLab could resolve as text.
+    """
+    private_token = os.environ.get("GITLAB_TOKEN")
+    headers = {"Authorization": f"Bearer {private_token}"} if private_token else {}
+    payload = {"query": BLOBS_QUERY, "variables": {"fullPath": project, "ref": ref, "paths": paths}}
+    try:
+        with span("gitlab.graphql_blobs", kind="gitlab", project=project, files=len(paths)):
+            response = call_with_retries("gitlab", requests.post, f"{base_url}/api/graphql", json=payload,
+                                         headers=headers, timeout=timeout(10))
+            annotate(bytes=len(response.content), http_status=response.status_code)
+        if response.status_code != 200:
+            print(f"GraphQL blob fetch failed for {project}@{ref}: HTTP {response.status_code}")
+            return {}
+        project_data = (response.json().get("data") or {}).get("project") or {}
+        nodes = (((project_data.get("repository") or {}).get("blobs")) or {}).get("nodes") or []
+        return {node["path"]: node["rawTextBlob"] for node in nodes if node.get("rawTextBlob") is not None}
+    except (requests.RequestException, ValueError, DeadlineExceeded) as e:
+        print(f"GraphQL blob fetch failed for {project}@{ref}: {e}")
+        return {}
+
+
+def _fetch_blob_rest(base_url: str, project: str, ref: str, file_path: str) -> str|None:
+    url = make_file_url(project, file_path, ref, base_url)
+    try:
+        with span("gitlab.raw_file", kind="gitlab", project=project):
+            response = call_with_retries("gitlab", requests.get, url, headers=gitlab_headers(), timeout=timeout(10))
+            annotate(bytes=len(response.content), http_status=response.status_code)
+        if response.status_code == 200:
+            return response.text
+        print(f"Failed to fetch {url}: HTTP {response.status_code}")
+    except (requests.RequestException, DeadlineExceeded) as e:
+        print(f"Error fetching {url}: {e}")
+    return None
+
+
+def _fetch_uncached(base_url: str, project: str, ref: str, paths: list[str], max_workers: int) -> dict[str, str]:
+    contents = {}
+    missing = []
+    for path in paths:
+        cached = source_cache.get(project, ref, path)
+        if cached is not None:
+            contents[path] = cached
+        else:
+            missing.append(path)
+    annotate(cache_hits=len(contents), cache_misses=len(missing))
+    if not missing:
+        return contents
+
+    fetched = _fetch_blobs_graphql(base_url, project, ref, missing) if len(missing) > 1 else {}
+    remaining = [path for path in missing if path not in fetched]
+    if remaining:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(remaining))) as executor:
+            fetch_rest = in_current_context(lambda path: _fetch_blob_rest(base_url, project, ref, path))
+            results = executor.map(fetch_rest, remaining)
+            fetched.update({path: content for path, content in zip(remaining, results) if content is not None})
+
+    for path, content in fetched.items():
+        source_cache.put(project, ref, path, content)
+    contents.update(fetched)
+    return contents
+
+
+def fetch_blobs(project: str, ref: str, paths: list[str], base_url: str = GITLAB_URL,
+                max_workers: int = 8) -> dict[str, str]:
+    """
+    Fetch the content of several files of one project/ref.
+    Paths already requested in this run are shared through the run's gitlab flight, cached files are served
+    from source_cache, the rest is requested with one GraphQL call, and anything GraphQL could not
+    deliver falls back to concurrent REST requests.
+    :return: Dictionary with file path as key and file content as value (missing files are omitted)
+    """
+    def fetch(keys: list[tuple]) -> dict[tuple, str]:
+        contents = _fetch_uncached(base_url, project, ref, [key[-1] for key in keys], max_workers)
+        return {key: contents.get(key[-1]) for key in keys}
+
+    with span("gitlab.fetch_blobs", kind="gitlab", project=project, files=len(paths)):
+        results = flight("gitlab").do_many([(base_url, project, ref, path) for path in paths], fetch)
+    return {key[-1]: content for key, content in results.items() if content is not None}
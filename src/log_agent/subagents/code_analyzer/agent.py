@@ -1,10 +1,16 @@
 from google.adk.agents import LlmAgent
 
+from src.log_agent.analysis_index import before_model_similarity_callback, after_model_similarity_callback
+from src.log_agent.callbacks import chain_callbacks, threaded_tool
+from src.log_agent.deadline import skip_when_expired_callback
+from src.log_agent.llm_cache import before_model_cache_callback, after_model_cache_callback
+from src.log_agent.rate_limit import RetryingGemini
+from src.log_agent.routing import before_model_route_callback, after_model_route_callback
 from src.log_agent.subagents.code_analyzer.tools import load_code_snippets
 
 code_analyzer_agent = LlmAgent(
     name="code_analyzer",
-    model="gemini-2.0-flash",
+    model=RetryingGemini(model="gemini-2.0-flash"),
     description="Analyzes project code based on error logs and provides code-level insights and suggestions.",
     instruction="""
     You are a Code Analyzer Agent.
@@ -36,6 +42,13 @@ code_analyzer_agent = LlmAgent(
     ## Return language : English
     """,
 
-    tools=[load_code_snippets],
-    output_key="code_analysis_report"
+    tools=[threaded_tool(load_code_snippets)],
+    output_key="code_analysis_report",
+    before_agent_callback=skip_when_expired_callback,
+    before_model_callback=chain_callbacks(
+        before_model_similarity_callback, before_model_cache_callback, before_model_route_callback
+    ),
+    after_model_callback=chain_callbacks(
+        after_model_route_callback, after_model_cache_callback, after_model_similarity_callback
+    ),
 )
@@ -1,9 +1,13 @@
-import os
-import requests
+from src.shared.deadline import cut_short, expired
+from src.log_agent.sources.backends import fetch_file_urls
+
 
 def load_code_snippets(code_urls: list[str]):
     """
     Load code snippets from the provided URLs.
+    URLs of the same project and branch are fetched together, from the project's local git mirror
+    if one is registered, otherwise in one GitLab batch request. Once the investigation's fetch
+    deadline passes, the analysis continues with the snippets loaded so far.
 
     Args:
         code_urls
@@ -11,17 +15,7 @@ def load_code_snippets(code_urls: list[str]):
     Returns:
         dict: Dictionary with URL as key and code snippet as value.
     """
-    code_snippets = {}
-    for url in code_urls:
-        try:
-            private_token = os.environ.get("GITLAB_TOKEN")
-            headers = {"PRIVATE-TOKEN": private_token}
-            response = requests.get(url, headers=headers)
-            if response.status_code == 200:
-                code_snippets[url] = response.text
-            else:
-                print(f"Failed to fetch {url}: HTTP {response.status_code}")
-        except Exception as e:
-            print(f"Error fetching {url}: {e}")
-
-    return code_snippets
\ No newline at end of file
+    code_snippets = fetch_file_urls(code_urls)
+    if expired(fetch=True) and len(code_snippets) < len(set(code_urls)):
+        cut_short("code_analyzer", f"loaded {len(code_snippets)} of {len(set(code_urls))} code files")
+    return code_snippets
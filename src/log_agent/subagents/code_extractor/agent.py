@@ -1,12 +1,17 @@
 from google.adk.agents import LlmAgent
 
+from src.log_agent.callbacks import chain_callbacks, threaded_tool
+from src.log_agent.deadline import skip_when_expired_callback
+from src.log_agent.rate_limit import RetryingGemini
+from src.log_agent.routing import before_model_route_callback, after_model_route_callback
+
 from .tools import url_encoder, get_url, after_agent_callback, before_agent_callback, \
     after_tool_callback, before_tool_callback, fetch_url_from_gitlab
 from ..log_filter.models import LogAttribute
 
 code_extractor_agent = LlmAgent(
     name="code_extractor",
-    model="gemini-2.5-flash",
+    model=RetryingGemini(model="gemini-2.5-flash"),
     instruction="""
         You are a URL retriever agent. Given a log JSON, do the following:
         1. Parse 'stack_trace' or 'exc_info' fields to extract full .py or .java file paths
@@ -24,10 +29,12 @@ code_extractor_agent = LlmAgent(
     """,
     input_schema=LogAttribute,
     description="Extracts code urls from GitLab based on log information.",
-    tools=[fetch_url_from_gitlab],
+    tools=[threaded_tool(fetch_url_from_gitlab)],
     after_agent_callback=after_agent_callback,
-    before_agent_callback=before_agent_callback,
+    before_agent_callback=chain_callbacks(skip_when_expired_callback, before_agent_callback),
     after_tool_callback=after_tool_callback,
     before_tool_callback=before_tool_callback,
+    before_model_callback=before_model_route_callback,
+    after_model_callback=after_model_route_callback,
     output_key="code_urls"
 )
@@ -1,52 +1,122 @@
 import os
+import re
+import time
 import requests
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
 from urllib.parse import quote
 
+from src.shared.deadline import DeadlineExceeded, cut_short, expired, timeout
+from src.log_agent.sources.backends import get_code_source
+from src.shared.code_sources import make_file_url
 from src.log_agent.subagents.code_extractor.models import CodeUrl, CodeSnippets
 from src.log_agent.subagents.log_filter.models import LogAttribute
+from src.shared.rate_limit import call_with_retries
+from src.log_agent.run_trace import AgentEvent, ToolEvent, run_trace
+from src.shared.stack_frames import innermost_files, project_path
+from src.shared.tracing import in_current_context
+
+# Python paths are stripped of leading container directories down to this many components; a bare
+# file name like utils.py would match an unrelated file
+MIN_PYTHON_PATH_DEPTH = 2
 
 
 def try_gitlab_api(project: str, file_path: str, branch: str):
     """
     Construct and validate a GitLab API URL for the given project, file path, and branch.
-    Returns a dict with 'url' and 'code' if successful, otherwise None.
+    The file content is read through the project's code source, so a hit also fills the source cache.
+    Returns the URL if successful, otherwise None.
     """
-    # Construct the GitLab API URL for raw file content
-    base_url = "https://git.cardev.de/api/v4/projects"
-    # Encode project path for API (replace / with %2F)
-    project_encoded = quote(project, safe='')
-    file_path_encoded = quote(file_path, safe='')
-    url = f"{base_url}/{project_encoded}/repository/files/{file_path_encoded}/raw?ref={branch}"
-    private_token = os.environ.get("GITLAB_TOKEN")
-    headers = {"PRIVATE-TOKEN": private_token} if private_token else {}
-    try:
-        response = requests.get(url, headers=headers, timeout=3)
-        if response.status_code == 200:
-            return url
-        else:
-            print(f"Failed to fetch {url}: {response.status_code}")
-            return None
-    except Exception as e:
-        print(f"Failed to fetch {url}: {e}")
+    contents = get_code_source(project).read_many(project, branch, [file_path])
+    return make_file_url(project, file_path, branch) if file_path in contents else None
+
+
+def candidate_paths(file_path: str) -> list[str]:
+    """
+    Generate the repository paths a stack frame file could live at, most likely first.
+    - Java: module prefix (<4th package token>/src/main/java/...) and root src/main/java/...
+    - Python: as given, under src/, and with leading container directories stripped (down to
+      MIN_PYTHON_PATH_DEPTH components)
+    """
+    file_path = file_path.strip().lstrip('/')
+    if '/' not in file_path and (file_path.endswith('.java') or file_path.endswith('.py')):
+        base, ext = file_path.rsplit('.', 1)
+        file_path = base.replace('.', '/') + '.' + ext
+
+    candidates = []
+    if file_path.endswith('.java'):
+        java_path = file_path.split('src/main/java/', 1)[-1]
+        tokens = java_path.split('/')
+        if len(tokens) >= 4:
+            candidates.append(f"{tokens[3]}/src/main/java/{java_path}")
+        candidates.append(f"src/main/java/{java_path}")
+        if file_path != java_path:
+            candidates.append(file_path)
+    elif file_path.endswith('.py'):
+        tokens = file_path.split('/')
+        for i in range(max(1, len(tokens) - MIN_PYTHON_PATH_DEPTH + 1)):
+            suffix = '/'.join(tokens[i:])
+            candidates.append(suffix)
+            if 'src/' not in suffix:
+                candidates.append(f"src/{suffix}")
+    else:
+        candidates.append(file_path)
+    return list(dict.fromkeys(candidates))
+
+
+def probe_candidates(project: str, paths: list[str], branch: str, deadline: float = 5.0,
+                     max_workers: int = 8) -> str|None:
+    """
+    Probe all candidate paths concurrently and return the URL of the most likely one that exists,
+    in the order of paths. A hit is returned once every more likely probe has missed; pending probes
+    are then cancelled. When the deadline (in seconds) passes, the most likely hit so far is returned.
+    """
+    if not paths:
         return None
+    deadline = timeout(deadline)
+    deadline_at = time.monotonic() + deadline
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(paths)))
+    futures = [executor.submit(in_current_context(try_gitlab_api), project, path, branch) for path in paths]
+    try:
+        for future in futures:
+            url = future.result(timeout=max(0.0, deadline_at - time.monotonic()))
+            if url:
+                return url
+    except TimeoutError:
+        print(f"Probing {len(paths)} candidate paths in {project} timed out after {deadline}s")
+        for future in futures:
+            if future.done() and not future.cancelled() and not future.exception() and future.result():
+                return future.result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return None
 
 
 def fetch_url_from_gitlab(appname: str, file_path: str, branch: str) -> dict:
     """Fetch source code urls from GitLab for a specific path.
+    All candidate repository layouts for the path are probed at once and the most likely existing one is returned.
     Args:
         appname (str): GitLab project name (from appname in log).
         file_path (str): File path (e.g., 'de/carsync/fleet/core/listener/VehicleEventListener.java').
         branch (str): Branch name (e.g., 'master' or 'develop').
     """
-    if file_path.endswith('.java') or file_path.endswith('.py'):
-        base, ext = file_path.split('.', 1)
-        file_path = base.replace('.', '/') + '.' + ext
-    if file_path.endswith('.java'):
-        tokens = file_path.split('/')
-        file_path = f"{tokens[3]}/src/main/java/" + file_path if len(tokens) >= 4 else ''
+    return probe_candidates(appname, candidate_paths(file_path), branch)
 
-    url = try_gitlab_api(appname, file_path, branch)
-    return url
+
+def resolve_code_urls(log: dict) -> list[str]:
+    """
+    Resolve the GitLab URLs of a log's innermost frames from its stack trace, without the LLM.
+    """
+    if not log.get('appname'):
+        return []
+    project, branch = project_path(log['appname']), log.get('branch') or 'master'
+    files = innermost_files(log.get('stack_trace'), log.get('exc_info'))
+    urls = []
+    for resolved, file_path in enumerate(files):
+        if expired(fetch=True):
+            cut_short("code_extractor", f"resolved {resolved} of {len(files)} stack frames")
+            break
+        urls.append(fetch_url_from_gitlab(project, file_path, branch))
+    return [url for url in urls if url]
 
 
 def get_url(api_url: str) -> requests.status_codes:
@@ -56,7 +126,14 @@ def get_url(api_url: str) -> requests.status_codes:
     """
     private_token = os.environ.get("GITLAB_TOKEN")
     headers = {"PRIVATE-TOKEN": private_token}
-    response = requests.get(api_url, headers=headers)
+    try:
+        response = call_with_retries("gitlab", requests.get, api_url, headers=headers, timeout=timeout(10))
+    except DeadlineExceeded:
+        cut_short("code_extractor", f"no time left to check {api_url}")
+        return None
+    except requests.RequestException as e:
+        print(f"API URL: {api_url} (failed: {e})")
+        return None
     print(f"API URL: {api_url} (HTTP Status Code: {response.status_code})")
     if response.status_code == 200:
         return api_url
@@ -76,105 +153,65 @@ def url_encoder(value: str) -> str:
 
 def before_agent_callback(callback_context):
     ctx = callback_context
-    state = ctx.state
-    if "trace" not in state:
-        state["trace"] = []
     # 단일 프롬프트만 보관, 여러 part면 첫 part
-    input_text = ctx.user_content.parts[0].text if ctx.user_content.parts else "(no text)"
-    state["trace"].append({
-        "agent": ctx.agent_name,
-        "invocation_id": ctx.invocation_id,
-        "input": input_text,
-        "output": None,
-    })
+    parts = ctx.user_content.parts if ctx.user_content else None
+    input_text = parts[0].text if parts else "(no text)"
+    run_trace.agent_started(ctx.invocation_id, ctx.agent_name, input_text)
     # 보통 before에선 Content를 반환하지 않아도 됨
     return None
 
 
 def after_agent_callback(callback_context):
-    ctx = callback_context
-    state = ctx.state
-    # print_trace 함수에서 알아서 state['trace'] 순회
-    print_tree_style_trace(state['trace'])
+    print_tree_style_trace(run_trace.events(callback_context.invocation_id))
     return None
 
 def before_tool_callback(tool, args, tool_context):
     # args: dict
     # tool: BaseTool
-    state = tool_context.state
-    if "trace" not in state:
-        state["trace"] = []
-    state["trace"].append({
-        "type": "tool",
-        "name": getattr(tool, "name", str(tool)),
-        "input": str(args),
-        "output": None,
-    })
+    name = getattr(tool, "name", str(tool))
+    run_trace.tool_started(tool_context.invocation_id, tool_context.function_call_id or name, name, args)
 
 def after_tool_callback(tool, args, tool_context, tool_response):
-    state = tool_context.state
     # tool_output은 dict로 나옴
-    for entry in reversed(state["trace"]):
-        if entry["type"] == "tool" and entry["name"] == getattr(tool, "name", str(tool)) and entry["output"] is None:
-            entry["output"] = str(tool_response)
-            break
+    call_id = tool_context.function_call_id or getattr(tool, "name", str(tool))
+    run_trace.tool_finished(tool_context.invocation_id, call_id, tool_response)
 
 
-import re
+def _is_success(output) -> bool:
+    if isinstance(output, dict):
+        output = output.get("result", "")
+    return isinstance(output, str) and output.startswith("http")
+
 
-def print_tree_style_trace(trace):
+def print_tree_style_trace(trace: list[AgentEvent | ToolEvent]):
+    if not trace:
+        return
     # 1. 유저 쿼리 출력
     first = trace[0]
-    print(f'User Query ("{first["input"]}")')
+    print(f'User Query ("{first.input if isinstance(first, AgentEvent) else ""}")')
     print("│")
 
-    # 2. 파일별로 묶기 위한 준비
+    # 2. 파일별로 묶기 (java 경로만 추출)
     file_groups = []
-    current_file = None
-    current_items = []
-
-    # 파일명을 추출하는 정규식 (java 경로만 추출)
     filename_regex = re.compile(r"src/main/java/(.*?\.java)")
-
-    # 파일별로 그룹핑
     for entry in trace[1:]:
-        if entry.get('type') == 'tool' and entry['name'] == 'url_encoder':
-            match = filename_regex.search(entry['input'])
+        if not isinstance(entry, ToolEvent):
+            continue
+        if entry.name == 'url_encoder':
+            match = filename_regex.search(str(entry.args.get('value', '')))
             if match:
-                # 이전 파일 그룹 저장
-                if current_file and current_items:
-                    file_groups.append((current_file, current_items))
-                    current_items = []
-                # 새 파일 그룹 시작
-                current_file = match.group(1)
-        if current_file:
-            current_items.append(entry)
-    # 마지막 파일 그룹 저장
-    if current_file and current_items:
-        file_groups.append((current_file, current_items))
+                file_groups.append((match.group(1), []))
+        if file_groups:
+            file_groups[-1][1].append(entry)
 
     # 3. 각 파일별 트리 출력
     for i, (filename, items) in enumerate(file_groups):
-        is_last = (i == len(file_groups) - 1)
-        prefix = "└──" if is_last else "├──"
+        prefix = "└──" if i == len(file_groups) - 1 else "├──"
         print(f"{prefix} <{filename}>")
-
         for entry in items:
-            if entry.get('type') == 'tool' and entry['name'] == 'url_encoder':
-                val = eval(entry['input']).get('value')
-                print(f"│    ├─ url_encoder({repr(val)}) → {entry['output']}")
-            if entry.get('type') == 'tool' and entry['name'] == 'get_url':
-                url = eval(entry['input']).get('api_url')
-                output = entry['output']
-                # 성공/실패 판단
-                success = False
-                if isinstance(output, str):
-                    success = output.startswith("http")
-                elif isinstance(output, dict):
-                    success = output.get("result", "").startswith("http")
-                if success:
-                    print(f"│    ├─ get_url(프로젝트=..., 파일={output}) → 성공")
-                else:
-                    print(f"│    ├─ get_url(프로젝트=..., 파일={output}) → 실패")
+            if entry.name == 'url_encoder':
+                print(f"│    ├─ url_encoder({entry.args.get('value')!r}) → {entry.output}")
+            elif entry.name == 'get_url':
+                result = "성공" if _is_success(entry.output) else "실패"
+                print(f"│    ├─ get_url(프로젝트=..., 파일={entry.output}) → {result}")
         print("│")
-
@@ -1,10 +1,16 @@
 from google.adk.agents import LlmAgent
 
+from src.log_agent.analysis_index import before_model_similarity_callback, after_model_similarity_callback
+from src.log_agent.callbacks import chain_callbacks
+from src.log_agent.deadline import skip_when_expired_callback
+from src.log_agent.llm_cache import before_model_cache_callback, after_model_cache_callback
+from src.log_agent.rate_limit import RetryingGemini
+from src.log_agent.routing import before_model_route_callback, after_model_route_callback
 from src.log_agent.subagents.log_filter.models import LogAttribute
 
 log_analyzer_agent = LlmAgent(
     name="log_analyzer",
-    model="gemini-2.0-flash",
+    model=RetryingGemini(model="gemini-2.0-flash"),
     instruction="""
     You are a Log Analyzer Agent.
     Your task is to analyze the logs provided by the Log Filter Agent.
@@ -30,5 +36,12 @@ log_analyzer_agent = LlmAgent(
     """,
     input_schema=LogAttribute,
     description="Analyzes logs and provides a summary of errors and patterns.",
-    output_key="log_analysis_report"
+    output_key="log_analysis_report",
+    before_agent_callback=skip_when_expired_callback,
+    before_model_callback=chain_callbacks(
+        before_model_similarity_callback, before_model_cache_callback, before_model_route_callback
+    ),
+    after_model_callback=chain_callbacks(
+        after_model_route_callback, after_model_cache_callback, after_model_similarity_callback
+    ),
 )
@@ -4,13 +4,17 @@ Log Filter Agent
 This agent receives project name, error level, and time period, then returns filtered logs from Datadog.
 """
 from google.adk.agents import LlmAgent
-from .tools import get_filtered_logs
+
+from src.log_agent.callbacks import chain_callbacks, threaded_tool
+from src.log_agent.rate_limit import RetryingGemini
+from src.log_agent.routing import before_model_route_callback, after_model_route_callback
+from .tools import get_filtered_logs, keyword_fast_path_callback
 from .models import LogFilterInputSchema
 
 
 log_filter_agent = LlmAgent(
     name="log_filter",
-    model="gemini-2.0-flash",
+    model=RetryingGemini(model="gemini-2.0-flash"),
     instruction="""
     You are a Log Filter Agent.
     Your task is to help the user retrieve logs from Datadog.
@@ -23,6 +27,8 @@ log_filter_agent = LlmAgent(
       4. Environment (e.g., dev, staging, prod)
     
     - If any are missing, ask for only the missing values.
+    - The user can name several services and/or environments (e.g. a release across services).
+      Pass them comma separated in one call, e.g. project_name="document,billing", environment="prod,staging".
     
     ## ENVIRONMENT NORMALIZATION
     - The 'environment' field can have various user expressions.
@@ -42,5 +48,7 @@ log_filter_agent = LlmAgent(
     """,
     input_schema=LogFilterInputSchema,
     description="Retrieves logs from Datadog based on project, error level, time period, and environment. Returns up to 5 logs if too many are found.",
-    tools=[get_filtered_logs]
+    tools=[threaded_tool(get_filtered_logs)],
+    before_model_callback=chain_callbacks(keyword_fast_path_callback, before_model_route_callback),
+    after_model_callback=after_model_route_callback,
 )
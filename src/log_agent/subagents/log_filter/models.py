@@ -1,4 +1,6 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
+
+from src.shared.log_queries import split_values
 
 
 class LogAttribute(BaseModel):
@@ -67,7 +69,12 @@ class LogAttribute(BaseModel):
 
 
 class LogFilterInputSchema(BaseModel):
-    project_name: str = Field(..., description="Project name (service)")
+    project_name: str = Field(..., description="Project name (service), or several separated by commas")
     error_level: str = Field(..., description="Error level (e.g., error, warning, info)")
     time_period_hours: int = Field(..., description="Time period in hours")
-    environment: str = Field(..., description="Environment (e.g., dev, staging, prod)")
+    environment: str = Field(..., description="Environment (e.g., dev, staging, prod), or several separated by commas")
+
+    @field_validator("project_name", "environment", mode="before")
+    @classmethod
+    def join_values(cls, value):
+        return ",".join(split_values(value))
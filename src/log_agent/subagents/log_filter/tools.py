@@ -1,75 +1,51 @@
 import pytz
 import collections
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta, datetime
-from datadog_api_client import ApiClient, Configuration
-from datadog_api_client.v2.api.logs_api import LogsApi
-from datadog_api_client.v2.model.logs_list_request import LogsListRequest
-from datadog_api_client.v2.model.logs_query_filter import LogsQueryFilter
-from datadog_api_client.v2.model.logs_query_options import LogsQueryOptions
-from datadog_api_client.v2.model.logs_list_request_page import LogsListRequestPage
-from datadog_api_client.v2.model.logs_sort import LogsSort
 from datadog_api_client.v2.model.log import Log
+from google.adk.models import LlmResponse
+from google.genai import types
 
-from .models import LogAttribute
+from src.shared.datadog_logs import fetch_all_logs
+from src.shared.singleflight import flight
+from src.shared.tracing import in_current_context
+from src.shared.keywords import parse_keywords
+from src.shared.log_queries import fan_out_queries
+from .models import LogAttribute, LogFilterInputSchema
 
 
-def fetch_all_logs(query, start_time, end_time):
+def get_filtered_logs(project_name: str, error_level: str, time_period_hours: int, environment: str):
     """
-    Fetch all logs from Datadog based on the provided query and time range.
-    This function handles pagination and returns all logs that match the query.
-    :param query:
-    :param start_time:
-    :param end_time:
-    :return:
+    Retrieve logs from Datadog filtered by project_name, error_level, time_period_hours, and environment.
+    project_name and environment can name several services / environments, separated by commas.
+    Returns list of LogAttribute for downstream agents, ranked across all of them.
     """
-    body = LogsListRequest(
-        filter=LogsQueryFilter(
-            query=query,
-            _from=start_time,
-            to=end_time
-        ),
-        options=LogsQueryOptions(
-            timezone="Europe/Paris"
-        ),
-        sort=LogsSort.TIMESTAMP_ASCENDING,
-        page=LogsListRequestPage(limit=1000)
-    )
-
-    configuration = Configuration()
-    all_logs = []
-    next_cursor = None
-
-    with ApiClient(configuration) as api_client:
-        api_instance = LogsApi(api_client)
-
-        # Fetch logs in a loop to handle pagination
-        while True:
-            if next_cursor:
-                body.page = {"cursor": next_cursor}
-            response = api_instance.list_logs(body=body)
-            all_logs.extend(response.data)
-
-            # Check if there is a next page (cursor)
-            next_cursor = response.get('meta', {}).get('page', {}).get('after')
-            if not next_cursor:
-                break
+    return query_log_groups(project_name, error_level, time_period_hours, environment, top_n=5)
 
-    return all_logs
 
-
-def get_filtered_logs(project_name: str, error_level: str, time_period_hours: int, environment: str):
+def query_log_groups(project_name: str, error_level: str, time_period_hours: int, environment: str,
+                     top_n: int = 5) -> list[dict]:
     """
-    Retrieve logs from Datadog filtered by project_name, error_level, time_period_hours, and environment.
-    Returns list of LogAttribute for downstream agents.
+    Fetch the logs matching the filter and group them into the top_n most frequent unique logs.
+    With several services or environments, the logs of all of them are grouped and ranked together.
     """
     tz = pytz.timezone("Europe/Paris")
     now = datetime.now(tz)
     start_time = now - timedelta(hours=time_period_hours)
 
-    query = f"service:{project_name} AND status:{error_level} AND env:{environment}"
+    queries = fan_out_queries(project_name, error_level, environment)
 
-    response = fetch_all_logs(query, start_time.isoformat(), now.isoformat())
-    response_dict = get_top_unique_logs(response, top_n=5)
+    # the same query is answered once per run, however often the agent asks for it
+    def fetch(query: str) -> list[Log]:
+        return flight("datadog").do(
+            (query, time_period_hours), fetch_all_logs, query, start_time.isoformat(), now.isoformat()
+        )
+    if len(queries) == 1:
+        response = fetch(queries[0])
+    else:
+        with ThreadPoolExecutor(max_workers=len(queries), thread_name_prefix="datadog") as executor:
+            response = [log for logs in executor.map(in_current_context(fetch), queries) for log in logs]
+    response_dict = get_top_unique_logs(response, top_n=top_n)
 
     return response_dict # Return as a dict for consistency
 
@@ -91,7 +67,8 @@ def get_top_unique_logs(logs: list[Log], top_n: int = 5) -> list[LogAttribute]:
 
         # if the log has stack_trace or exc_info, we consider it for counting
         if p_log.stack_trace or p_log.exc_info:
-            key = (p_log.message, p_log.filename)
+            # the same error in two services is two groups, labeled with their service
+            key = (p_log.service, p_log.message, p_log.filename)
             log_counter[key] += 1
             log_key_to_log[key] = p_log
 
@@ -103,3 +80,38 @@ def get_top_unique_logs(logs: list[Log], top_n: int = 5) -> list[LogAttribute]:
     result = [log_key_to_log[k].dict() for k in top_keys]
 
     return result
+
+
+def keyword_fast_path_callback(callback_context, llm_request):
+    """
+    before_model_callback of the log filter agent.
+    If the rule-based parser finds all filter fields in the user's messages, call get_filtered_logs
+    directly instead of asking the model to extract them. Missing or ambiguous fields go to the model.
+    """
+    last = llm_request.contents[-1] if llm_request.contents else None
+    if not last or last.role != "user" or any(part.function_response for part in last.parts or []):
+        return None
+
+    # only a message that looks like a query (e.g. not "3" picking an entry) takes the fast path
+    if not any(parse_keywords(part.text) for part in last.parts or [] if part.text):
+        return None
+
+    fields = {}
+    for content in llm_request.contents:
+        if content.role != "user":
+            continue
+        for part in content.parts or []:
+            if part.text and not part.text.startswith("For context:"):
+                fields.update(parse_keywords(part.text))
+    if len(fields) < 4:
+        return None
+
+    filter_input = LogFilterInputSchema(
+        project_name=fields["project_name"],
+        error_level=fields["level"],
+        time_period_hours=fields["time_period_hours"],
+        environment=fields["environment"],
+    )
+    return LlmResponse(content=types.Content(role="model", parts=[
+        types.Part(function_call=types.FunctionCall(name="get_filtered_logs", args=filter_input.model_dump()))
+    ]))
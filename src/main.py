@@ -1,25 +1,26 @@
 import asyncio
+import os
 
 # Import the main customer service agent
 from log_agent.agent import root_agent
 from dotenv import load_dotenv
 from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
+from src.log_agent.sessions import SqliteSessionService
+from src.shared.tracing import setup_tracing
 
 from utils import add_user_query_to_history, call_agent_async
 
 load_dotenv()
 
-# ===== PART 1: Initialize In-Memory Session Service =====
-# Using in-memory storage for this example (non-persistent)
-session_service = InMemorySessionService()
+# ===== PART 1: Initialize Session Service =====
+# Sessions are persisted in SQLite, so a conversation can be resumed with RESUME_SESSION_ID
+session_service = SqliteSessionService(os.environ.get("SESSION_DB_PATH", ".cache/sessions.sqlite"))
 
 
 # ===== PART 2: Define Initial State =====
 # This will be used when creating a new session
 initial_state = {
     "user_name": "Carsync",
-    "interaction_history": [],
     "init_message": """
     Okay, I'm ready to help you retrieve logs from Datadog. To get started, I need some information. 
     Could you please provide the following:
@@ -37,14 +38,21 @@ async def main_async():
     USER_ID = "CARSYNC"
 
     # ===== PART 3: Session Creation =====
-    # Create a new session with initial state
-    new_session = session_service.create_session(
-        app_name=APP_NAME,
-        user_id=USER_ID,
-        state=initial_state,
+    # Resume the given session if it exists, otherwise create a new one with initial state
+    resume_id = os.environ.get("RESUME_SESSION_ID")
+    new_session = resume_id and session_service.get_session(
+        app_name=APP_NAME, user_id=USER_ID, session_id=resume_id
     )
+    if new_session:
+        print(f"Resumed session: {new_session.id} ({len(new_session.events)} events)")
+    else:
+        new_session = session_service.create_session(
+            app_name=APP_NAME,
+            user_id=USER_ID,
+            state=initial_state,
+        )
+        print(f"Created new session: {new_session.id}")
     SESSION_ID = new_session.id
-    print(f"Created new session: {SESSION_ID}")
 
     # ===== PART 4: Agent Runner Setup =====
     # Create a runner with the main customer service agent
@@ -68,10 +76,10 @@ async def main_async():
             print("Ending conversation. Goodbye!")
             break
 
-        # Update interaction history with the user's query
-      #  add_user_query_to_history(
-      #      session_service, APP_NAME, USER_ID, SESSION_ID, user_input
-      #  )
+        # Update interaction history with the user's query (a single append to the history store)
+        add_user_query_to_history(
+            session_service, APP_NAME, USER_ID, SESSION_ID, user_input
+        )
 
         # Process the user query through the agent
         await call_agent_async(runner, USER_ID, SESSION_ID, user_input)
@@ -88,6 +96,7 @@ async def main_async():
 
 def main():
     """Entry point for the application."""
+    setup_tracing()
     asyncio.run(main_async())
 
 
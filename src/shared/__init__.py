@@ -0,0 +1 @@
+# Infrastructure shared by the ADK agent (src/log_agent) and the LangGraph agent (log_agent_langgraph).
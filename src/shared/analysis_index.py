@@ -0,0 +1,126 @@
+import hashlib
+import math
+import os
+import re
+import threading
+from datetime import datetime
+
+import chromadb
+from chromadb import Documents, EmbeddingFunction, Embeddings
+from chromadb.config import Settings
+
+SIMILARITY_THRESHOLD = float(os.environ.get("ANALYSIS_SIMILARITY_THRESHOLD", "0.92"))
+
+_MESSAGE_PATTERN = re.compile(r"""["']message["']\s*:\s*(?:"((?:[^"\\]|\\.)*)"|'((?:[^'\\]|\\.)*)')""")
+_JAVA_FRAME_PATTERN = re.compile(r"at\s+([\w$.]+)\(([\w$]+\.java)(?::\d+)?\)")
+_PYTHON_FRAME_PATTERN = re.compile(r"""File\s+\\?["']([^"'\\]+\.py)\\?["'],\s+line\s+\d+,\s+in\s+(\w+)""")
+_VARIABLE_PATTERN = re.compile(
+    r"\d{4}-\d{2}-\d{2}[T ][\d:.]+(?:Z|[+-]\d{2}:?\d{2})?"   # timestamps
+    r"|\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b"   # uuids
+    r"|\b0x[0-9a-f]+\b|\b[0-9a-f]{16,}\b"   # hex ids
+    r"|\d+",
+    re.IGNORECASE,
+)
+
+
+def message_template(message: str) -> str:
+    """Replace the variable parts of a log message (timestamps, ids, numbers) with placeholders."""
+    return _VARIABLE_PATTERN.sub("<*>", message).strip()
+
+
+def stack_fingerprint(stack: str) -> list[str]:
+    """Return the frames of a Java or Python stack trace without line numbers."""
+    frames = [f"{method} {file}" for method, file in _JAVA_FRAME_PATTERN.findall(stack)]
+    frames += [f"{file} {function}" for file, function in _PYTHON_FRAME_PATTERN.findall(stack)]
+    return frames
+
+
+def error_fingerprint(text: str) -> str:
+    """
+    Reduce a text containing log entries to its message templates and stack frames.
+    Returns an empty string if the text does not contain any.
+    """
+    messages = [message_template(double or single) for double, single in _MESSAGE_PATTERN.findall(text)]
+    lines = list(dict.fromkeys(messages + stack_fingerprint(text)))
+    return "\n".join(lines)
+
+
+class HashingEmbeddingFunction(EmbeddingFunction[Documents]):
+    """
+    Offline text vectorizer: word and character trigram features hashed into a fixed-size,
+    L2-normalized vector. Deterministic and needs no model download.
+    """
+    def __init__(self, dimensions: int = 1024):
+        self.dimensions = dimensions
+
+    def _embed(self, text: str) -> list[float]:
+        vector = [0.0] * self.dimensions
+        words = re.findall(r"[a-z0-9_$]+|<\*>", text.lower())
+        features = words + [text[i:i + 3].lower() for i in range(max(len(text) - 2, 0))]
+        for feature in features:
+            digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dimensions
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    def __call__(self, input: Documents) -> Embeddings:
+        return [self._embed(text) for text in input]
+
+
+class AnalysisIndex:
+    """
+    Local vector index of finished analyses, keyed by the error fingerprint they were made for.
+    """
+    def __init__(self, path: str, threshold: float = SIMILARITY_THRESHOLD):
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        client = chromadb.PersistentClient(path=path, settings=Settings(anonymized_telemetry=False))
+        self._collection = client.get_or_create_collection(
+            "analyses", embedding_function=HashingEmbeddingFunction(), metadata={"hnsw:space": "cosine"}
+        )
+
+    def add(self, kind: str, fingerprint: str, analysis: str, link: str = "") -> str:
+        """
+        Store an analysis and return its id.
+        """
+        analysis_id = hashlib.sha256(f"{kind}\n{fingerprint}".encode()).hexdigest()[:16]
+        with self._lock:
+            self._collection.upsert(
+                ids=[analysis_id],
+                documents=[fingerprint],
+                metadatas=[{
+                    "kind": kind,
+                    "analysis": analysis,
+                    "link": link,
+                    "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                }],
+            )
+        return analysis_id
+
+    def find_similar(self, kind: str, fingerprint: str) -> dict|None:
+        """
+        Return the closest earlier analysis of the same kind if its similarity reaches the threshold,
+        as a dict with id, similarity, analysis, link and created.
+        """
+        with self._lock:
+            if self._collection.count() == 0:
+                return None
+            result = self._collection.query(query_texts=[fingerprint], n_results=1, where={"kind": kind})
+        if not result["ids"] or not result["ids"][0]:
+            return None
+        similarity = 1.0 - result["distances"][0][0]
+        if similarity < self.threshold:
+            return None
+        return {"id": result["ids"][0][0], "similarity": similarity, **result["metadatas"][0][0]}
+
+
+analysis_index = AnalysisIndex(os.environ.get("ANALYSIS_INDEX_PATH", ".cache/analysis_index"))
+
+
+def format_reused_analysis(match: dict) -> str:
+    reference = match["link"] or f"analysis {match['id']}"
+    return (
+        f"(Reused analysis of a similar error from {match['created']}, "
+        f"similarity {match['similarity']:.2f}: {reference})\n\n{match['analysis']}"
+    )
@@ -0,0 +1,75 @@
+"""
+Code source addressing
+
+GitLab raw file URLs and the registry of local git mirrors, shared by both agents. Code is
+addressed by raw file URLs (.../projects/<project>/repository/files/<path>/raw?ref=<ref>); a project
+with a registered mirror is read from it instead of GitLab. Mirrors are registered in code or from
+GIT_MIRRORS, e.g. "eco/fleet-core=/srv/mirrors/fleet-core.git,eco/document=/srv/...".
+"""
+import os
+import threading
+from urllib.parse import quote, unquote, urlsplit, parse_qs
+
+from src.shared.git_mirror import GitMirror
+
+GITLAB_URL = os.environ.get("GITLAB_URL", "https://git.cardev.de")
+
+
+def make_file_url(project: str, file_path: str, ref: str, base_url: str = GITLAB_URL) -> str:
+    """
+    Build the GitLab REST URL for the raw content of a file.
+    """
+    project_encoded = quote(project, safe='')
+    file_path_encoded = quote(file_path, safe='')
+    return f"{base_url}/api/v4/projects/{project_encoded}/repository/files/{file_path_encoded}/raw?ref={ref}"
+
+
+def parse_file_url(url: str) -> tuple[str, str, str, str]|None:
+    """
+    Split a raw file URL built by make_file_url back into its parts.
+    :return: (base_url, project, file_path, ref) or None if the URL is not a raw file URL
+    """
+    parts = urlsplit(url)
+    if "/api/v4/projects/" not in parts.path or "/repository/files/" not in parts.path:
+        return None
+    prefix, rest = parts.path.split("/api/v4/projects/", 1)
+    project_encoded, file_part = rest.split("/repository/files/", 1)
+    file_path_encoded = file_part.removesuffix("/raw")
+    ref = parse_qs(parts.query).get("ref", ["master"])[0]
+    base_url = f"{parts.scheme}://{parts.netloc}{prefix}"
+    return base_url, unquote(project_encoded), unquote(file_path_encoded), ref
+
+
+_mirrors: dict[str, GitMirror] = {}
+_mirrors_lock = threading.Lock()
+_mirrors_loaded = False
+
+
+def register_mirror(project: str, git_dir: str, fetch_interval: int = 300) -> GitMirror:
+    """
+    Serve a project from a local bare mirror and start its periodic background fetch.
+    """
+    mirror = GitMirror(git_dir, fetch_interval=fetch_interval)
+    mirror.start_background_fetch()
+    _mirrors[project] = mirror
+    return mirror
+
+
+def load_mirrors_from_env():
+    """Register the mirrors listed in GIT_MIRRORS that are not registered yet."""
+    global _mirrors_loaded
+    with _mirrors_lock:
+        if _mirrors_loaded:
+            return
+        _mirrors_loaded = True
+        for entry in filter(None, os.environ.get("GIT_MIRRORS", "").split(",")):
+            project, _, git_dir = entry.partition("=")
+            if project.strip() and git_dir.strip() and project.strip() not in _mirrors:
+                register_mirror(project.strip(), git_dir.strip())
+
+
+def get_mirror(project: str) -> GitMirror|None:
+    """Return the mirror registered for a project, reading GIT_MIRRORS on first use."""
+    if not _mirrors_loaded:
+        load_mirrors_from_env()
+    return _mirrors.get(project)
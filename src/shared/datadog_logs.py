@@ -0,0 +1,83 @@
+"""
+Datadog log search
+
+Fetches every log of a query and time range, page by page, for both agents and the triage daemon.
+Pages are rate limited and retried per provider, and paging stops at the investigation's fetch
+deadline with the logs fetched so far.
+"""
+from datadog_api_client import ApiClient, Configuration
+from datadog_api_client.v2.api.logs_api import LogsApi
+from datadog_api_client.v2.model.logs_list_request import LogsListRequest
+from datadog_api_client.v2.model.logs_list_request_page import LogsListRequestPage
+from datadog_api_client.v2.model.logs_query_filter import LogsQueryFilter
+from datadog_api_client.v2.model.logs_query_options import LogsQueryOptions
+from datadog_api_client.v2.model.logs_sort import LogsSort
+
+from src.shared.deadline import cut_short, expired, timeout
+from src.shared.rate_limit import call_with_retries, provider_limits
+from src.shared.tracing import annotate, span
+
+# seconds one Datadog page may take, shortened to what is left of the investigation's budget
+DATADOG_TIMEOUT = 30.0
+
+
+def fetch_all_logs(query, start_time, end_time, stage: str = "log_filter"):
+    """
+    Fetch all logs from Datadog based on the provided query and time range.
+    This function handles pagination and returns all logs that match the query.
+    Paging stops at the investigation's deadline; the logs fetched until then are returned.
+    :param query:
+    :param start_time:
+    :param end_time:
+    :param stage: stage reported as cut short when the deadline stops the paging
+    :return:
+    """
+    body = LogsListRequest(
+        filter=LogsQueryFilter(
+            query=query,
+            _from=start_time,
+            to=end_time
+        ),
+        options=LogsQueryOptions(
+            timezone="Europe/Paris"
+        ),
+        sort=LogsSort.TIMESTAMP_ASCENDING,
+        page=LogsListRequestPage(limit=1000)
+    )
+
+    # status and headers are returned with the data so the limiter follows Datadog's rate limit headers
+    configuration = Configuration(return_http_data_only=False)
+    all_logs = []
+    next_cursor = None
+
+    with ApiClient(configuration) as api_client:
+        api_instance = LogsApi(api_client)
+
+        # Fetch logs in a loop to handle pagination
+        page = 0
+        while True:
+            if page and expired(fetch=True):
+                cut_short(stage, f"stopped paging Datadog after {page} pages ({len(all_logs)} logs)")
+                break
+            if next_cursor:
+                body.page = {"cursor": next_cursor}
+            configuration.request_timeout = timeout(DATADOG_TIMEOUT)
+            page += 1
+            try:
+                with span("datadog.list_logs", kind="datadog", page=page):
+                    response, _, headers = call_with_retries("datadog", api_instance.list_logs, body=body)
+                    provider_limits["datadog"].update_from_headers(headers)
+                    annotate(logs=len(response.data))
+            except Exception:
+                if not expired(fetch=True):
+                    raise
+                cut_short(stage, f"Datadog page {page} ran into the deadline ({len(all_logs)} logs)")
+                break
+            all_logs.extend(response.data)
+
+            # Check if there is a next page (cursor)
+            next_cursor = response.get('meta', {}).get('page', {}).get('after')
+            if not next_cursor:
+                break
+
+    return all_logs
@@ -0,0 +1,102 @@
+"""
+Investigation deadline
+
+Every investigation gets one time budget, started by the root agent and visible to everything it
+calls through a context variable: Datadog pages, GitLab requests, code snippet loading and model
+calls size their timeouts from what is left of it, and stop once it is spent. A stage that stops
+early keeps what it has so far and records that it was cut short; when the run ends the cut stages
+are reported with the (partial) result instead of the run failing or hanging.
+
+Fetching stops ANALYSIS_RESERVE of the budget before the deadline, so the analysis still has time
+to run on whatever was fetched. The budget is INVESTIGATION_BUDGET seconds, or the `time_budget`
+value of the session state.
+"""
+import contextvars
+import os
+import time
+from dataclasses import dataclass, field
+
+DEFAULT_BUDGET = float(os.environ.get("INVESTIGATION_BUDGET", "300"))
+# share of the budget kept for the analysis; fetches stop when only this much is left
+ANALYSIS_RESERVE = 0.25
+# a request started just before the deadline still gets this long
+MIN_TIMEOUT = 1.0
+
+
+class DeadlineExceeded(TimeoutError):
+    """The investigation's time budget is spent."""
+
+
+@dataclass(slots=True)
+class Budget:
+    seconds: float
+    deadline: float
+    cut: list[str] = field(default_factory=list)
+
+    @property
+    def fetch_deadline(self) -> float:
+        return self.deadline - self.seconds * ANALYSIS_RESERVE
+
+
+_budget: contextvars.ContextVar[Budget|None] = contextvars.ContextVar("investigation_budget", default=None)
+
+
+def start(seconds: float = DEFAULT_BUDGET) -> Budget:
+    """Start the budget of the current investigation; tasks and threads started from here share it."""
+    budget = Budget(seconds=seconds, deadline=time.monotonic() + seconds)
+    _budget.set(budget)
+    return budget
+
+
+def current_budget() -> Budget|None:
+    return _budget.get()
+
+
+def current_deadline(fetch: bool = False) -> float|None:
+    """
+    time.monotonic() at which the current investigation's budget ends, None outside an investigation.
+    :param fetch: the earlier deadline of fetches, which leaves the reserve to the analysis
+    """
+    budget = _budget.get()
+    if budget is None:
+        return None
+    return budget.fetch_deadline if fetch else budget.deadline
+
+
+def remaining(fetch: bool = False) -> float|None:
+    end = current_deadline(fetch)
+    return end - time.monotonic() if end is not None else None
+
+
+def expired(fetch: bool = False) -> bool:
+    left = remaining(fetch)
+    return left is not None and left <= 0
+
+
+def timeout(default: float) -> float:
+    """Timeout for one fetch: `default`, but no longer than the fetch part of the budget has left."""
+    left = remaining(fetch=True)
+    return default if left is None else max(MIN_TIMEOUT, min(default, left))
+
+
+def cut_short(stage: str, what: str):
+    """Record that a stage stopped early and returns a partial result."""
+    budget = _budget.get()
+    if budget is not None:
+        note = f"{stage}: {what}"
+        budget.cut.append(note)
+        print(f"Deadline: {note}")
+
+
+def cut_stages() -> list[str]:
+    budget = _budget.get()
+    return list(budget.cut) if budget else []
+
+
+def partial_result_note() -> str|None:
+    """The note to show with the result when stages were cut short, None if nothing was."""
+    cut = cut_stages()
+    if not cut:
+        return None
+    lines = [f"Time budget of {_budget.get().seconds:.0f}s exceeded, these results are partial:"]
+    return "\n".join(lines + [f"- {note}" for note in cut])
@@ -0,0 +1,106 @@
+import subprocess
+import threading
+import time
+
+
+class GitMirror:
+    """
+    Read files from a locally maintained bare mirror (git clone --mirror) through one
+    persistent `git cat-file --batch` process, so a lookup is a pipe round trip instead of an HTTP call.
+    A background thread keeps the mirror fresh with `git fetch`; a read at a ref the mirror does not know yet
+    triggers one fetch before giving up, a missing path at a known ref does not.
+    """
+    def __init__(self, git_dir: str, fetch_interval: int = 300, min_fetch_gap: int = 30):
+        self.git_dir = git_dir
+        self.fetch_interval = fetch_interval
+        self.min_fetch_gap = min_fetch_gap
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+        self._process: subprocess.Popen|None = None
+        self._last_fetch = 0.0
+        self._stop = threading.Event()
+        self._fetcher: threading.Thread|None = None
+
+    def _git(self, *args: str) -> list[str]:
+        return ["git", f"--git-dir={self.git_dir}", *args]
+
+    def _ensure_process(self) -> subprocess.Popen:
+        if self._process is None or self._process.poll() is not None:
+            self._process = subprocess.Popen(
+                self._git("cat-file", "--batch"), stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+        return self._process
+
+    def _cat_file(self, ref: str, file_path: str) -> str|None:
+        with self._lock:
+            process = self._ensure_process()
+            process.stdin.write(f"{ref}:{file_path}\n".encode())
+            process.stdin.flush()
+            header = process.stdout.readline().decode().rstrip("\n")
+            # "<sha> <type> <size>" on success, "<name> missing" (or ambiguous) otherwise
+            if not header or header.endswith((" missing", " ambiguous")):
+                return None
+            _, object_type, size = header.split()
+            data = process.stdout.read(int(size) + 1)[:-1]
+        if object_type != "blob":
+            return None
+        return data.decode("utf-8", errors="replace")
+
+    def has_ref(self, ref: str) -> bool:
+        """Whether ref (branch, tag or commit SHA) resolves to a commit in the mirror. Local, no network."""
+        result = subprocess.run(self._git("rev-parse", "--verify", "--quiet", f"{ref}^{{commit}}"),
+                                capture_output=True, timeout=10)
+        return result.returncode == 0
+
+    def read(self, ref: str, file_path: str) -> str|None:
+        """
+        Return the content of file_path at ref. The mirror is fetched (once) only if the ref itself
+        is not known yet: a path that does not exist at a known ref, e.g. a probed candidate, is a plain miss.
+        """
+        content = self._cat_file(ref, file_path)
+        if content is None and not self.has_ref(ref) and self.fetch(force=False):
+            content = self._cat_file(ref, file_path)
+        return content
+
+    def fetch(self, force: bool = True) -> bool:
+        """
+        Update the mirror from its remote. Unforced fetches (fetch-on-miss) are skipped
+        if the last fetch is more recent than min_fetch_gap seconds.
+        :return: True if a fetch was run successfully
+        """
+        with self._fetch_lock:
+            if not force and time.monotonic() - self._last_fetch < self.min_fetch_gap:
+                return False
+            result = subprocess.run(self._git("fetch", "--prune", "--quiet"), capture_output=True, timeout=120)
+            self._last_fetch = time.monotonic()
+            if result.returncode != 0:
+                print(f"git fetch failed for {self.git_dir}: {result.stderr.decode().strip()}")
+                return False
+        # restart cat-file so it picks up the new refs and packs
+        self.close_process()
+        return True
+
+    def start_background_fetch(self):
+        if self._fetcher is None or not self._fetcher.is_alive():
+            self._stop.clear()
+            self._fetcher = threading.Thread(target=self._fetch_loop, name=f"git-fetch:{self.git_dir}", daemon=True)
+            self._fetcher.start()
+
+    def _fetch_loop(self):
+        while not self._stop.wait(self.fetch_interval):
+            try:
+                self.fetch()
+            except Exception as e:
+                print(f"Background fetch failed for {self.git_dir}: {e}")
+
+    def close_process(self):
+        with self._lock:
+            if self._process is not None:
+                self._process.stdin.close()
+                self._process.wait()
+                self._process = None
+
+    def close(self):
+        self._stop.set()
+        self.close_process()
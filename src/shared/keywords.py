@@ -0,0 +1,107 @@
+"""
+Rule-based keyword extraction
+
+Handles the common phrasings of a log query ("errors in document for the last 3 days in prod")
+without a model call. Fields that are missing or ambiguous are left out, so the LLM only has to
+be asked when the rules cannot answer.
+"""
+import math
+import os
+import re
+
+ENVIRONMENTS = {
+    "prod": "prod", "production": "prod", "real": "prod", "main": "prod", "master": "prod", "live": "prod",
+    "stag": "staging", "stage": "staging", "staging": "staging",
+    "dev": "dev", "development": "dev",
+}
+LEVELS = {
+    "error": "error", "errors": "error", "err": "error",
+    "warning": "warn", "warnings": "warn", "warn": "warn",
+    "info": "info", "debug": "debug", "critical": "critical",
+}
+HOURS_PER_UNIT = {"minute": 1 / 60, "min": 1 / 60, "hour": 1, "hr": 1, "h": 1, "day": 24, "d": 24, "week": 168, "w": 168}
+NUMBER_WORDS = {"a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+                "ten": 10, "twelve": 12}
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9_-]*")
+_PERIOD_PATTERN = re.compile(
+    r"\b(?:last|past|previous)?\s*(\d+|a|an|one|two|three|four|five|six|seven|ten|twelve)?\s*"
+    r"(minutes?|mins?|hours?|hrs?|h|days?|d|weeks?|w)\b"
+)
+_PROJECT_PATTERNS = [
+    re.compile(r"[*`\"']([a-z0-9][a-z0-9_-]*)[*`\"']"),
+    re.compile(r"\b(?:project|service|app|in|for|from|of)\s+([a-z0-9][a-z0-9_-]*)\s+(?:project|service|app)\b"),
+    re.compile(r"\b(?:project|service|app)\s*[:=]?\s+([a-z0-9][a-z0-9_-]*)"),
+    re.compile(r"\b([a-z0-9][a-z0-9_-]*)\s+(?:project|service)\b"),
+    re.compile(r"\b(?:errors?|warnings?|logs?|exceptions?)\s+(?:in|of|from|for)\s+([a-z0-9][a-z0-9_-]*)"),
+]
+_STOP_WORDS = set(ENVIRONMENTS) | set(LEVELS) | {
+    "the", "last", "past", "my", "our", "this", "that", "a", "an", "env", "environment", "logs", "log",
+    "please", "get", "show", "me", "project", "service", "app", "days", "hours", "weeks",
+    "in", "for", "from", "of", "on", "at", "to", "with", "and", "level",
+}
+
+
+def known_services() -> set[str]:
+    """Service names from KNOWN_SERVICES (comma separated)."""
+    return {name.strip().lower() for name in os.environ.get("KNOWN_SERVICES", "").split(",") if name.strip()}
+
+
+def _environment(tokens: list[str]) -> str|None:
+    found = set()
+    for token in tokens:
+        if token in ENVIRONMENTS:
+            found.add(ENVIRONMENTS[token])
+        elif token.endswith(("env", "-env")) and token.removesuffix("-env").removesuffix("env") in ENVIRONMENTS:
+            found.add(ENVIRONMENTS[token.removesuffix("-env").removesuffix("env")])
+        elif re.fullmatch(r"(prod|stag|dev)\d+", token):
+            found.add(ENVIRONMENTS[token.rstrip("0123456789")])
+    return found.pop() if len(found) == 1 else None
+
+
+def _level(tokens: list[str]) -> str|None:
+    found = {LEVELS[token] for token in tokens if token in LEVELS}
+    return found.pop() if len(found) == 1 else None
+
+
+def _hours(text: str) -> int|None:
+    if re.search(r"\b(today|yesterday)\b", text):
+        return 24
+    found = set()
+    for amount, unit in _PERIOD_PATTERN.findall(text):
+        unit = unit.rstrip("s") if unit not in ("hrs", "mins") else unit[:-1]
+        if not amount:
+            # "last days" has no amount and is ambiguous, "last day" / "last hour" is one unit
+            if unit in ("day", "hour", "week", "minute", "min", "hr") and re.search(rf"\b(last|past)\s+{unit}\b", text):
+                amount = "1"
+            else:
+                continue
+        value = int(amount) if amount.isdigit() else NUMBER_WORDS[amount]
+        found.add(max(1, math.ceil(value * HOURS_PER_UNIT[unit])))
+    return found.pop() if len(found) == 1 else None
+
+
+def _project(text: str, tokens: list[str]) -> str|None:
+    services = known_services()
+    matches = {token for token in tokens if token in services}
+    if matches:
+        # naming several known services asks for all of them (comma separated)
+        return ",".join(sorted(matches))
+    candidates = {match for pattern in _PROJECT_PATTERNS for match in pattern.findall(text)} - _STOP_WORDS
+    return candidates.pop() if len(candidates) == 1 else None
+
+
+def parse_keywords(text: str) -> dict:
+    """
+    Extract project_name, level, time_period_hours and environment from a user query.
+    :return: Dictionary with only the fields that could be determined unambiguously
+    """
+    text = text.lower()
+    tokens = _TOKEN_PATTERN.findall(text)
+    fields = {
+        "project_name": _project(text, tokens),
+        "level": _level(tokens),
+        "time_period_hours": _hours(text),
+        "environment": _environment(tokens),
+    }
+    return {key: value for key, value in fields.items() if value is not None}
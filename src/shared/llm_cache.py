@@ -0,0 +1,115 @@
+"""
+Model response cache
+
+Exact-match cache of model responses shared by both agents. A key is built from what decides the
+answer, not from the raw request: the step, the routed model, the prompt version, the fingerprint
+(message templates and stack frames) of the error group, the code revision (project@ref of the code
+URLs) and the normalized tool results the step has seen so far. A repeated analysis of the same
+group at the same revision skips the model call, in a new turn or session too; each agent plugs
+the cache into its own model calls.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import unquote
+
+# Bump to invalidate every cached response after a prompt template change.
+PROMPT_VERSION = "1"
+
+_VOLATILE_PATTERNS = [
+    (re.compile(r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:\.\d+)?(?:Z|[+-]\d{2}:?\d{2})?"), "<timestamp>"),
+    (re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b", re.IGNORECASE), "<uuid>"),
+    (re.compile(r"""(["']?(?:document_id|occurrance)["']?\s*[:=]\s*)("[^"]*"|'[^']*'|\d+|None|null)"""), r"\1<var>"),
+]
+
+
+def normalize(text: str) -> str:
+    """
+    Strip values that differ between occurrences of the same error group (timestamps, ids, counts),
+    so the same crash fingerprint and code revision map to the same key.
+    """
+    for pattern, replacement in _VOLATILE_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+_FILE_URL_PATTERN = re.compile(r"/projects/([^/\s\"']+)/repository/files/[^\s\"']+?/raw\?ref=([^\s\"'&,\]]+)")
+
+
+def make_key(model: str, payload: str) -> str:
+    material = json.dumps([model, PROMPT_VERSION, normalize(payload)])
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
+def code_revision(text: str) -> list[str]:
+    """project@ref of every GitLab raw file URL in text."""
+    return sorted({f"{unquote(project)}@{unquote(ref)}" for project, ref in _FILE_URL_PATTERN.findall(text)})
+
+
+def analysis_key(step: str, model: str, group: str, code: list[str], tool_results: list[str]) -> str:
+    """
+    Key of one model call of a step analysing an error group. The tool results tell the calls of one
+    turn apart (and change with the code that was read); everything else of the request is left out.
+    """
+    return make_key(model, json.dumps({"step": step, "group": group, "code": sorted(code), "tools": tool_results}))
+
+
+class ResponseCache:
+    """
+    Persistent exact-match cache of model responses in SQLite, with TTL and size (LRU) eviction.
+    """
+    def __init__(self, path: str, ttl_seconds: int = 7 * 24 * 3600, max_entries: int = 5000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._db.commit()
+
+    def get(self, key: str) -> str|None:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl_seconds:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+            self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            return row[0]
+
+    def put(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self._db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl_seconds,))
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+
+
+response_cache = ResponseCache(os.environ.get("LLM_CACHE_PATH", ".cache/llm_responses.sqlite"))
@@ -0,0 +1,31 @@
+"""
+Datadog log queries
+
+Both agents and the triage daemon accept one or several services and environments (comma separated)
+and turn them into Datadog queries here. Several services / environments are fetched with one
+combined query, or with one query per service and environment when LOG_FAN_OUT=parallel.
+"""
+import os
+
+FAN_OUT_MODE = os.environ.get("LOG_FAN_OUT", "combined")
+
+
+def split_values(value: str|list[str]) -> list[str]:
+    """Services or environments given as a list or a comma separated string, without duplicates."""
+    values = value if isinstance(value, list) else str(value).split(",")
+    return list(dict.fromkeys(item.strip() for item in values if item and item.strip()))
+
+
+def build_query(services: list[str], level: str, environments: list[str], separator: str = " AND ") -> str:
+    """Datadog query for the services and environments, e.g. `service:(a OR b) AND status:error AND env:prod`."""
+    def clause(facet: str, values: list[str]) -> str:
+        return f"{facet}:{values[0]}" if len(values) == 1 else f"{facet}:({' OR '.join(values)})"
+    return separator.join([clause('service', services), f"status:{level}", clause('env', environments)])
+
+
+def fan_out_queries(services: str|list[str], level: str, environments: str|list[str]) -> list[str]:
+    """The queries to fetch the logs of the services and environments with, according to FAN_OUT_MODE."""
+    services, environments = split_values(services), split_values(environments)
+    if FAN_OUT_MODE == "parallel":
+        return [build_query([service], level, [env]) for service in services for env in environments]
+    return [build_query(services, level, environments)]
@@ -0,0 +1,243 @@
+"""
+Provider rate limits and retries
+
+One token bucket per provider is shared by every caller of the process. The bucket follows what
+the provider reports: X-RateLimit-* / RateLimit-* headers adjust its rate and remaining tokens,
+and Retry-After or an exhausted limit pauses the provider until it resets. Work marked as
+background (batch triage, the daemon) leaves a reserve of the bucket to interactive work.
+
+call_with_retries / call_with_retries_async retry throttled (429), unavailable (5xx) and failed
+connections with full-jitter exponential backoff, and give up once the next attempt would end
+after the caller's deadline, by default the deadline of the current investigation.
+"""
+import asyncio
+import contextvars
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+
+import requests
+
+from src.shared.deadline import DeadlineExceeded, current_deadline
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_ATTEMPTS = 5
+BASE_DELAY = 1.0
+MAX_DELAY = 30.0
+# seconds a call may spend retrying when the caller has no deadline of its own
+DEFAULT_RETRY_BUDGET = 60.0
+# share of a bucket that background work leaves to interactive work
+BACKGROUND_RESERVE = 0.25
+
+priority = contextvars.ContextVar("rate_limit_priority", default="interactive")
+
+
+@contextmanager
+def background():
+    """Mark the provider calls made in this context (and tasks / threads started from it) as background work."""
+    token = priority.set("background")
+    try:
+        yield
+    finally:
+        priority.reset(token)
+
+
+def _header(headers, *names) -> str|None:
+    lowered = {key.lower(): value for key, value in (headers or {}).items()}
+    for name in names:
+        if name.lower() in lowered:
+            return lowered[name.lower()]
+    return None
+
+
+def _seconds(value: str|None) -> float|None:
+    """A delay given in seconds, as epoch seconds or as HTTP date, in seconds from now."""
+    if value is None:
+        return None
+    try:
+        number = float(value)
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+    # GitLab sends the reset as epoch seconds, Datadog as seconds until the reset
+    return max(0.0, number - time.time()) if number > 1e9 else number
+
+
+class RateLimiter:
+    """
+    Token bucket: allows `rate_per_minute` requests per minute on average and bursts of up to `burst`.
+    Shared by threads (acquire) and coroutines (acquire_async).
+    """
+    def __init__(self, rate_per_minute: float, burst: int|None = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = burst or max(1, int(rate_per_minute // 6))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _take(self, tokens: float) -> tuple[float, bool]:
+        """
+        Try to take the tokens.
+        :return: (seconds to wait, whether the tokens were taken)
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._blocked_until > now:
+                return self._blocked_until - now, False
+            if priority.get() == "background":
+                # background work only takes from the surplus above the reserve and never queues up debt
+                floor = self.capacity * BACKGROUND_RESERVE
+                if self._tokens - tokens < floor:
+                    return (floor + tokens - self._tokens) / self.rate, False
+                self._tokens -= tokens
+                return 0.0, True
+            self._tokens -= tokens
+            return (0.0 if self._tokens >= 0 else -self._tokens / self.rate), True
+
+    def acquire(self, tokens: float = 1):
+        while True:
+            wait, taken = self._take(tokens)
+            if wait:
+                time.sleep(wait)
+            if taken:
+                return
+
+    async def acquire_async(self, tokens: float = 1):
+        while True:
+            wait, taken = self._take(tokens)
+            if wait:
+                await asyncio.sleep(wait)
+            if taken:
+                return
+
+    def block(self, seconds: float):
+        """Let nobody through for the next `seconds`."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    def update_from_headers(self, headers):
+        """Follow the limit, remaining requests and reset time reported by the provider."""
+        limit = _header(headers, "X-RateLimit-Limit", "RateLimit-Limit")
+        period = _header(headers, "X-RateLimit-Period")
+        remaining = _header(headers, "X-RateLimit-Remaining", "RateLimit-Remaining")
+        reset = _seconds(_header(headers, "X-RateLimit-Reset", "RateLimit-Reset"))
+        retry_after = _seconds(_header(headers, "Retry-After"))
+        with self._lock:
+            if limit and period:
+                try:
+                    self.rate = float(limit) / float(period)
+                except (ValueError, ZeroDivisionError):
+                    pass
+            if remaining is not None:
+                try:
+                    self._tokens = min(self._tokens, float(remaining))
+                except ValueError:
+                    remaining = None
+        if remaining is not None and float(remaining) <= 0 and reset is not None:
+            self.block(reset)
+        if retry_after is not None:
+            self.block(retry_after)
+
+
+def status_and_headers(outcome) -> tuple[int|None, dict|None]:
+    """HTTP status and headers of a response or of the exception a client raised for one."""
+    if isinstance(outcome, requests.Response):
+        return outcome.status_code, outcome.headers
+    response = getattr(outcome, "response", None)
+    status = getattr(outcome, "status", None)
+    if not isinstance(status, int):
+        status = getattr(outcome, "code", None) if isinstance(getattr(outcome, "code", None), int) else None
+    if status is None and response is not None:
+        status = getattr(response, "status_code", None)
+    headers = getattr(outcome, "headers", None) or getattr(response, "headers", None)
+    return status, headers
+
+
+def is_retryable(outcome) -> bool:
+    status, _ = status_and_headers(outcome)
+    return status in RETRY_STATUSES or isinstance(outcome, (requests.ConnectionError, requests.Timeout))
+
+
+def retry_delay(provider: str, outcome, attempt: int, deadline: float) -> float|None:
+    """
+    Seconds to wait before the next attempt after a throttled or failed one, or None to give up.
+    The provider is paused for a Retry-After it sent; otherwise the delay is full-jitter backoff.
+    """
+    if attempt + 1 >= MAX_ATTEMPTS or not is_retryable(outcome):
+        return None
+    status, headers = status_and_headers(outcome)
+    retry_after = _seconds(_header(headers, "Retry-After"))
+    delay = random.uniform(0, min(MAX_DELAY, BASE_DELAY * 2 ** attempt))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    if time.monotonic() + delay > deadline:
+        return None
+    print(f"Retrying {provider} in {delay:.1f}s (attempt {attempt + 2}/{MAX_ATTEMPTS}, status {status or outcome})")
+    return delay
+
+
+def call_deadline(deadline: float|None, fetch: bool = True) -> float:
+    """The earlier of the caller's deadline and the investigation's, or the default retry budget."""
+    deadlines = [end for end in (deadline, current_deadline(fetch)) if end is not None]
+    return min(deadlines) if deadlines else time.monotonic() + DEFAULT_RETRY_BUDGET
+
+
+def call_with_retries(provider: str, fn, *args, deadline: float|None = None, **kwargs):
+    """
+    Call fn(*args, **kwargs) within the provider's rate limit, retrying throttled and failed calls.
+    A requests.Response with a final error status is returned as is; exceptions are raised.
+    :param deadline: time.monotonic() after which no attempt is started
+    :raises DeadlineExceeded: when the deadline has passed before the first attempt
+    """
+    deadline = call_deadline(deadline)
+    for attempt in range(MAX_ATTEMPTS):
+        if attempt == 0 and time.monotonic() >= deadline:
+            raise DeadlineExceeded(f"no time left to call {provider}")
+        provider_limits[provider].acquire()
+        try:
+            outcome = fn(*args, **kwargs)
+        except Exception as e:
+            outcome = e
+        provider_limits[provider].update_from_headers(status_and_headers(outcome)[1])
+        delay = retry_delay(provider, outcome, attempt, deadline)
+        if delay is None:
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+        time.sleep(delay)
+
+
+async def call_with_retries_async(provider: str, fn, *args, deadline: float|None = None, **kwargs):
+    """Coroutine variant of call_with_retries for async clients; fn returns an awaitable."""
+    deadline = call_deadline(deadline)
+    for attempt in range(MAX_ATTEMPTS):
+        if attempt == 0 and time.monotonic() >= deadline:
+            raise DeadlineExceeded(f"no time left to call {provider}")
+        await provider_limits[provider].acquire_async()
+        try:
+            outcome = await fn(*args, **kwargs)
+        except Exception as e:
+            outcome = e
+        provider_limits[provider].update_from_headers(status_and_headers(outcome)[1])
+        delay = retry_delay(provider, outcome, attempt, deadline)
+        if delay is None:
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+        await asyncio.sleep(delay)
+
+
+provider_limits = {
+    "gemini": RateLimiter(float(os.environ.get("GEMINI_RPM", "60"))),
+    "gitlab": RateLimiter(float(os.environ.get("GITLAB_RPM", "600"))),
+    "datadog": RateLimiter(float(os.environ.get("DATADOG_RPM", "60"))),
+    "openai": RateLimiter(float(os.environ.get("OPENAI_RPM", "60"))),
+}
@@ -0,0 +1,52 @@
+"""
+Terminal rendering of streamed output
+
+Both agents stream model output to the terminal as it is generated. The text is written by a
+background thread, so a slow terminal never blocks the event loop or the graph; each author's
+(agent's or node's) streamed output is framed by a header and a footer.
+"""
+import queue
+import sys
+import threading
+
+
+class StreamRenderer:
+    """
+    Writes streamed text from a background thread.
+    write() only enqueues; flush() waits until everything queued has been written.
+    :param header: written before an author's first text, formatted with the author
+    :param footer: written when an author's output is finished
+    """
+    def __init__(self, header: str = "\n{author}\n", footer: str = "\n", stream=sys.stdout):
+        self.header = header
+        self.footer = footer
+        self.stream = stream
+        self.streamed = set()
+        self._queue = queue.Queue()
+        threading.Thread(target=self._run, name="stream-renderer", daemon=True).start()
+
+    def _run(self):
+        while True:
+            text = self._queue.get()
+            try:
+                self.stream.write(text)
+                self.stream.flush()
+            finally:
+                self._queue.task_done()
+
+    def write(self, author: str, text: str):
+        if author not in self.streamed:
+            self.streamed.add(author)
+            text = self.header.format(author=author) + text
+        self._queue.put(text)
+
+    def finish(self, author: str|None = None) -> set[str]:
+        """End the streamed output of an author, or of every author. Returns the authors that had streamed."""
+        finished = {author} & self.streamed if author is not None else set(self.streamed)
+        self.streamed -= finished
+        for _ in finished:
+            self._queue.put(self.footer)
+        return finished
+
+    def flush(self):
+        self._queue.join()
@@ -0,0 +1,138 @@
+"""
+Model routing
+
+Every model call of a routed step (an ADK agent or a graph node) is sent either to the step's fast
+or strong model. Each agent has its own policy table, which decides per step: large inputs, many
+stack frames or a poor recent success rate of the fast route send the call to the strong model.
+The default tables use each step's own model as its fast route, so routing only ever escalates;
+a cheaper fast route is opt-in through the policy file.
+
+Latency and estimated tokens/cost of every call, and the outcome of the calls that have one (the
+step's answer parsed or validated), are recorded per route in SQLite, so the thresholds can be
+tuned from the data. Unrouted calls are recorded as the "default" route.
+
+The defaults can be overridden per step with a JSON file at ROUTING_POLICY_PATH, e.g.
+{"analyze_logs": {"max_fast_tokens": 12000}} or {"api_retriever": {"fast": "openai:gpt-4.1-mini",
+"strong": "openai:gpt-4.1", "max_fast_tokens": 4000}}. ROUTING_DISABLED keeps each step's own model.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from src.shared.analysis_index import stack_fingerprint
+from src.shared.tokens import estimate_tokens
+
+# the fast route is abandoned while its success rate over the last `window` calls is below this
+MIN_FAST_SUCCESS = 0.8
+SUCCESS_WINDOW = 50
+MIN_SAMPLES = 10
+
+# USD per million input / output tokens, for the cost estimate
+MODEL_PRICES = {
+    "gemini-2.0-flash-lite": (0.075, 0.30),
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-pro": (1.25, 10.00),
+    "openai:gpt-4.1-mini": (0.40, 1.60),
+    "openai:gpt-4.1": (2.00, 8.00),
+}
+
+
+def load_policy(defaults: dict) -> dict:
+    """The policy table from the agent's defaults and the overrides at ROUTING_POLICY_PATH."""
+    policy = {step: dict(route) for step, route in defaults.items()}
+    path = os.environ.get("ROUTING_POLICY_PATH")
+    if path and os.path.exists(path):
+        with open(path) as f:
+            for step, overrides in json.load(f).items():
+                policy.setdefault(step, {}).update(overrides)
+    return policy
+
+
+def estimate_cost(model: str, prompt_tokens: int, output_tokens: int) -> float:
+    input_price, output_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+
+class RouteMetrics:
+    """Per-call latency, token, cost and outcome records in SQLite; success is NULL for calls without an outcome."""
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS route_calls ("
+            "step TEXT NOT NULL, route TEXT NOT NULL, model TEXT NOT NULL, latency REAL NOT NULL, "
+            "prompt_tokens INTEGER NOT NULL, output_tokens INTEGER NOT NULL, cost REAL NOT NULL, "
+            "success INTEGER, created REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS route_calls_step ON route_calls (step, route, created)")
+        self._db.commit()
+
+    def record(self, step: str, route: str, model: str, latency: float, prompt_tokens: int, output_tokens: int,
+               success: bool|None):
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO route_calls VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (step, route, model, latency, prompt_tokens, output_tokens,
+                 estimate_cost(model, prompt_tokens, output_tokens),
+                 None if success is None else int(success), time.time()),
+            )
+            self._db.commit()
+
+    def success_rate(self, step: str, route: str, window: int = SUCCESS_WINDOW) -> tuple[float, int]:
+        """Success rate of the route's last `window` calls with an outcome, and the number of calls it is based on."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT AVG(success), COUNT(*) FROM (SELECT success FROM route_calls "
+                "WHERE step = ? AND route = ? AND success IS NOT NULL ORDER BY created DESC LIMIT ?)",
+                (step, route, window),
+            ).fetchone()
+        return (row[0] if row[1] else 1.0), row[1]
+
+    def summary(self, since: float = 0.0) -> list[dict]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT step, route, model, COUNT(*), AVG(success), AVG(latency), MAX(latency), SUM(cost) "
+                "FROM route_calls WHERE created >= ? GROUP BY step, route, model ORDER BY step, route",
+                (since,),
+            ).fetchall()
+        keys = ("step", "route", "model", "calls", "success_rate", "avg_latency", "max_latency", "cost")
+        return [dict(zip(keys, row)) for row in rows]
+
+
+route_metrics = RouteMetrics(os.environ.get("ROUTING_METRICS_PATH", ".cache/routing_metrics.sqlite"))
+
+
+def choose_route(policy: dict, step: str, text: str) -> tuple[str, str]|None:
+    """
+    Pick the route for one model call of a step from its input.
+    :return: (route name, model) or None if the step is not routed
+    """
+    rules = policy.get(step)
+    if not rules or os.environ.get("ROUTING_DISABLED"):
+        return None
+    success, samples = route_metrics.success_rate(step, "fast")
+    if (estimate_tokens(text) > rules.get("max_fast_tokens", float("inf"))
+            or len(stack_fingerprint(text)) > rules.get("max_fast_frames", float("inf"))
+            or (samples >= MIN_SAMPLES and success < rules.get("min_fast_success", MIN_FAST_SUCCESS))):
+        return "strong", rules["strong"]
+    return "fast", rules["fast"]
+
+
+def record_call(step: str, route: str, model: str, started: float, prompt: str, output, success: bool|None):
+    """Record a routed call that started at `started` (time.perf_counter())."""
+    route_metrics.record(step, route, model, time.perf_counter() - started,
+                         estimate_tokens(prompt), estimate_tokens(str(output)), success)
+
+
+def print_route_stats(since: float = 0.0):
+    for row in route_metrics.summary(since):
+        success = "-" if row["success_rate"] is None else f"{row['success_rate']:.0%}"
+        print(f"[route {row['step']}/{row['route']}] {row['model']}: {row['calls']} calls, "
+              f"{success} success, {row['avg_latency']:.2f}s avg / {row['max_latency']:.2f}s max, "
+              f"${row['cost']:.4f}")
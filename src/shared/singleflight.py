@@ -0,0 +1,123 @@
+import contextvars
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable
+
+
+class SingleFlight:
+    """
+    Run-scoped request coalescing.
+    Identical calls that are in flight are merged into one, and finished results are memoized for
+    the rest of the run. Failures and missing (None) batch results are not memoized.
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._results: dict[Hashable, Future] = {}
+        self.calls = 0
+        self.executed = 0
+        self.coalesced = 0
+        self.memoized = 0
+
+    def _claim(self, key: Hashable) -> tuple[Future, bool]:
+        # must be called with self._lock held
+        self.calls += 1
+        future = self._results.get(key)
+        if future is None:
+            future = self._results[key] = Future()
+            self.executed += 1
+            return future, True
+        if future.done():
+            self.memoized += 1
+        else:
+            self.coalesced += 1
+        return future, False
+
+    def _fail(self, key: Hashable, future: Future, error: BaseException):
+        with self._lock:
+            if self._results.get(key) is future:
+                del self._results[key]
+        future.set_exception(error)
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Return fn(*args, **kwargs), sharing the result with every other call made with the same key.
+        """
+        with self._lock:
+            future, owner = self._claim(key)
+        if owner:
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                self._fail(key, future, e)
+        return future.result()
+
+    def do_many(self, keys: list[Hashable], fn: Callable[[list[Hashable]], dict]) -> dict:
+        """
+        Batch variant of do(): fn receives only the keys nobody else is fetching and returns
+        a dict of key -> value (keys it leaves out resolve to None, and are fetched again by the next call).
+        :return: Dictionary with every requested key and its value
+        """
+        owned, futures = [], {}
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                futures[key], owner = self._claim(key)
+                if owner:
+                    owned.append(key)
+        if owned:
+            try:
+                values = fn(owned)
+            except BaseException as e:
+                for key in owned:
+                    self._fail(key, futures[key], e)
+                raise
+            for key in owned:
+                value = values.get(key)
+                if value is None:
+                    with self._lock:
+                        if self._results.get(key) is futures[key]:
+                            del self._results[key]
+                futures[key].set_result(value)
+        return {key: future.result() for key, future in futures.items()}
+
+    def forget(self, key: Hashable):
+        """Drop a memoized result, e.g. one that was fetched speculatively and is no longer needed."""
+        with self._lock:
+            future = self._results.get(key)
+            if future is not None and future.done():
+                del self._results[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "executed": self.executed,
+                "coalesced": self.coalesced,
+                "memoized": self.memoized,
+                "saved": self.coalesced + self.memoized,
+            }
+
+
+FLIGHTS = ("gitlab", "datadog")
+
+# flights of the current run; tasks and threads started from the run share them
+_flights: contextvars.ContextVar[dict[str, SingleFlight]|None] = contextvars.ContextVar("flights", default=None)
+
+
+def start_flights():
+    """Start a run with its own flights, so concurrent runs neither share nor wipe each other's results."""
+    _flights.set({name: SingleFlight(name) for name in FLIGHTS})
+
+
+def flight(name: str) -> SingleFlight:
+    """The current run's flight of a provider; a call outside a run gets one of its own."""
+    flights = _flights.get()
+    return flights[name] if flights is not None else SingleFlight(name)
+
+
+def print_flight_stats():
+    for current in (_flights.get() or {}).values():
+        stats = current.stats()
+        if stats["calls"]:
+            print(f"[{current.name}] {stats['calls']} calls, {stats['executed']} executed, "
+                  f"{stats['saved']} saved ({stats['coalesced']} coalesced, {stats['memoized']} memoized)")
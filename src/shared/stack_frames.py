@@ -0,0 +1,30 @@
+"""
+Stack frame parsing
+
+Resolves the source files an error points at from its stack trace, without the LLM: the innermost
+frames of a Java or Python trace and the GitLab project of the service. Used by both agents to
+resolve code URLs before (or instead of) asking a model.
+"""
+import re
+
+_JAVA_FRAME_PATTERN = re.compile(r"at\s+([\w$.]+)\.[\w$<>]+\(([\w$]+\.java):\d+\)")
+_PYTHON_FRAME_PATTERN = re.compile(r"""File\s+["']([^"']+\.py)["'],\s+line\s+\d+""")
+
+
+def project_path(appname: str) -> str:
+    """eco-carsync-frontend → eco/carsync-frontend, carsync-frontend → eco/carsync-frontend"""
+    return appname.replace('-', '/', 1) if appname.startswith('eco-') else f"eco/{appname}"
+
+
+def innermost_files(stack_trace: str|None, exc_info: str|None, limit: int = 3) -> list[str]:
+    """
+    File paths of the innermost frames: the first frames of a Java trace, the last ones of a Python trace.
+    """
+    java_files = [
+        fqcn.split('$')[0].replace('.', '/') + '.java'
+        for fqcn, _ in _JAVA_FRAME_PATTERN.findall(stack_trace or '')
+    ]
+    if java_files:
+        return list(dict.fromkeys(java_files))[:limit]
+    python_files = _PYTHON_FRAME_PATTERN.findall(exc_info or stack_trace or '')
+    return list(dict.fromkeys(reversed(python_files)))[:limit]
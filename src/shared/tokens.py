@@ -0,0 +1,3 @@
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (4 characters per token), used for budgeting, routing and usage reports."""
+    return len(text) // 4 + 1
@@ -0,0 +1,235 @@
+"""
+Tracing and metrics
+
+Shared by both agents. Spans for agents, model calls and tools come from ADK's own OpenTelemetry
+instrumentation (src.log_agent) or from the graph callbacks of log_agent_langgraph.tracing; Datadog
+pages, GitLab requests, mirror reads and cache lookups add their own spans here. Every finished
+span is
+- aggregated into Prometheus metrics (duration histogram, bytes, tokens, cache hits/misses per span),
+- appended to TRACE_EXPORT_PATH as OTLP JSON (one ExportTraceServiceRequest per line),
+- kept per trace, so the breakdown of a run can be printed at its end.
+"""
+import base64
+import contextvars
+import json
+import os
+import threading
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+from google.protobuf.json_format import MessageToDict
+from opentelemetry import trace
+from opentelemetry.exporter.otlp.proto.common.trace_encoder import encode_spans
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, SpanProcessor, TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+
+TRACE_EXPORT_PATH = os.environ.get("TRACE_EXPORT_PATH", ".cache/traces.jsonl")
+METRICS_PATH = os.environ.get("METRICS_PATH", ".cache/metrics.prom")
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+tracer = trace.get_tracer("log_agent")
+
+
+def span_kind_and_name(span: ReadableSpan) -> tuple[str, str]:
+    """Map ADK span names ('agent_run [log_filter]', 'tool_call [get_url]', 'call_llm') and ours to (kind, name)."""
+    kind = span.attributes.get("log_agent.kind") if span.attributes else None
+    if kind:
+        return kind, span.name
+    if span.name.startswith("agent_run ["):
+        return "agent", span.name[len("agent_run ["):-1]
+    if span.name.startswith("tool_call ["):
+        return "tool", span.name[len("tool_call ["):-1]
+    if span.name == "call_llm":
+        return "llm", span.name
+    return "other", span.name
+
+
+class MetricsProcessor(SpanProcessor):
+    """
+    Aggregates finished spans into Prometheus metrics and keeps the spans of recent traces.
+    """
+    def __init__(self, max_traces: int = 20):
+        self._lock = threading.Lock()
+        self._count = defaultdict(int)
+        self._duration = defaultdict(float)
+        self._buckets = defaultdict(lambda: [0] * len(DURATION_BUCKETS))
+        self._bytes = defaultdict(int)
+        self._tokens = defaultdict(int)
+        self._cache = defaultdict(int)
+        self._traces: dict[int, list[ReadableSpan]] = {}
+        self._trace_order = deque(maxlen=max_traces)
+
+    def on_end(self, span: ReadableSpan):
+        key = span_kind_and_name(span)
+        duration = (span.end_time - span.start_time) / 1e9
+        attributes = span.attributes or {}
+        with self._lock:
+            self._count[key] += 1
+            self._duration[key] += duration
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    self._buckets[key][i] += 1
+            self._bytes[key] += int(attributes.get("bytes", 0))
+            for direction in ("prompt", "output"):
+                self._tokens[key + (direction,)] += int(attributes.get(f"tokens.{direction}", 0))
+            if "cache.hit" in attributes:
+                self._cache[key + ("hit" if attributes["cache.hit"] else "miss",)] += 1
+            self._cache[key + ("hit",)] += int(attributes.get("cache.hits", 0))
+            self._cache[key + ("miss",)] += int(attributes.get("cache.misses", 0))
+
+            trace_id = span.context.trace_id
+            if trace_id not in self._traces:
+                if len(self._trace_order) == self._trace_order.maxlen:
+                    self._traces.pop(self._trace_order[0], None)
+                self._trace_order.append(trace_id)
+                self._traces[trace_id] = []
+            self._traces[trace_id].append(span)
+
+    def spans(self, trace_id: int) -> list[ReadableSpan]:
+        with self._lock:
+            return list(self._traces.get(trace_id, []))
+
+    def render_prometheus(self) -> str:
+        """Metrics in the Prometheus text exposition format."""
+        def labels(key: tuple, **extra) -> str:
+            pairs = {"kind": key[0], "name": key[1], **extra}
+            return "{" + ",".join(f'{k}="{str(v).replace(chr(34), chr(39))}"' for k, v in pairs.items()) + "}"
+
+        lines = ["# HELP log_agent_span_duration_seconds Duration of agent, node, tool and request spans.",
+                 "# TYPE log_agent_span_duration_seconds histogram"]
+        with self._lock:
+            for key in sorted(self._count):
+                for bound, count in zip(DURATION_BUCKETS, self._buckets[key]):
+                    lines.append(f"log_agent_span_duration_seconds_bucket{labels(key, le=bound)} {count}")
+                lines.append(f'log_agent_span_duration_seconds_bucket{labels(key, le="+Inf")} {self._count[key]}')
+                lines.append(f"log_agent_span_duration_seconds_sum{labels(key)} {self._duration[key]:.6f}")
+                lines.append(f"log_agent_span_duration_seconds_count{labels(key)} {self._count[key]}")
+            lines += ["# HELP log_agent_span_bytes_total Bytes transferred by spans.",
+                      "# TYPE log_agent_span_bytes_total counter"]
+            lines += [f"log_agent_span_bytes_total{labels(key)} {value}" for key, value in sorted(self._bytes.items())
+                      if value]
+            lines += ["# HELP log_agent_tokens_total Estimated model tokens.",
+                      "# TYPE log_agent_tokens_total counter"]
+            lines += [f"log_agent_tokens_total{labels(key[:2], direction=key[2])} {value}"
+                      for key, value in sorted(self._tokens.items()) if value]
+            lines += ["# HELP log_agent_cache_lookups_total Cache lookups by result.",
+                      "# TYPE log_agent_cache_lookups_total counter"]
+            lines += [f"log_agent_cache_lookups_total{labels(key[:2], result=key[2])} {value}"
+                      for key, value in sorted(self._cache.items()) if value]
+        return "\n".join(lines) + "\n"
+
+
+class OTLPJsonFileExporter(SpanExporter):
+    """
+    Appends spans as OTLP/JSON ExportTraceServiceRequest objects, one per line,
+    which any OTLP/HTTP JSON collector endpoint accepts as request body.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    @staticmethod
+    def _hex_ids(value):
+        # protobuf JSON encodes bytes as base64, OTLP/JSON expects hex trace and span ids
+        if isinstance(value, dict):
+            return {
+                key: base64.b64decode(item).hex() if key in ("traceId", "spanId", "parentSpanId") else
+                OTLPJsonFileExporter._hex_ids(item)
+                for key, item in value.items()
+            }
+        if isinstance(value, list):
+            return [OTLPJsonFileExporter._hex_ids(item) for item in value]
+        return value
+
+    def export(self, spans) -> SpanExportResult:
+        try:
+            payload = self._hex_ids(MessageToDict(encode_spans(spans)))
+            with open(self.path, "a") as f:
+                f.write(json.dumps(payload) + "\n")
+            return SpanExportResult.SUCCESS
+        except Exception as e:
+            print(f"Trace export failed: {e}")
+            return SpanExportResult.FAILURE
+
+    def shutdown(self):
+        pass
+
+
+metrics_processor = MetricsProcessor()
+_setup_lock = threading.Lock()
+_is_setup = False
+
+
+def setup_tracing(service_name: str = "log_agent"):
+    """Install the tracer provider with the metrics processor and the OTLP JSON exporter (once)."""
+    global _is_setup
+    with _setup_lock:
+        if _is_setup or os.environ.get("TRACING_DISABLED"):
+            return
+        provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+        provider.add_span_processor(metrics_processor)
+        if TRACE_EXPORT_PATH:
+            provider.add_span_processor(BatchSpanProcessor(OTLPJsonFileExporter(TRACE_EXPORT_PATH)))
+        trace.set_tracer_provider(provider)
+        _is_setup = True
+
+
+@contextmanager
+def span(name: str, kind: str, **attributes):
+    """Start a span of the given kind ('datadog', 'gitlab', 'mirror', 'cache', 'node', ...) as the current span."""
+    with tracer.start_as_current_span(name, attributes={"log_agent.kind": kind, **attributes}) as current:
+        yield current
+
+
+def annotate(**attributes):
+    """Set attributes (bytes, tokens.prompt, tokens.output, cache.hit, ...) on the current span."""
+    current = trace.get_current_span()
+    for key, value in attributes.items():
+        current.set_attribute(key.replace("_", "."), value)
+
+
+def current_trace_id() -> int:
+    return trace.get_current_span().get_span_context().trace_id
+
+
+def in_current_context(fn):
+    """Bind fn to the current trace context, so spans it starts in a worker thread keep their parent."""
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+    return run
+
+
+def write_metrics(path: str = METRICS_PATH):
+    """Write the metrics for the Prometheus node exporter textfile collector (or any scraper of the file)."""
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        f.write(metrics_processor.render_prometheus())
+    os.replace(path + ".tmp", path)
+
+
+def print_trace_breakdown(trace_id: int, top: int = 12):
+    """
+    Print where the time of one trace went: self time (duration minus child spans) per kind and name.
+    """
+    spans = metrics_processor.spans(trace_id)
+    if not spans:
+        return
+    children = defaultdict(float)
+    for s in spans:
+        if s.parent is not None:
+            children[s.parent.span_id] += (s.end_time - s.start_time) / 1e9
+    totals = defaultdict(lambda: [0, 0.0, 0.0])
+    for s in spans:
+        duration = (s.end_time - s.start_time) / 1e9
+        entry = totals[span_kind_and_name(s)]
+        entry[0] += 1
+        entry[1] += duration
+        entry[2] += max(0.0, duration - children[s.context.span_id])
+    print("[trace] self time by span (count, total, self):")
+    for (kind, name), (count, total, self_time) in sorted(totals.items(), key=lambda item: -item[1][2])[:top]:
+        print(f"  {kind:<8} {name:<40} {count:>4}x {total:>8.2f}s {self_time:>8.2f}s")
@@ -1,7 +1,12 @@
-from datetime import datetime
-
+from google.adk.agents.run_config import RunConfig, StreamingMode
 from google.genai import types
 
+from src.log_agent.history import history_store
+from src.shared.rendering import StreamRenderer
+
+# agents whose output is streamed token by token; the others are printed once complete
+STREAMED_AGENTS = {"log_filter", "log_analyzer", "code_analyzer"}
+
 
 # ANSI color codes for terminal output
 class Colors:
@@ -30,11 +35,21 @@ class Colors:
     BG_WHITE = "\033[47m"
 
 
+# streamed text is shown as a framed, colored block per agent
+renderer = StreamRenderer(
+    header=f"\n{Colors.BG_BLUE}{Colors.WHITE}{Colors.BOLD}╔══ {{author}} ══{Colors.RESET}\n{Colors.CYAN}",
+    footer=f"{Colors.RESET}\n{Colors.BG_BLUE}{Colors.WHITE}{Colors.BOLD}╚{'═' * 60}{Colors.RESET}\n",
+)
+
+
 def update_interaction_history(session_service, app_name, user_id, session_id, entry):
-    """Add an entry to the interaction history in state.
+    """Add an entry to the interaction history of the session.
+
+    The entry is appended to the history store; the session itself is not read or rewritten,
+    so the cost does not grow with the history and concurrent updates are not lost.
 
     Args:
-        session_service: The session service instance
+        session_service: The session service instance (unused, kept for callers)
         app_name: The application name
         user_id: The user ID
         session_id: The session ID
@@ -43,32 +58,7 @@ def update_interaction_history(session_service, app_name, user_id, session_id, e
             - other keys are flexible depending on the action type
     """
     try:
-        # Get current session
-        session = session_service.get_session(
-            app_name=app_name, user_id=user_id, session_id=session_id
-        )
-
-        # Get current interaction history
-        interaction_history = session.state.get("interaction_history", [])
-
-        # Add timestamp if not already present
-        if "timestamp" not in entry:
-            entry["timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-        # Add the entry to interaction history
-        interaction_history.append(entry)
-
-        # Create updated state
-        updated_state = session.state.copy()
-        updated_state["interaction_history"] = interaction_history
-
-        # Create a new session with updated state
-        session_service.create_session(
-            app_name=app_name,
-            user_id=user_id,
-            session_id=session_id,
-            state=updated_state,
-        )
+        history_store.append(app_name, user_id, session_id, entry)
     except Exception as e:
         print(f"Error updating interaction history: {e}")
 
@@ -134,8 +124,8 @@ def display_state(
         else:
             print("📚 Courses: None")
 
-        # Handle interaction history in a more readable way
-        interaction_history = session.state.get("interaction_history", [])
+        # Handle interaction history in a more readable way (latest window and summary of older entries)
+        interaction_history = history_store.window(app_name, user_id, session_id)
         if interaction_history:
             print("📝 Interaction History:")
             for idx, interaction in enumerate(interaction_history, 1):
@@ -144,7 +134,10 @@ def display_state(
                     action = interaction.get("action", "interaction")
                     timestamp = interaction.get("timestamp", "unknown time")
 
-                    if action == "user_query":
+                    if action == "summary":
+                        print(f'  {idx}. Summary of {interaction.get("entries")} earlier entries: '
+                              f'{interaction.get("summary", "")}')
+                    elif action == "user_query":
                         query = interaction.get("query", "")
                         print(f'  {idx}. User query at {timestamp}: "{query}"')
                     elif action == "agent_response":
@@ -187,13 +180,23 @@ def display_state(
 
 async def process_agent_response(event):
     """Process and display agent response events."""
+    if event.partial:
+        # streamed chunk: hand the text to the renderer and move on
+        if event.author in STREAMED_AGENTS and event.content and event.content.parts:
+            text = "".join(part.text or "" for part in event.content.parts)
+            if text:
+                renderer.write(event.author, text)
+        return None
+
+    streamed = renderer.finish(event.author)
+    renderer.flush()
     print(f"Event ID: {event.id}, Author: {event.author}")
 
     # Check for specific parts first
     has_specific_part = False
     if event.content and event.content.parts:
         for part in event.content.parts:
-            if hasattr(part, "text") and part.text and not part.text.isspace():
+            if hasattr(part, "text") and part.text and not part.text.isspace() and not streamed:
                 print(f"  Text: '{part.text.strip()}'")
 
     # Check for final response after specific parts
@@ -206,6 +209,8 @@ async def process_agent_response(event):
             and event.content.parts[0].text
         ):
             final_response = event.content.parts[0].text.strip()
+            if streamed:
+                return final_response
             # Use colors and formatting to make the final response stand out
             print(
                 f"\n{Colors.BG_BLUE}{Colors.WHITE}{Colors.BOLD}╔══ AGENT RESPONSE ═════════════════════════════════════════{Colors.RESET}"
@@ -244,7 +249,10 @@ async def call_agent_async(runner, user_id, session_id, query):
 
     try:
         async for event in runner.run_async(
-            user_id=user_id, session_id=session_id, new_message=content
+            user_id=user_id,
+            session_id=session_id,
+            new_message=content,
+            run_config=RunConfig(streaming_mode=StreamingMode.SSE),
         ):
             # Capture the agent name from the event if available
             if event.author:
@@ -255,6 +263,8 @@ async def call_agent_async(runner, user_id, session_id, query):
                 final_response_text = response
     except Exception as e:
         print(f"{Colors.BG_RED}{Colors.WHITE}ERROR during agent run: {e}{Colors.RESET}")
+    finally:
+        renderer.flush()
 
     # Add the agent response to interaction history if we got a final response
     if final_response_text and agent_name:
@@ -0,0 +1,34 @@
+from types import SimpleNamespace
+
+from google.adk.events import Event
+from google.genai import types
+
+from src.log_agent.analysis_index import group_fingerprint
+
+
+def event(invocation_id: str, role: str, text: str) -> Event:
+    return Event(invocation_id=invocation_id, author="user" if role == "user" else "log_analyzer",
+                 content=types.Content(role=role, parts=[types.Part(text=text)]))
+
+
+def callback_context(invocation_id: str, events: list[Event]):
+    session = SimpleNamespace(events=events)
+    return SimpleNamespace(_invocation_context=SimpleNamespace(invocation_id=invocation_id, session=session))
+
+
+def test_group_fingerprint_ignores_earlier_turns_and_model_answers():
+    events = [
+        event("turn-1", "user", '{"message": "Vehicle 12 not found"}'),
+        event("turn-1", "model", '{"message": "Vehicle 12 not found"} is caused by ...'),
+        event("turn-2", "user", '{"message": "Connection refused to db-3"}'),
+        event("turn-2", "model", "Looking into it"),
+    ]
+    assert group_fingerprint(callback_context("turn-2", events)) == "Connection refused to db-<*>"
+
+
+def test_group_fingerprint_is_empty_without_log_entries():
+    events = [
+        event("turn-1", "user", '{"message": "Vehicle 12 not found"}'),
+        event("turn-2", "user", "and what about yesterday?"),
+    ]
+    assert group_fingerprint(callback_context("turn-2", events)) == ""
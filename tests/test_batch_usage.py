@@ -0,0 +1,26 @@
+import asyncio
+
+from src.log_agent import batch
+
+
+def test_concurrent_batches_count_their_own_usage(monkeypatch):
+    async def analyze_packed(groups, usage):
+        for _ in groups:
+            usage["llm_calls"] += 1
+            await asyncio.sleep(0.01)
+        return groups
+
+    monkeypatch.setattr(batch, "query_log_groups",
+                        lambda project_name, *args, top_n: [{"message": project_name}] * len(project_name))
+    monkeypatch.setattr(batch, "analyze_packed", analyze_packed)
+    monkeypatch.setattr(batch, "print_trace_breakdown", lambda trace_id: None)
+    monkeypatch.setattr(batch, "write_metrics", lambda: None)
+
+    async def run_both():
+        return await asyncio.gather(batch.triage_all("doc", "error", 1, "prod", packed=True),
+                                    batch.triage_all("fleet", "error", 1, "prod", packed=True))
+    (_, doc_usage), (_, fleet_usage) = asyncio.run(run_both())
+
+    assert doc_usage["llm_calls"] == 3
+    assert fleet_usage["llm_calls"] == 5
+    assert batch._usage.get() is None
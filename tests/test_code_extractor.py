@@ -0,0 +1,26 @@
+import time
+
+from src.log_agent.subagents.code_extractor import tools
+from src.log_agent.subagents.code_extractor.tools import candidate_paths, probe_candidates
+
+
+def test_python_paths_keep_a_package_directory():
+    paths = candidate_paths("/usr/src/app/fleet/vehicle.py")
+    assert paths[0] == "usr/src/app/fleet/vehicle.py"
+    assert "fleet/vehicle.py" in paths and "src/fleet/vehicle.py" in paths
+    assert "vehicle.py" not in paths
+    assert candidate_paths("main.py") == ["main.py", "src/main.py"]
+
+
+def test_the_most_likely_existing_path_wins(monkeypatch):
+    # the first candidate exists but answers last, the third answers first
+    delays = {"a/fleet/vehicle.py": 0.3, "fleet/vehicle.py": 0.1, "vehicle/fleet/vehicle.py": 0.0}
+
+    def probe(project, path, branch):
+        time.sleep(delays[path])
+        return None if path == "fleet/vehicle.py" else f"url:{path}"
+
+    monkeypatch.setattr(tools, "try_gitlab_api", probe)
+    assert probe_candidates("eco/fleet", list(delays), "master") == "url:a/fleet/vehicle.py"
+    # past the deadline, the most likely hit among the finished probes
+    assert probe_candidates("eco/fleet", list(delays), "master", deadline=0.2) == "url:vehicle/fleet/vehicle.py"
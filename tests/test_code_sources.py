@@ -0,0 +1,8 @@
+from src.shared.code_sources import make_file_url, parse_file_url
+
+
+def test_file_urls_round_trip():
+    url = make_file_url("eco/fleet-core", "core/src/main/java/de/Vehicle.java", "release/1.2", "https://gitlab.example")
+    assert parse_file_url(url) == ("https://gitlab.example", "eco/fleet-core", "core/src/main/java/de/Vehicle.java",
+                                   "release/1.2")
+    assert parse_file_url("https://gitlab.example/eco/fleet-core/-/blob/master/Vehicle.java") is None
@@ -0,0 +1,44 @@
+import subprocess
+
+import pytest
+
+from src.shared.git_mirror import GitMirror
+
+
+def git(*args, cwd=None):
+    subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True)
+
+
+@pytest.fixture
+def mirror(tmp_path):
+    origin = tmp_path / "origin"
+    origin.mkdir()
+    git("init", "-q", "-b", "master", cwd=origin)
+    (origin / "app.py").write_text("print('hello')\n")
+    git("add", "app.py", cwd=origin)
+    git("-c", "user.name=t", "-c", "user.email=t@t", "commit", "-q", "-m", "init", cwd=origin)
+    git("clone", "-q", "--mirror", str(origin), str(tmp_path / "mirror.git"))
+    mirror = GitMirror(str(tmp_path / "mirror.git"), min_fetch_gap=0)
+    fetches = []
+    fetch = mirror.fetch
+    mirror.fetch = lambda force=True: fetches.append(force) or fetch(force)
+    yield mirror, fetches
+    mirror.close()
+
+
+def test_read_known_path(mirror):
+    mirror, fetches = mirror
+    assert mirror.read("master", "app.py") == "print('hello')\n"
+    assert fetches == []
+
+
+def test_missing_path_at_known_ref_does_not_fetch(mirror):
+    mirror, fetches = mirror
+    assert mirror.read("master", "missing.py") is None
+    assert fetches == []
+
+
+def test_unknown_ref_fetches_once(mirror):
+    mirror, fetches = mirror
+    assert mirror.read("feature/unknown", "app.py") is None
+    assert fetches == [False]
@@ -0,0 +1,93 @@
+import contextvars
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+import pytest
+
+from src.log_agent.sources.gitlab import fetch_blobs, source_cache
+from src.shared.singleflight import start_flights
+
+PROJECT = "eco/fleet"
+FILES = {
+    "app/vehicle.py": "def find(vehicle_id): ...",
+    "app/routes.py": "ROUTES = []",
+    # GraphQL returns no rawTextBlob for large files, they are only served over REST
+    "app/generated/schema.py": "SCHEMA = {}",
+}
+GRAPHQL_OMITS = {"app/generated/schema.py"}
+
+
+class StandInGitLab(BaseHTTPRequestHandler):
+    """GraphQL blobs and REST raw files of one project; every request is recorded on the server."""
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        variables = body["variables"]
+        self.server.requests.append(("graphql", variables["fullPath"], variables["ref"], variables["paths"]))
+        nodes = [{"path": path, "rawTextBlob": None if path in GRAPHQL_OMITS else FILES[path]}
+                 for path in variables["paths"] if path in FILES]
+        self.respond(200, json.dumps({"data": {"project": {"repository": {"blobs": {"nodes": nodes}}}}}))
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        project, file_part = path.removeprefix("/api/v4/projects/").split("/repository/files/")
+        file_path = unquote(file_part.removesuffix("/raw"))
+        self.server.requests.append(("rest", unquote(project), file_path))
+        if file_path in FILES:
+            self.respond(200, FILES[file_path])
+        else:
+            self.respond(404, "404 File Not Found")
+
+    def respond(self, status: int, body: str):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body.encode())))
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+    def log_message(self, *args):
+        pass
+
+
+def fetch_in_run(*args, **kwargs) -> dict[str, str]:
+    """fetch_blobs in a run of its own, which does not share the flight of earlier runs."""
+    def run():
+        start_flights()
+        return fetch_blobs(*args, **kwargs)
+    return contextvars.copy_context().run(run)
+
+
+@pytest.fixture
+def gitlab():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInGitLab)
+    server.requests = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    source_cache.clear()
+    yield server
+    server.shutdown()
+    source_cache.clear()
+
+
+def test_files_are_fetched_in_one_batch_with_rest_fallback(gitlab):
+    base_url = f"http://127.0.0.1:{gitlab.server_port}"
+    contents = fetch_in_run(PROJECT, "master", [*FILES, "app/missing.py"], base_url=base_url)
+
+    assert contents == FILES
+    assert gitlab.requests[0] == ("graphql", PROJECT, "master", [*FILES, "app/missing.py"])
+    assert sorted(gitlab.requests[1:]) == [("rest", PROJECT, "app/generated/schema.py"),
+                                           ("rest", PROJECT, "app/missing.py")]
+
+
+def test_cached_files_are_not_requested_again(gitlab):
+    base_url = f"http://127.0.0.1:{gitlab.server_port}"
+    fetch_in_run(PROJECT, "master", list(FILES), base_url=base_url)
+    requests = len(gitlab.requests)
+
+    # a new run does not share the first run's flight, only the source cache
+    assert fetch_in_run(PROJECT, "master", ["app/routes.py", "app/vehicle.py"], base_url=base_url) == {
+        "app/routes.py": FILES["app/routes.py"], "app/vehicle.py": FILES["app/vehicle.py"]}
+    assert len(gitlab.requests) == requests
+
+    # another ref is a cache miss; a single file goes straight to REST
+    assert fetch_in_run(PROJECT, "dev", ["app/routes.py"], base_url=base_url) == {"app/routes.py": "ROUTES = []"}
+    assert gitlab.requests[requests:] == [("rest", PROJECT, "app/routes.py")]
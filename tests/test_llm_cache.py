@@ -0,0 +1,39 @@
+from types import SimpleNamespace
+
+from google.adk.events import Event
+from google.adk.models import LlmRequest
+from google.genai import types
+
+from src.log_agent.llm_cache import _request_key
+
+CODE_URLS = '{"code_urls": ["https://gitlab/api/v4/projects/eco%2Ffleet/repository/files/X.java/raw?ref=master"]}'
+
+
+def callback_context(invocation_id: str, text: str, code_urls: str = CODE_URLS, agent_name: str = "code_analyzer"):
+    event = Event(invocation_id=invocation_id, author="user",
+                  content=types.Content(role="user", parts=[types.Part(text=text)]))
+    context = SimpleNamespace(invocation_id=invocation_id, session=SimpleNamespace(events=[event]))
+    return SimpleNamespace(_invocation_context=context, invocation_id=invocation_id, agent_name=agent_name,
+                           state={"code_urls": code_urls})
+
+
+def request(text: str) -> LlmRequest:
+    return LlmRequest(model="gemini-2.0-flash", contents=[types.Content(role="user", parts=[types.Part(text=text)])])
+
+
+def test_same_group_in_a_new_session_has_the_same_key():
+    first = '{"message": "Vehicle 12 not found", "occurrance": 4}'
+    again = '{"message": "Vehicle 977 not found", "occurrance": 31}'
+    assert _request_key(callback_context("a", first), request(first)) == \
+        _request_key(callback_context("b", again), request("history\n" + again))
+
+
+def test_code_revision_and_group_are_part_of_the_key():
+    text = '{"message": "Vehicle 12 not found"}'
+    key = _request_key(callback_context("a", text), request(text))
+    assert key != _request_key(callback_context("a", text, CODE_URLS.replace("master", "dev")), request(text))
+    assert key != _request_key(callback_context("a", '{"message": "Timeout"}'), request(text))
+
+
+def test_requests_without_an_error_group_are_not_cached():
+    assert _request_key(callback_context("a", "and yesterday?"), request("and yesterday?")) is None
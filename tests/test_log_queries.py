@@ -0,0 +1,16 @@
+from src.shared import log_queries
+from src.shared.log_queries import build_query, fan_out_queries, split_values
+
+
+def test_values_are_split_and_deduplicated():
+    assert split_values(" document, billing,,document ") == ["document", "billing"]
+    assert split_values(["prod", "prod", "staging"]) == ["prod", "staging"]
+
+
+def test_services_and_environments_are_combined_or_fanned_out(monkeypatch):
+    assert build_query(["document"], "error", ["prod"]) == "service:document AND status:error AND env:prod"
+    assert fan_out_queries("document,billing", "error", "prod") == [
+        "service:(document OR billing) AND status:error AND env:prod"]
+    monkeypatch.setattr(log_queries, "FAN_OUT_MODE", "parallel")
+    assert fan_out_queries("document,billing", "error", "prod") == [
+        "service:document AND status:error AND env:prod", "service:billing AND status:error AND env:prod"]
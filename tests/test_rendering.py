@@ -0,0 +1,16 @@
+import io
+
+from src.shared.rendering import StreamRenderer
+
+
+def test_each_authors_output_is_framed_once():
+    out = io.StringIO()
+    renderer = StreamRenderer(header="[{author}] ", footer=" [/]\n", stream=out)
+    renderer.write("log_analyzer", "Vehicle ")
+    renderer.write("log_analyzer", "not found")
+    assert renderer.finish("code_analyzer") == set()
+    assert renderer.finish("log_analyzer") == {"log_analyzer"}
+    renderer.write("analyze_logs", "done")
+    assert renderer.finish() == {"analyze_logs"}
+    renderer.flush()
+    assert out.getvalue() == "[log_analyzer] Vehicle not found [/]\n[analyze_logs] done [/]\n"
@@ -0,0 +1,41 @@
+from google.adk.models import LlmResponse
+from google.genai import types
+
+from src.log_agent.routing import DEFAULT_POLICY, outcome
+from src.shared.routing import RouteMetrics
+
+
+def response(*parts: types.Part) -> LlmResponse:
+    return LlmResponse(content=types.Content(role="model", parts=list(parts)))
+
+
+def call(name: str, **args) -> types.Part:
+    return types.Part(function_call=types.FunctionCall(name=name, args=args))
+
+
+def test_default_routes_never_downgrade_an_agent():
+    assert "log_filter" not in DEFAULT_POLICY and "code_extractor" not in DEFAULT_POLICY
+    assert all(route["fast"] == "gemini-2.0-flash" for route in DEFAULT_POLICY.values())
+
+
+def test_log_filter_outcome_is_a_parsed_schema():
+    valid = call("get_filtered_logs", project_name="document", error_level="error", time_period_hours=24,
+                 environment="prod")
+    assert outcome("log_filter", response(valid)) is True
+    assert outcome("log_filter", response(call("get_filtered_logs", project_name="document"))) is False
+    assert outcome("log_filter", response(types.Part(text="Which environment?"))) is None
+
+
+def test_code_extractor_outcome_is_a_url_list():
+    urls = '{"code_urls": ["https://gitlab/api/v4/projects/eco%2Ffleet/repository/files/X.java/raw?ref=master"]}'
+    assert outcome("code_extractor", response(types.Part(text=urls))) is True
+    assert outcome("code_extractor", response(types.Part(text="I could not find the files."))) is False
+    assert outcome("code_extractor", response(call("fetch_url_from_gitlab", files=[]))) is None
+
+
+def test_calls_without_an_outcome_do_not_count_towards_the_success_rate(tmp_path):
+    metrics = RouteMetrics(str(tmp_path / "routing.sqlite"))
+    metrics.record("log_filter", "fast", "m", 1.0, 10, 10, success=False)
+    metrics.record("log_filter", "fast", "m", 1.0, 10, 10, success=None)
+    metrics.record("log_filter", "fast", "m", 1.0, 10, 10, success=True)
+    assert metrics.success_rate("log_filter", "fast") == (0.5, 2)
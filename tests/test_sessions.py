@@ -0,0 +1,41 @@
+import threading
+
+from google.adk.events import Event, EventActions
+
+from src.log_agent.sessions import SELECT_DUE_SNAPSHOTS, SqliteSessionService
+
+
+def test_reads_see_the_queued_events_of_their_session(tmp_path):
+    service = SqliteSessionService(str(tmp_path / "sessions.sqlite"))
+    session = service.create_session(app_name="app", user_id="user", state={"query": "document"})
+    for index in range(5):
+        service.append_event(session, Event(invocation_id="a", author="agent",
+                                            actions=EventActions(state_delta={"step": index})))
+
+    loaded = service.get_session(app_name="app", user_id="user", session_id=session.id)
+    assert loaded.state == {"query": "document", "step": 4}
+    assert len(loaded.events) == 5
+
+
+def test_reads_do_not_wait_for_the_writes_of_other_sessions(tmp_path):
+    service = SqliteSessionService(str(tmp_path / "sessions.sqlite"))
+    session = service.create_session(app_name="app", user_id="user")
+    # another user's session with a write that never commits
+    with service._committed:
+        service._pending[("app", "other", "stuck")] = 1
+
+    done = threading.Event()
+
+    def read():
+        service.get_session(app_name="app", user_id="user", session_id=session.id)
+        service.list_sessions(app_name="app", user_id="user")
+        done.set()
+
+    threading.Thread(target=read, daemon=True).start()
+    assert done.wait(timeout=5)
+
+
+def test_due_snapshots_are_found_without_a_table_scan(tmp_path):
+    service = SqliteSessionService(str(tmp_path / "sessions.sqlite"))
+    plan = service._db.execute("EXPLAIN QUERY PLAN " + SELECT_DUE_SNAPSHOTS, (service.snapshot_every,)).fetchall()
+    assert "USING INDEX sessions_deltas" in plan[0][-1]
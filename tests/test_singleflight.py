@@ -0,0 +1,43 @@
+import contextvars
+import threading
+
+from src.shared.singleflight import SingleFlight, flight, start_flights
+
+
+def test_do_many_does_not_memoize_missing_results():
+    current = SingleFlight("gitlab")
+    requested = []
+
+    def fetch(keys):
+        requested.append(list(keys))
+        return {key: "content" for key in keys if key != "gone.py"}
+
+    assert current.do_many(["app.py", "gone.py"], fetch) == {"app.py": "content", "gone.py": None}
+    assert current.do_many(["app.py", "gone.py"], fetch) == {"app.py": "content", "gone.py": None}
+    assert requested == [["app.py", "gone.py"], ["gone.py"]]
+
+
+def test_runs_have_their_own_flights():
+    started = threading.Barrier(2)
+    calls, memoized = [], {}
+
+    def run(name):
+        start_flights()
+        started.wait()
+        # the other run starting in between must neither reset nor share this run's results
+        flight("gitlab").do("app.py", calls.append, name)
+        flight("gitlab").do("app.py", calls.append, name)
+        started.wait()
+        memoized[name] = flight("gitlab").stats()["memoized"]
+
+    threads = [threading.Thread(target=contextvars.copy_context().run, args=(run, name)) for name in ("a", "b")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(calls) == ["a", "b"]
+    assert memoized == {"a": 1, "b": 1}
+
+
+def test_calls_outside_a_run_are_not_memoized():
+    assert flight("datadog") is not flight("datadog")
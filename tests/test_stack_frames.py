@@ -0,0 +1,21 @@
+from src.shared.stack_frames import innermost_files, project_path
+
+JAVA_TRACE = """java.lang.IllegalStateException: Vehicle 12 not found
+	at de.carsync.fleet.core.VehicleService$Lookup.find(VehicleService.java:42)
+	at de.carsync.fleet.core.VehicleService.get(VehicleService.java:17)
+	at de.carsync.fleet.api.VehicleController.show(VehicleController.java:88)"""
+
+PYTHON_TRACE = """Traceback (most recent call last):
+  File "/app/api/views.py", line 10, in get
+  File "/app/fleet/vehicle.py", line 42, in find
+KeyError: 12"""
+
+
+def test_innermost_frames_come_first():
+    assert innermost_files(JAVA_TRACE, None) == ["de/carsync/fleet/core/VehicleService.java",
+                                                 "de/carsync/fleet/api/VehicleController.java"]
+    assert innermost_files(None, PYTHON_TRACE, limit=1) == ["/app/fleet/vehicle.py"]
+
+
+def test_project_path():
+    assert project_path("eco-carsync-frontend") == project_path("carsync-frontend") == "eco/carsync-frontend"
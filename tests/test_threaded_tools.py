@@ -0,0 +1,48 @@
+import asyncio
+import time
+
+from google.adk.agents import LlmAgent
+from google.adk.models import BaseLlm, LlmResponse
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from src.log_agent.callbacks import threaded_tool
+
+TOOL_SECONDS = 0.5
+
+
+def fetch_logs(query: str) -> dict:
+    """Stand-in for a tool that waits on an HTTP call or a rate limiter backoff."""
+    time.sleep(TOOL_SECONDS)
+    return {"logs": [query]}
+
+
+class ToolCallingModel(BaseLlm):
+    """Calls fetch_logs once, then answers."""
+    async def generate_content_async(self, llm_request, stream: bool = False):
+        if any(part.function_response for content in llm_request.contents for part in content.parts or []):
+            yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text="done")]))
+        else:
+            call = types.FunctionCall(name="fetch_logs", args={"query": "service:document"})
+            yield LlmResponse(content=types.Content(role="model", parts=[types.Part(function_call=call)]))
+
+
+async def run_twice() -> float:
+    agent = LlmAgent(name="log_filter", model=ToolCallingModel(model="fake"), tools=[threaded_tool(fetch_logs)])
+    runner = Runner(agent=agent, app_name="app", session_service=InMemorySessionService())
+
+    async def run(user: str) -> list:
+        session = runner.session_service.create_session(app_name="app", user_id=user)
+        message = types.Content(role="user", parts=[types.Part(text="errors of document")])
+        return [event async for event in runner.run_async(user_id=user, session_id=session.id, new_message=message)]
+
+    started = time.perf_counter()
+    first, second = await asyncio.gather(run("alice"), run("bob"))
+    assert first[-1].content.parts[0].text == second[-1].content.parts[0].text == "done"
+    return time.perf_counter() - started
+
+
+def test_blocking_tools_of_two_runs_run_at_the_same_time():
+    # with the tool on the event loop the runs would take 2 * TOOL_SECONDS one after the other
+    assert asyncio.run(run_twice()) < 1.5 * TOOL_SECONDS
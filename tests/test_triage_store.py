@@ -0,0 +1,56 @@
+import asyncio
+
+from src.log_agent import daemon
+from src.log_agent.daemon import EWMA_ALPHA, TriageDaemon, TriageStore
+
+TARGET = "document/prod/error"
+NOW = 1_760_000_000.0
+
+
+def group(message: str, count: int) -> dict:
+    return {"message": message, "filename": "app.vehicle", "occurrance": count}
+
+
+def average(store: TriageStore, message: str) -> float:
+    return store._db.execute("SELECT average FROM groups WHERE message = ?", (message,)).fetchone()[0]
+
+
+def test_first_poll_is_a_baseline(tmp_path):
+    store = TriageStore(str(tmp_path / "triage.sqlite"))
+    assert store.record_window(TARGET, [group("Vehicle not found", 600)], NOW, 60, baseline=True) == []
+    due = store.record_window(TARGET, [group("Vehicle not found", 50), group("Timeout", 1)], NOW + 300, 5)
+    assert [(group["message"], reason) for group, reason in due] == [("Timeout", "new")]
+
+
+def test_counts_are_compared_per_minute(tmp_path):
+    store = TriageStore(str(tmp_path / "triage.sqlite"))
+    # 10 per minute over the one hour lookback
+    store.record_window(TARGET, [group("Vehicle not found", 600)], NOW, 60, baseline=True)
+    assert store.record_window(TARGET, [group("Vehicle not found", 60)], NOW + 300, 5) == []
+    due = store.record_window(TARGET, [group("Vehicle not found", 200)], NOW + 600, 5)
+    assert [reason for _, reason in due] == ["spike (40.0 vs ~10.4 per minute)"]
+
+
+def test_groups_missing_from_a_window_decay(tmp_path):
+    store = TriageStore(str(tmp_path / "triage.sqlite"))
+    store.record_window(TARGET, [group("Vehicle not found", 50), group("Timeout", 50)], NOW, 5, baseline=True)
+    store.record_window(TARGET, [group("Timeout", 50)], NOW + 300, 5)
+    assert average(store, "Vehicle not found") == 10 * (1 - EWMA_ALPHA)
+    assert average(store, "Timeout") == 10
+
+
+def test_failed_analyses_are_retried_in_the_next_window(tmp_path, monkeypatch):
+    store = TriageStore(str(tmp_path / "triage.sqlite"))
+    store.record_window(TARGET, [], NOW, 60, baseline=True)
+    [(timeout, reason)] = store.record_window(TARGET, [group("Timeout", 5)], NOW + 300, 5)
+
+    async def failing_triage(runner, index, triaged, semaphore):
+        return {"index": index, "group": triaged, "report": "Analysis failed: 503 UNAVAILABLE", "failed": True}
+
+    monkeypatch.setattr(daemon, "_triage_group", failing_triage)
+    asyncio.run(TriageDaemon([], store)._analyze(TARGET, timeout, reason))
+    due = store.record_window(TARGET, [group("Timeout", 5)], NOW + 600, 5)
+    assert [reason for _, reason in due] == ["retry after a failed analysis"]
+
+    store.record_analysis(TARGET, timeout, "Retry the upstream call")
+    assert store.record_window(TARGET, [group("Timeout", 5)], NOW + 900, 5) == []